@@ -0,0 +1,82 @@
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+from functions.benchmark import (
+    DEFAULT_TOLERANCE, STAGES, benchmark_report, find_regressions, load_report, run_benchmarks, save_report,
+    shipped_sample, synthetic_corpus
+)
+from functions.corpus import CORPUS_DIRECTORIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the pre-processing stages on synthetic and shipped article pairs")
+    parser.add_argument("--articles", type=int, default=20, help="Synthetic article pairs")
+    parser.add_argument("--tokens", type=int, default=2000, help="Tokens per synthetic article")
+    parser.add_argument("--noise", type=float, default=0.05, help="Share of synthetic NER words misspelled or dropped")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sample", type=int, default=30, help="Shipped article pairs, 0 to skip the shipped corpus")
+    parser.add_argument("--ner-dir", type=Path, default=Path("../../Corpus/Files/NER Files in Corpus"))
+    parser.add_argument("--pos-dir", type=Path, default=Path("../../Corpus/Files/POS Files in Corpus"))
+    parser.add_argument("--parts", nargs="+", default=CORPUS_DIRECTORIES,
+                        help="Corpus directories to sample from (default: 1Part to 10Part)")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage, the fastest one is kept")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="Run the stages in this process (peak RSS then accumulates over the stages)")
+    parser.add_argument("--output", type=Path, default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, default=Path("../../Statistics/Benchmarks/baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown against the baseline that counts as a regression (default: 0.20)")
+    args = parser.parse_args()
+
+    config = {
+        'articles': args.articles,
+        'tokens': args.tokens,
+        'noise': args.noise,
+        'seed': args.seed,
+        'sample': args.sample,
+        'parts': args.parts,
+        'repeat': args.repeat,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        datasets = {'synthetic': synthetic_corpus(tmp_dir, args.articles, args.tokens, args.noise, args.seed)}
+        if args.sample:
+            datasets['shipped'] = shipped_sample(args.ner_dir, args.pos_dir, args.parts, args.sample)
+        results = run_benchmarks(datasets, args.stages, args.repeat, isolate=not args.no_isolate)
+
+    report = benchmark_report(results, config)
+    if args.output:
+        save_report(report, args.output)
+        print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        save_report(report, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return
+
+    baseline = load_report(args.baseline)
+    if baseline.get('version') != report['version']:
+        print(f"The baseline at {args.baseline} times other code (version {baseline.get('version')}), "
+              f"run with --save-baseline to replace it")
+        return
+    if baseline.get('config') != config:
+        print(f"Warning: the baseline was run with {baseline.get('config')}")
+    regressions = find_regressions(report, baseline, args.tolerance)
+    for name, stage, actual, expected in regressions:
+        slowdown = f"{expected / actual:.2f}x slower" if actual else "no items handled"
+        print(f"REGRESSION {name}/{stage}: {actual:.0f} items/s, baseline {expected:.0f} items/s ({slowdown})")
+    if regressions:
+        sys.exit(1)
+    print(f"No stage more than {args.tolerance:.0%} slower than the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from functions.corpus import CORPUS_DIRECTORIES
+from functions.sentence_counts import count_corpus_sentences, disagreements, write_count_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sentence counts of every NER/POS file pair")
+    parser.add_argument("--ner-dir", type=Path, default=Path("../../Corpus/Files/NER Files in Corpus"))
+    parser.add_argument("--pos-dir", type=Path, default=Path("../../Corpus/Files/POS Files in Corpus"))
+    parser.add_argument("--parts", nargs="+", default=CORPUS_DIRECTORIES,
+                        help="Corpus directories to check (default: 1Part to 10Part)")
+    parser.add_argument("--report", type=Path, default=None, help="Write the counts of every pair to this TSV file")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--strict", action="store_true", help="Exit with status 1 when any pair disagrees")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = count_corpus_sentences(args.ner_dir, args.pos_dir, args.parts, processes=args.processes)
+    mismatched = disagreements(rows)
+    print(f"Counted {len(rows)} file pairs in {time.perf_counter() - start:.1f}s")
+    print(f"NER sentences: {sum(row['ner_sentences'] for row in rows)}")
+    print(f"POS sentences: {sum(row['pos_sentences'] for row in rows)}")
+
+    if mismatched:
+        print(f"\n{len(mismatched)} pairs disagree:")
+        print("directory\tner_file\tpos_file\tner\tpos\tsent_id")
+        for row in mismatched:
+            print(f"{row['directory']}\t{row['ner_file']}\t{row['pos_file']}\t"
+                  f"{row['ner_sentences']}\t{row['pos_sentences']}\t{row['pos_sent_ids']}")
+
+    if args.report:
+        write_count_report(rows, args.report)
+        print(f"\nCounts written to {args.report}")
+
+    if args.strict and mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
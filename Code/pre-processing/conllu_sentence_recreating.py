@@ -1,56 +1,61 @@
-from conllu import parse
+from array import array
+from contextlib import ExitStack
+from functools import partial
 from pathlib import Path
 import multiprocessing as mp
+import threading
 from tqdm import tqdm
 import logging
 
+from functions.conllu_cache import cached
+from functions.conllu_reader import FORM, ID, is_word_id, read_conllu_sentences
+from functions.normalization import NORMALIZATION_VERSION, normalize_quotes, normalize_token
+
 logging.getLogger().setLevel(logging.ERROR)
 
 
-def normalize_quotes(text):
-    """Normalize all types of quotation marks to a standard form"""
-    replacements = {
-        '"': '"',
-        '“': '"',
-        '”': '"',
-        '‘': "'",
-        '’': "'",
-        "'": "'"
-    }
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-    return text
+def sentence_text_from(metadata, tokens):
+    """Return the sentence text from metadata, or rebuild it from the tokens if it is missing"""
+    # Try to get the text from metadata first
+    if metadata.get('text', '').strip():
+        return normalize_quotes(metadata['text'].strip())
+
+    # If no text metadata, reconstruct from tokens
+    # Skip multiword tokens
+    words = [normalize_token(token[FORM]) for token in tokens if is_word_id(token[ID])]
+    return " ".join(words)
+
 
+def empty_rows():
+    return {"sentences": [], "sent_ids": [], "word_counts": array('I'), "token_counts": array('I')}
 
 
 def process_conllu_file(file_path):
-    """Process a single CoNLL-U file and extract sentences"""
+    """
+    Process a single CoNLL-U file and extract its sentences.
+    Returns columns of the sentence text, sent_id, word count and token count of every non-empty sentence.
+    """
     try:
-        with Path(file_path).open(encoding="utf-8") as f:
-            data = f.read()
-
-        sentences_text = []
-        sentences = parse(data)
-
-        for sentence in sentences:
-            # Try to get the text from metadata first
-            if 'text' in sentence.metadata and sentence.metadata['text'].strip():
-                sentence_text = normalize_quotes(sentence.metadata['text'].strip())
-            else:
-                # If no text metadata, reconstruct from tokens
-                words = []
-                for token in sentence:
-                    if isinstance(token['id'], int):  # Skip multiword tokens
-                        words.append(normalize_quotes(token['form']))
-                sentence_text = " ".join(words)
+        rows = empty_rows()
+
+        for metadata, tokens in read_conllu_sentences(file_path):
+            sentence_text = sentence_text_from(metadata, tokens)
 
             if sentence_text:  # Only add non-empty sentences
-                sentences_text.append(sentence_text)
+                rows["sentences"].append(sentence_text)
+                rows["sent_ids"].append(metadata.get('sent_id', 'unknown'))
+                rows["word_counts"].append(len(sentence_text.split()))
+                rows["token_counts"].append(sum(1 for token in tokens if is_word_id(token[ID])))
 
-        return sentences_text
+        return rows
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
-        return []
+        return empty_rows()
+
+
+def load_conllu_file_sentences(file_path, cache_dir=None):
+    """process_conllu_file backed by the on-disk cache, only files that changed are parsed again"""
+    return cached(file_path, f"sentence_rows.v{NORMALIZATION_VERSION}", process_conllu_file, dict, dict, cache_dir=cache_dir)
 
 
 def get_all_conllu_files(conllu_dir):
@@ -74,111 +79,91 @@ def get_all_conllu_files(conllu_dir):
     return conllu_files
 
 
-def extract_sentences_from_conllu(conllu_dir, output_file):
-    """
-    Extract all sentences from CoNLL-U files and save to text file.
-    Each sentence is saved on a new line.
-    """
-    print("Finding CoNLL-U files...")
-    file_paths = get_all_conllu_files(Path(conllu_dir))
-
-    if not file_paths:
-        print(f"Warning: No CONLLU files found in {conllu_dir}")
-        return []
-
-    print(f"Processing {len(file_paths)} CoNLL-U files...")
-
-    # Process files in parallel
-    with mp.Pool(processes=mp.cpu_count()) as pool:
-        results = list(tqdm(
-            pool.imap(process_conllu_file, file_paths),
-            total=len(file_paths),
-            desc="Processing CONLLU files"
-        ))
-
-    # Flatten all sentences from all files
-    all_sentences = []
-    for sentences_from_file in results:
-        all_sentences.extend(sentences_from_file)
+def bounded_feed(items, slots, stop):
+    """Yield items while slots has a free slot, the consumer frees one per result. Ends early once stop is set."""
+    for item in items:
+        while not slots.acquire(timeout=0.1):
+            if stop.is_set():
+                return
+        yield item
 
-    print(f"Extracted {len(all_sentences)} sentences")
 
-    # Write sentences to output file (one per line)
-    print(f"Writing sentences to {output_file}...")
-    with open(output_file, "w", encoding="utf-8") as outfile:
-        for sentence in all_sentences:
-            outfile.write(sentence + "\n")
+def iter_file_rows(file_paths, cache_dir=None, chunksize=8):
+    """
+    Yield (file_path, rows) for every file in order as the pool parses them.
+    A single imap is fed through bounded_feed, so only a bounded number of parsed files waits for the writer.
+    """
+    processes = mp.cpu_count()
+    slots = threading.BoundedSemaphore(processes * chunksize * 4)
+    stop = threading.Event()
+    load = partial(load_conllu_file_sentences, cache_dir=cache_dir)
 
-    print(f"Successfully saved {len(all_sentences)} sentences to {output_file}")
-    return all_sentences
+    with mp.Pool(processes=processes) as pool:
+        try:
+            results = pool.imap(load, bounded_feed(file_paths, slots, stop), chunksize=chunksize)
+            for file_path, rows in zip(file_paths, results):
+                slots.release()
+                yield file_path, rows
+        finally:
+            # The pool's feeder thread may be waiting for a slot, let it finish before the pool is terminated
+            stop.set()
 
 
-def extract_sentences_with_metadata(conllu_dir, output_file, metadata_file=None):
+def extract_sentences_with_metadata(conllu_dir, output_file, metadata_file=None, cache_dir=None, chunksize=8):
     """
-    Extract sentences with additional metadata information.
-    Optionally save metadata to a separate file.
+    Extract all sentences from CoNLL-U files and save them to a text file, one sentence per line.
+    Optionally save the sent_id, word and token count of every sentence to a separate metadata file.
+    Both files are written from a single parse while the results stream in, nothing is kept per sentence.
+    With a cache_dir, files that did not change since the last run are read from the cache.
     """
+    stats = {"sentences": 0, "first": [], "last": None}
+
     print("Finding CoNLL-U files...")
     file_paths = get_all_conllu_files(Path(conllu_dir))
 
     if not file_paths:
         print(f"Warning: No CONLLU files found in {conllu_dir}")
-        return []
+        return stats
 
     print(f"Processing {len(file_paths)} CoNLL-U files...")
 
-    all_sentences = []
-    sentence_metadata = []
+    with ExitStack() as stack:
+        outfile = stack.enter_context(open(output_file, "w", encoding="utf-8"))
+        metafile = None
+        if metadata_file:
+            metafile = stack.enter_context(open(metadata_file, "w", encoding="utf-8"))
+            metafile.write("sentence_index\tfile\tsent_id\tword_count\ttoken_count\n")
+
+        results = iter_file_rows(file_paths, cache_dir=cache_dir, chunksize=chunksize)
+        for file_path, rows in tqdm(results, total=len(file_paths), desc="Processing CONLLU files"):
+            sentences = rows["sentences"]
+            if not sentences:
+                continue
 
-    for file_path in tqdm(file_paths, desc="Processing CONLLU files"):
-        try:
-            with Path(file_path).open(encoding="utf-8") as f:
-                data = f.read()
-
-            sentences = parse(data)
-
-            for sentence in sentences:
-                # Extract sentence text
-                if 'text' in sentence.metadata and sentence.metadata['text'].strip():
-                    sentence_text = normalize_quotes(sentence.metadata['text'].strip())
-                else:
-                    words = []
-                    for token in sentence:
-                        if isinstance(token['id'], int):
-                            words.append(normalize_quotes(token['form']))
-                    sentence_text = " ".join(words)
-
-                if sentence_text:
-                    all_sentences.append(sentence_text)
-
-                    # Store metadata
-                    meta_info = {
-                        'file': str(file_path),
-                        'sent_id': sentence.metadata.get('sent_id', 'unknown'),
-                        'length': len(sentence_text.split()),
-                        'tokens': len([t for t in sentence if isinstance(t['id'], int)])
-                    }
-                    sentence_metadata.append(meta_info)
-
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-
-    # Write sentences to output file
-    print(f"Writing {len(all_sentences)} sentences to {output_file}...")
-    with open(output_file, "w", encoding="utf-8") as outfile:
-        for sentence in all_sentences:
-            outfile.write(sentence + "\n")
-
-    # Write metadata if requested
+            outfile.write("\n".join(sentences) + "\n")
+            if metafile:
+                for i, sent_id, word_count, token_count in zip(
+                        range(stats["sentences"] + 1, stats["sentences"] + len(sentences) + 1),
+                        rows["sent_ids"], rows["word_counts"], rows["token_counts"]):
+                    metafile.write(f"{i}\t{file_path}\t{sent_id}\t{word_count}\t{token_count}\n")
+
+            stats["first"].extend(sentences[:3 - len(stats["first"])])
+            stats["last"] = sentences[-1]
+            stats["sentences"] += len(sentences)
+
+    print(f"Successfully saved {stats['sentences']} sentences to {output_file}")
     if metadata_file:
-        print(f"Writing metadata to {metadata_file}...")
-        with open(metadata_file, "w", encoding="utf-8") as metafile:
-            metafile.write("sentence_index\tfile\tsent_id\tword_count\ttoken_count\n")
-            for i, meta in enumerate(sentence_metadata):
-                metafile.write(f"{i + 1}\t{meta['file']}\t{meta['sent_id']}\t{meta['length']}\t{meta['tokens']}\n")
+        print(f"Metadata written to {metadata_file}")
+    return stats
+
 
-    print(f"Successfully processed {len(all_sentences)} sentences")
-    return all_sentences
+def extract_sentences_from_conllu(conllu_dir, output_file, cache_dir=None):
+    """
+    Extract all sentences from CoNLL-U files and save to text file, see extract_sentences_with_metadata.
+    Returns its stats dict (sentence count, first three and last sentence), not the list of sentences, which are
+    only written to output_file; read that file back for the full list.
+    """
+    return extract_sentences_with_metadata(conllu_dir, output_file, cache_dir=cache_dir)
 
 
 def main():
@@ -187,36 +172,33 @@ def main():
     conllu_directory = "../../Conllu Files in Corpus/"
     output_filename = "extracted_sentences.txt"
     metadata_filename = "sentence_metadata.txt"
+    cache_directory = Path("../../Corpus/.cache/")
 
     print("CoNLL-U Sentence Extractor")
     print("=" * 50)
 
-    # Extract sentences (basic version)
-    sentences = extract_sentences_from_conllu(conllu_directory, output_filename)
+    # Extract sentences and their metadata in one pass
+    stats = extract_sentences_with_metadata(
+        conllu_directory,
+        output_filename,
+        metadata_filename,
+        cache_dir=cache_directory
+    )
 
-    if sentences:
+    if stats["sentences"]:
         print(f"\nExtraction completed successfully!")
         print(f"Output file: {output_filename}")
-        print(f"Total sentences: {len(sentences)}")
+        print(f"Metadata file: {metadata_filename}")
+        print(f"Total sentences: {stats['sentences']}")
 
         # Show first few sentences as preview
         print(f"\nFirst 3 sentences preview:")
-        for i, sentence in enumerate(sentences[:3]):
+        for i, sentence in enumerate(stats["first"]):
             print(f"{i + 1}: {sentence}")
 
-        if len(sentences) > 3:
+        if stats["sentences"] > 3:
             print("...")
-            print(f"{len(sentences)}: {sentences[-1]}")
-
-        # Optional: Also create version with metadata
-        print(f"\nCreating enhanced version with metadata...")
-        extract_sentences_with_metadata(
-            conllu_directory,
-            "enhanced_" + output_filename,
-            metadata_filename
-        )
-        print(f"Enhanced output: enhanced_{output_filename}")
-        print(f"Metadata file: {metadata_filename}")
+            print(f"{stats['sentences']}: {stats['last']}")
 
     else:
         print("No sentences were extracted. Please check your directory path and file structure.")
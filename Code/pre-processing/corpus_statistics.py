@@ -0,0 +1,30 @@
+import argparse
+import time
+from pathlib import Path
+
+from functions.corpus import CORPUS_DIRECTORIES
+from functions.corpus_stats import compute_corpus_statistics, format_table, write_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count documents, sentences, tokens and entity labels of the Combined Files")
+    parser.add_argument("--combined-dir", type=Path, default=Path("../../Corpus/Files/Combined Files in Corpus"))
+    parser.add_argument("--parts", nargs="+", default=CORPUS_DIRECTORIES,
+                        help="Corpus directories to count (default: 1Part to 10Part)")
+    parser.add_argument("--table", type=Path, default=Path("../../Statistics/corpus_statistics.txt"))
+    parser.add_argument("--json", type=Path, default=Path("../../Statistics/corpus_statistics.json"))
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = compute_corpus_statistics(args.combined_dir, args.parts, processes=args.processes)
+    print(f"Counted {report['total']['documents']} documents in {time.perf_counter() - start:.1f}s\n")
+
+    print(format_table(report))
+    write_report(report, args.table, args.json)
+    print(f"\nTable written to {args.table}")
+    print(f"JSON report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import argparse
+from pathlib import Path
+
+from functions.corpus import CORPUS_DIRECTORIES
+from functions.combined_parquet import export_combined_parquet, read_combined_parquet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Combined Files as a Parquet dataset partitioned by Part and section")
+    parser.add_argument("--combined-dir", type=Path, default=Path("../../Corpus/Files/Combined Files in Corpus"))
+    parser.add_argument("--output-dir", type=Path, default=Path("../../Dataset/Parquet/combined"))
+    parser.add_argument("--parts", nargs="+", default=CORPUS_DIRECTORIES,
+                        help="Corpus directories to export (default: 1Part to 10Part)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    export_combined_parquet(args.combined_dir, args.output_dir, args.parts, processes=args.processes)
+
+    df = read_combined_parquet(args.output_dir, columns=["part", "section", "doc_id"]).to_pandas()
+    summary = df.groupby(["part", "section"], observed=True).agg(documents=("doc_id", "nunique"), tokens=("doc_id", "size"))
+    print(summary.to_string())
+
+
+if __name__ == "__main__":
+    main()
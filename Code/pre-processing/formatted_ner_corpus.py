@@ -1,49 +1,36 @@
+import argparse
 from pathlib import Path
 
-
-def format_ner_file(input_file, output_file):
-    """
-    Format NER file so that each tag is exactly 2 tabs away from the word
-    """
-
-    # Create output directory if it doesn't exist
-    output_path = Path(output_file)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(input_file, 'r', encoding='utf-8') as f_input, \
-            open(output_file, 'w', encoding='utf-8') as f_output:
-
-        for line in f_input:
-            line = line.strip()
-
-            # Skip empty lines
-            if not line:
-                f_output.write('\n')
-                continue
-
-            # Split by any whitespace/tabs
-            parts = line.split()
-
-            if len(parts) >= 2:
-                word = parts[0]
-                tag = parts[1]
-
-                # Format with exactly 2 tabs between word and tag
-                formatted_line = f"{word}\t\t{tag}\n"
-                f_output.write(formatted_line)
-            else:
-                # If line doesn't have both word and tag, keep as is
-                f_output.write(f"{line}\n")
+from functions.corpus import CORPUS_DIRECTORIES
+from functions.ner_format import format_ner_corpus, format_ner_file
 
 
 def main():
-    # Input and output file paths
-    input_file = "../../Corpus/korpusi.txt"  # Your original NER file
-    output_file = "../../Corpus/korpusi.txt"  # Formatted output
-
+    parser = argparse.ArgumentParser(description="Format NER files so that each tag is exactly 2 tabs away from the word")
+    parser.add_argument("--input", type=Path, default=Path("../../Corpus/korpusi.txt"), help="Your original NER file")
+    parser.add_argument("--output", type=Path, default=None, help="Formatted output (default: the input file)")
+    parser.add_argument("--corpus", action="store_true",
+                        help="Format every NER file of the corpus directories in place instead of --input")
+    parser.add_argument("--ner-dir", type=Path, default=Path("../../Corpus/Files/NER Files in Corpus"))
+    parser.add_argument("--parts", nargs="+", default=CORPUS_DIRECTORIES,
+                        help="Corpus directories to format (default: 1Part to 10Part)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    if args.corpus:
+        reports = format_ner_corpus(args.ner_dir, args.parts, processes=args.processes)
+        for report in reports:
+            if report['status'] == 'formatted':
+                print(f"{report['file']}: {report['changed']} of {report['lines']} lines changed")
+        statuses = [report['status'] for report in reports]
+        print(f"{statuses.count('formatted')} files formatted, {statuses.count('unchanged')} already formatted, "
+              f"{statuses.count('error')} errors")
+        return
+
+    output_file = args.output or args.input
     print("Formatting NER file...")
-    format_ner_file(input_file, output_file)
-    print(f"Formatted NER file saved to: {output_file}")
+    lines, changed = format_ner_file(args.input, output_file)
+    print(f"Formatted NER file saved to: {output_file} ({changed} of {lines} lines changed)")
 
     # Show a sample of the formatted file
     print("\nSample of formatted file:")
@@ -56,4 +43,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
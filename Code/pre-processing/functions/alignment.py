@@ -0,0 +1,748 @@
+"""
+Alignment of the NER articles with their POS (CoNLL-U) files and the combined corpus written from it.
+
+align_ner_to_pos_dp_split keeps the full (n + 1) x (m + 1) back pointer table of the notebook DP, one int8 per
+cell, so memory grows with the product of the two token counts: about 53 MB for the largest shipped article,
+some 7100 x 7500 tokens. This is deliberate, a banded table could miss the alignment the full DP finds when
+the NER file skips long passages of the POS file, and the combined files must stay byte identical to the
+shipped ones (see compare_with_shipped). Articles far beyond that size should be split before aligning.
+"""
+import ast
+import json
+import multiprocessing as mp
+import os
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+from functions import metrics
+from functions.conllu_cache import file_hash
+from functions.conllu_reader import (DEPREL, DEPS, FEATS, FORM, HEAD, ID, LEMMA, MISC, UPOS, read_conllu_sentences,
+                                     token_value)
+from functions.corpus import CORPUS_DIRECTORIES, corpus_file_pairs
+from functions.diagnostics import DiagnosticsWriter
+from functions.ner_reader import NerCorpus
+from functions.normalization import normalize_token
+
+DUMMY_TOKEN = {
+    'WORD': '__DUMMY__',
+    'POS_TAG': 'X',
+    'LEMMA': '__DUMMY__',
+    'FEATS': '_',
+    'HEAD': '_',
+    'DEPREL': '_',
+    'DEPS': '_',
+    'MISC': '_'
+}
+MAX_ADAPTIVE_SPAN = 5
+SHORT_TOKEN_LOOKAHEAD = 6
+SENTENCE_END = [".", "!", "?"]
+MANIFEST_NAME = "manifest.json"
+# Combined files written between two saves of the manifest, an interrupted run keeps the pairs saved before
+MANIFEST_SAVE_INTERVAL = 100
+# Bump when the alignment or the combined file format changes, so every pair is rebuilt
+ALIGNER_VERSION = 1
+
+NONE, UP, LEFT, MATCH = range(4)
+
+
+def strip_punct(text):
+    return re.sub(r'^[^\w]+|[^\w]+$', '', text)
+
+
+def split_punct_tokens(tokens):
+    new_tokens = []
+    for t in tokens:
+        word = str(t['WORD'])
+        lemma = str(t.get('LEMMA', word))
+
+        parts = re.findall(r'\w+|[^\w\s]', word)
+
+        if len(parts) == 1:
+            new_tokens.append(t)
+        else:
+            for p in parts:
+                new_t = t.copy()
+                new_t['WORD'] = p
+
+                if re.match(r'[^\w\s]', p):
+                    new_t['LEMMA'] = p
+                elif p.isdigit():
+                    new_t['LEMMA'] = p
+                else:  # words
+                    new_t['LEMMA'] = strip_punct(lemma)
+
+                if re.match(r'[^\w\s]', p):
+                    new_t['POS_TAG'] = "PUNCT"
+                    new_t['FEATS'] = "None"
+                    new_t['DEPREL'] = "punct"
+                elif p.isdigit():  # numbers
+                    new_t['POS_TAG'] = "NUM"
+                    new_t['FEATS'] = "{'NumType': 'Card'}"
+                    new_t['DEPREL'] = t.get('DEPREL', "nummod")
+
+                new_tokens.append(new_t)
+
+    return new_tokens
+
+
+def normalize_for_matching(tokens):
+    text = ' '.join([str(t['WORD']).strip() for t in tokens])
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def fuzzy_ratio(a, b):
+    return SequenceMatcher(None, a, b).ratio()
+
+
+@metrics.timer("ner_parse")
+def get_ner_data(path):
+    """The (WORD, NER_TAG) dicts of the tokens of a NER file, read with NerCorpus"""
+    ner_words = []
+    with NerCorpus(path) as corpus:
+        tags = corpus.tags
+        for word, code, _ in corpus.records():
+            tag = tags[code]
+            # 'word<TAB><TAB>'TAG' lines lose the quote in front of the tag
+            if tag[0] == "'":
+                tag = tag[1:].strip()
+                if not tag:
+                    continue
+            ner_words.append({"WORD": word, "NER_TAG": tag})
+    return ner_words
+
+
+@metrics.timer("conllu_parse")
+def get_pos_data(path):
+    """Read the POS tokens of a CoNLL-U file, SENT_ID and TOKEN_ID locate a token in the file for the diagnostics"""
+    pos_words = []
+    for index, (metadata, tokens) in enumerate(read_conllu_sentences(path)):
+        sent_id = metadata.get('sent_id', str(index))
+        for token in tokens:
+            pos = {
+                "WORD": normalize_token(token[FORM]),
+                "LEMMA": normalize_token(token[LEMMA]),
+                "POS_TAG": token_value(token, UPOS),
+                "FEATS": token_value(token, FEATS),
+                "HEAD": token_value(token, HEAD),
+                "DEPREL": token_value(token, DEPREL),
+                "DEPS": token_value(token, DEPS),
+                "MISC": token_value(token, MISC),
+                "SENT_ID": sent_id,
+                "TOKEN_ID": token[ID],
+            }
+            pos_words.append(pos)
+
+    return pos_words
+
+
+def similar_pairs(words, candidates, threshold):
+    """
+    Return, for every word, the set of candidate indices with fuzzy_ratio(word, candidate) >= threshold.
+    quick_ratio (shared characters) is an upper bound of ratio, it is computed for all candidates at once
+    from a per character index and only the candidates that pass it are compared with SequenceMatcher.
+    """
+    lengths = np.array([len(candidate) for candidate in candidates], dtype=np.int32)
+    postings = defaultdict(lambda: ([], []))
+    for index, candidate in enumerate(candidates):
+        for char, count in Counter(candidate).items():
+            postings[char][0].append(index)
+            postings[char][1].append(count)
+    postings = {char: (np.array(indices), np.array(counts)) for char, (indices, counts) in postings.items()}
+
+    result = []
+    for word in words:
+        shared = np.zeros(len(candidates), dtype=np.int32)
+        for char, count in Counter(word).items():
+            if char in postings:
+                indices, counts = postings[char]
+                shared[indices] += np.minimum(counts, count)
+        total = lengths + len(word)
+        quick = np.where(total > 0, 2.0 * shared / np.maximum(total, 1), 1.0)
+
+        matches = set()
+        for index in np.flatnonzero(quick + 1e-9 >= threshold):
+            if fuzzy_ratio(word, candidates[index]) >= threshold:
+                matches.add(int(index))
+        result.append(matches)
+    return result
+
+
+def match_type(ner_word, pos_tokens):
+    """Classify a match as punct (no letters or digits), direct (same word) or fuzzy, with its score and candidate"""
+    candidate = normalize_for_matching(pos_tokens)
+    if not any(char.isalnum() for char in ner_word):
+        kind = 'punct'
+    elif ''.join(t['WORD'] for t in pos_tokens) == ner_word:
+        kind = 'direct'
+    else:
+        kind = 'fuzzy'
+    return kind, fuzzy_ratio(ner_word, candidate), candidate
+
+
+def alignment_diagnostics(ner_data_split, pos_data_split, matched, unmatched, data):
+    """
+    Build one diagnostics row per NER token and per POS token left out of the alignment.
+    matched is a list of (ner index, first POS index, span) in order, unmatched maps a NER index to its reason.
+    sent_id and token_index locate the token in the combined file, unmatched NER tokens get the sentence they
+    would have been in and no token_index.
+    """
+    sentence_of = []
+    token_of = []
+    for sent_id, (tokens, _) in enumerate(split_sentences(data)):
+        sentence_of.extend([sent_id] * len(tokens))
+        token_of.extend(range(1, len(tokens) + 1))
+
+    rows = []
+    covered = set()
+    next_match = 0
+    for ner_index, ner_token in enumerate(ner_data_split):
+        row = {
+            'ner_index': ner_index,
+            'ner_word': ner_token['WORD'],
+            'ner_tag': ner_token['NER_TAG'],
+        }
+        if next_match < len(matched) and matched[next_match][0] == ner_index:
+            _, pj, span = matched[next_match]
+            pos_tokens = pos_data_split[pj:pj + span]
+            covered.update(range(pj, pj + span))
+            kind, score, candidate = match_type(str(ner_token['WORD']).strip(), pos_tokens)
+            row.update({
+                'match_type': kind,
+                'score': score,
+                'pos_candidate': candidate,
+                'pos_sent_id': pos_tokens[0].get('SENT_ID'),
+                'pos_token_id': pos_tokens[0].get('TOKEN_ID'),
+                'sent_id': sentence_of[next_match],
+                'token_index': token_of[next_match],
+            })
+            next_match += 1
+        else:
+            row.update({
+                'match_type': 'unmatched',
+                'sent_id': sentence_of[min(next_match, len(sentence_of) - 1)] if sentence_of else None,
+                'reason': unmatched[ner_index],
+            })
+        rows.append(row)
+
+    for pos_index in range(1, len(pos_data_split)):
+        if pos_index not in covered:
+            pos_token = pos_data_split[pos_index]
+            rows.append({
+                'match_type': 'pos_unmatched',
+                'pos_candidate': pos_token['WORD'],
+                'pos_sent_id': pos_token.get('SENT_ID'),
+                'pos_token_id': pos_token.get('TOKEN_ID'),
+                'reason': 'no_ner_token',
+            })
+    return rows
+
+
+def align_ner_to_pos_dp_split(ner_data, pos_data, threshold=0.8, max_span=1, diagnostics=None):
+    """
+    Align NER tokens to POS tokens, a POS span of up to 5 short tokens can be merged into one NER token.
+
+    Same alignment as the original quadratic DP from the notebook, but the fuzzy scores are computed once per
+    distinct (word, candidate) pair and the table rows are filled with NumPy. Matches are sparse, so a row is
+    the previous row plus a few match cells followed by a running maximum, only the back pointers are kept
+    as an int8 table and the spans of match cells in a dict.
+
+    When diagnostics is a list, the rows of alignment_diagnostics are appended to it.
+    """
+    ner_data_split = split_punct_tokens(ner_data)
+    pos_data_split = [DUMMY_TOKEN] + split_punct_tokens(pos_data)
+
+    n = len(ner_data_split)
+    m = len(pos_data_split)
+
+    ner_words = [str(t['WORD']).strip() for t in ner_data_split]
+    pos_words = [str(t['WORD']).strip() for t in pos_data_split]
+
+    # Adaptive span: a short alphanumeric NER word may match a run of (at least 2) short POS tokens
+    consecutive_short = [0] * (m + 1)
+    for k in range(m - 1, -1, -1):
+        pos_word = pos_words[k]
+        if len(pos_word) <= 3 and (pos_word.isalnum() or pos_word.isdigit()):
+            consecutive_short[k] = consecutive_short[k + 1] + 1
+    consecutive_short = [min(count, SHORT_TOKEN_LOOKAHEAD) for count in consecutive_short[:m]]
+    adaptive_span = [min(count, MAX_ADAPTIVE_SPAN) if count >= 2 else max_span for count in consecutive_short]
+    largest_span = max([max_span] + adaptive_span)
+
+    # Integer encode every candidate string (span of POS words) that can be compared
+    candidate_codes = {}
+    candidates = []
+    origins = {}
+    for span in range(1, largest_span + 1):
+        by_code = defaultdict(list)
+        for j in range(0, m - span + 1):
+            if span > max(max_span, adaptive_span[j]):
+                continue
+            candidate = normalize_for_matching(pos_data_split[j:j + span])
+            code = candidate_codes.setdefault(candidate, len(candidates))
+            if code == len(candidates):
+                candidates.append(candidate)
+            by_code[code].append(j)
+        origins[span] = by_code
+
+    ner_vocab = list(dict.fromkeys(ner_words))
+    similar = dict(zip(ner_vocab, similar_pairs(ner_vocab, candidates, threshold)))
+
+    def word_matches(word):
+        """Return the match origins of a NER word as a list of (span, origin) in processing order"""
+        qualifies = word.replace(' ', '').isalnum() and len(word) <= 10
+        codes = similar[word]
+        found = []
+        for span in range(largest_span, 0, -1):
+            for code in codes:
+                for j in origins[span].get(code, ()):
+                    limit = adaptive_span[j] if qualifies else max_span
+                    if span <= limit:
+                        found.append((span, j))
+        return found
+
+    matches_cache = {}
+    back = np.zeros((n + 1, m + 1), dtype=np.int8)
+    spans = {}
+    dp_prev = np.zeros(m + 1, dtype=np.int32)
+
+    for i in range(1, n + 1):
+        word = ner_words[i - 1]
+        if word not in matches_cache:
+            matches_cache[word] = word_matches(word)
+
+        # Matches landing in cell c = origin + span - 1, all scored on the previous row
+        early = {}
+        single = {}
+        for span, j in matches_cache[word]:
+            c = j + span - 1
+            score = int(dp_prev[j]) + 1
+            if span > 1:
+                # Longer spans come first, an equal score from a shorter span does not replace them
+                if score > early.get(c, (0, 0))[0]:
+                    early[c] = (score, span)
+            else:
+                single[c] = score
+
+        base = dp_prev.copy()
+        for c, (score, _) in early.items():
+            base[c] = max(base[c], score)
+        for c, score in single.items():
+            base[c] = max(base[c], score)
+        dp_row = np.maximum.accumulate(base)
+
+        left = np.empty_like(dp_row)
+        left[0] = -1
+        left[1:] = dp_row[:-1]
+        row = np.where(dp_prev > 0, np.where(left > dp_prev, LEFT, UP), np.where(left > 0, LEFT, NONE))
+
+        for c in early.keys() | single.keys():
+            current, span = early.get(c, (0, 0))
+            kind = MATCH if span else NONE
+            if dp_prev[c] > current:
+                current, kind = dp_prev[c], UP
+            if left[c] > current:
+                current, kind = left[c], LEFT
+            if single.get(c, 0) > current:
+                current, kind, span = single[c], MATCH, 1
+            row[c] = kind
+            if kind == MATCH:
+                spans[(i, c)] = span
+
+        back[i] = row
+        dp_prev = dp_row
+
+    i, j = n, m
+    aligned_pairs = []
+    unmatched_ner = []
+    matched = []
+    unmatched = {}
+
+    while i > 0 and j > 0:
+        kind = back[i, j]
+        if kind == NONE:
+            break
+        if kind == MATCH:
+            span = spans[(i, j)]
+            pj = j - span + 1
+            aligned_pairs.append((ner_data_split[i - 1], pos_data_split[pj:pj + span]))
+            matched.append((i - 1, pj, span))
+            i, j = i - 1, pj
+        elif kind == UP:
+            unmatched_ner.append(ner_data_split[i - 1]['WORD'])
+            unmatched[i - 1] = 'no_match_found'
+            i -= 1
+        else:
+            j -= 1
+    # NER tokens before the first match were never reached by the backtrack
+    unmatched.update(dict.fromkeys(range(i), 'before_first_match'))
+
+    aligned_pairs.reverse()
+    matched.reverse()
+    data = []
+
+    for ner_token, pos_tokens in aligned_pairs:
+        combined_word = ''.join([t['WORD'] for t in pos_tokens])
+        lemmas = [str(t['LEMMA']) for t in pos_tokens]
+        if len(pos_tokens) > 1 and all(
+                len(str(t['WORD']).strip()) <= 3 and str(t['WORD']).strip().isalnum() for t in pos_tokens):
+            combined_lemma = ''.join(lemmas)
+        else:
+            combined_lemma = ' '.join(lemmas)
+        first_token = pos_tokens[0]
+        combined = {
+            "WORD": combined_word,
+            "NER_TAG": ner_token["NER_TAG"],
+            "POS_TAG": str(first_token['POS_TAG']),
+            "LEMMA": combined_lemma,
+            "FEATS": str(first_token['FEATS']),
+            "HEAD": str(first_token['HEAD']),
+            "DEPREL": str(first_token['DEPREL']),
+            "DEPS": str(first_token['DEPS']),
+            "MISC": str(first_token['MISC']),
+        }
+        data.append(combined)
+
+    if unmatched_ner:
+        print(f"Unmatched NER tokens ({len(unmatched_ner)}):", unmatched_ner)
+
+    if diagnostics is not None:
+        diagnostics.extend(alignment_diagnostics(ner_data_split, pos_data_split, matched, unmatched, data))
+
+    return data
+
+
+def process_file_pair(ner_file, pos_file, diagnostics=None):
+    ner_data = get_ner_data(ner_file)
+    pos_data = get_pos_data(pos_file)
+    rows = [] if diagnostics is not None else None
+    dataset = align_ner_to_pos_dp_split(ner_data, pos_data, diagnostics=rows)
+    if rows is not None:
+        for row in rows:
+            row['ner_file'] = str(ner_file)
+            row['pos_file'] = str(pos_file)
+        diagnostics.extend(rows)
+    print(f"Processed {ner_file.name} and {pos_file.name}")
+    return dataset
+
+
+def clean_misc(misc_str):
+    if not misc_str or misc_str == "_":
+        return ""
+    parts = [kv for kv in misc_str.split("|") if not (kv.startswith("start_char=") or kv.startswith("end_char="))]
+    return "|".join(parts) if parts else ""
+
+
+def dict_to_conllu_str(d):
+    if isinstance(d, dict):
+        return "|".join(f"{k}={v}" for k, v in d.items())
+    if isinstance(d, str):
+        d = d.strip()
+        if d.startswith("{") and d.endswith("}"):
+            try:
+                parsed = ast.literal_eval(d)
+                if isinstance(parsed, dict):
+                    return "|".join(f"{k}={v}" for k, v in parsed.items())
+            except Exception:
+                pass
+        if d in ["None", "_"]:
+            return "_"
+        return d
+    return "_"
+
+
+def split_sentences(dataset):
+    """Group aligned rows into (rows, text) sentences ending on . ! or ?"""
+    sentences = []
+    current_sentence = []
+    sentence_text = []
+    for row in dataset:
+        word = row["WORD"]
+        current_sentence.append(row)
+        sentence_text.append(word)
+        if word in SENTENCE_END:
+            sentences.append((current_sentence, " ".join(sentence_text)))
+            current_sentence = []
+            sentence_text = []
+    if current_sentence:
+        sentences.append((current_sentence, " ".join(sentence_text)))
+    return sentences
+
+
+def write_combined_conllu(dataset, out_path):
+    """Write aligned rows as a CoNLL-U file, the NER tag goes in MISC next to the character offsets"""
+    with open(out_path, "w", encoding="utf-8") as f:
+        for sent_id, (tokens, text) in enumerate(split_sentences(dataset)):
+            f.write(f"# text = {text}\n")
+            f.write(f"# sent_id = {sent_id}\n")
+            char_offset = 0
+            for idx, row in enumerate(tokens, 1):
+                word = row["WORD"]
+                lemma = row.get("LEMMA", "_")
+                upos = row.get("POS_TAG", "_")
+                xpos = "_"
+                feats = dict_to_conllu_str(row.get("FEATS", "_"))
+                head = dict_to_conllu_str(row.get("HEAD", "_"))
+                deprel = row.get("DEPREL", "_")
+                deps = dict_to_conllu_str(row.get("DEPS", "_"))
+                misc = dict_to_conllu_str(row.get("MISC", ""))
+                misc = clean_misc(misc)
+                ner_tag = row.get("NER_TAG", "_")
+                start_char = char_offset
+                end_char = char_offset + len(word)
+                char_offset = end_char + 1
+                misc_items = [f"start_char={start_char}", f"end_char={end_char}"]
+                if misc:
+                    misc_items.append(misc)
+                misc_items.append(f"NER={ner_tag}")
+                misc_str = "|".join(misc_items)
+                f.write(f"{idx}\t{word}\t{lemma}\t{upos}\t{xpos}\t{feats}\t{head}\t{deprel}\t{deps}\t{misc_str}\n")
+            f.write("\n")
+
+
+def combined_file_path(combined_subdir, ner_file):
+    return combined_subdir / f"{ner_file.stem}_combined.conllu"
+
+
+def pair_corpus_files(ner_path, pos_path, combined_path, directories):
+    """
+    Pair the NER and POS files of every directory by article number (see corpus_file_pairs).
+    Returns a list of (ner_file, pos_file, out_path) tasks, creating the combined directories on the way.
+    """
+    tasks = []
+    for directory, ner_file, pos_file in corpus_file_pairs(ner_path, pos_path, directories):
+        combined_subdir = combined_path / directory
+        os.makedirs(combined_subdir, exist_ok=True)
+        tasks.append((ner_file, pos_file, combined_file_path(combined_subdir, ner_file)))
+    return tasks
+
+
+def align_and_write(task, diagnostics=False):
+    """
+    Align one NER/POS file pair and write its _combined.conllu file.
+    Returns (output path or None on error, diagnostics rows or None when they are not collected).
+    """
+    ner_file, pos_file, out_path = task
+    rows = [] if diagnostics else None
+    try:
+        with metrics.stage("dp_alignment"):
+            dataset = process_file_pair(ner_file, pos_file, diagnostics=rows)
+        with metrics.stage("write_conllu"):
+            write_combined_conllu(dataset, out_path)
+        return out_path, rows
+    except Exception as e:
+        print(f"Error processing {ner_file} and {pos_file}: {e}")
+        return None, None
+
+
+def task_size(task):
+    ner_file, pos_file, _ = task
+    return ner_file.stat().st_size + pos_file.stat().st_size
+
+
+def file_signature(file_path, previous=None):
+    """Return the size, mtime and hash of a file, the previous hash is reused when size and mtime did not move"""
+    stat = Path(file_path).stat()
+    if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        return previous
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": file_hash(file_path)}
+
+
+def load_manifest(manifest_path):
+    """Return the manifest entries (output path -> inputs it was built from), empty if there is no usable manifest"""
+    try:
+        with Path(manifest_path).open(encoding="utf-8") as f:
+            return json.load(f)["pairs"]
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring broken manifest {manifest_path}: {e}")
+        return {}
+
+
+def save_manifest(manifest_path, entries):
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump({"aligner_version": ALIGNER_VERSION, "pairs": entries}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def manifest_entry(ner_file, pos_file, previous=None):
+    """Describe the inputs of one pair, the hashes of previous are reused for files whose size and mtime did not move"""
+    previous = previous or {}
+    same_ner = previous.get("ner") == str(ner_file)
+    same_pos = previous.get("pos") == str(pos_file)
+    return {
+        "ner": str(ner_file),
+        "pos": str(pos_file),
+        "ner_file": file_signature(ner_file, previous["ner_file"] if same_ner else None),
+        "pos_file": file_signature(pos_file, previous["pos_file"] if same_pos else None),
+        "aligner_version": ALIGNER_VERSION,
+    }
+
+
+def is_up_to_date(entry, previous, out_path):
+    if not previous or not out_path.exists():
+        return False
+    return (entry["ner"] == previous["ner"] and entry["pos"] == previous["pos"]
+            and entry["aligner_version"] == previous["aligner_version"]
+            and entry["ner_file"]["hash"] == previous["ner_file"]["hash"]
+            and entry["pos_file"]["hash"] == previous["pos_file"]["hash"])
+
+
+def remove_stale_outputs(entries, combined_path, directories, keys):
+    """
+    Delete the outputs of the given directories that are in the manifest but whose NER file is gone. Outputs of
+    NER files that are only skipped by the pairing (see corpus_file_pairs) are left alone.
+    """
+    removed = 0
+    for key in list(entries):
+        if Path(key).parts[0] in directories and key not in keys and not Path(entries[key]["ner"]).exists():
+            out_path = combined_path / key
+            if out_path.exists():
+                out_path.unlink()
+                removed += 1
+            del entries[key]
+    return removed
+
+
+def merge_corpus(ner_path, pos_path, combined_path, directories, processes=None, chunksize=4,
+                 manifest_path=None, full=False, diagnostics_path=None):
+    """
+    Align every NER/POS file pair of the given directories in a process pool and write the combined files.
+    The largest pairs are scheduled first so a big article does not end up alone at the end of the run.
+
+    With a manifest_path only the pairs whose input files, pairing or ALIGNER_VERSION changed since the last
+    build are aligned again (all of them when full is set), and the outputs of pairs that are gone are deleted.
+    The manifest is saved every MANIFEST_SAVE_INTERVAL written files and when the run ends or is interrupted.
+
+    With a diagnostics_path the per token diagnostics of every aligned pair are written to that SQLite file
+    as the results come in, replacing the rows of the same NER file from earlier runs (see functions.diagnostics).
+    """
+    tasks = pair_corpus_files(ner_path, pos_path, combined_path, directories)
+
+    entries = {}
+    pending = {}
+    if manifest_path is not None:
+        # entries keeps the pairs of the directories not rebuilt now, previous_entries is what the pairs are checked
+        # against (nothing with full)
+        entries = load_manifest(manifest_path)
+        previous_entries = {} if full else dict(entries)
+        keys = set()
+        stale = []
+        for ner_file, pos_file, out_path in tqdm(tasks, desc="Checking manifest"):
+            key = out_path.relative_to(combined_path).as_posix()
+            keys.add(key)
+            previous = previous_entries.get(key)
+            entry = manifest_entry(ner_file, pos_file, previous)
+            if is_up_to_date(entry, previous, out_path):
+                entries[key] = entry
+            else:
+                entries.pop(key, None)
+                pending[out_path] = entry
+                stale.append((ner_file, pos_file, out_path))
+
+        removed = remove_stale_outputs(entries, combined_path, directories, keys)
+        print(f"{len(tasks) - len(stale)} combined files up to date, {len(stale)} to rebuild, {removed} removed")
+        tasks = stale
+
+    tasks = sorted(tasks, key=task_size, reverse=True)
+    processes = processes or mp.cpu_count()
+    worker = partial(align_and_write, diagnostics=diagnostics_path is not None)
+    sources = {out_path: ner_file for ner_file, _, out_path in tasks}
+
+    def collect(results):
+        written = []
+        writer = DiagnosticsWriter(diagnostics_path) if diagnostics_path is not None else None
+        try:
+            for out_path, rows in tqdm(results, total=len(tasks), desc="Merging NER and POS files"):
+                if out_path is None:
+                    continue
+                written.append(out_path)
+                if writer is not None:
+                    writer.replace_file(sources[out_path], rows)
+                if manifest_path is not None:
+                    entries[out_path.relative_to(combined_path).as_posix()] = pending[out_path]
+                    if len(written) % MANIFEST_SAVE_INTERVAL == 0:
+                        save_manifest(manifest_path, entries)
+        finally:
+            if writer is not None:
+                writer.close()
+            if manifest_path is not None:
+                save_manifest(manifest_path, entries)
+        return written
+
+    if processes == 1 or not tasks:
+        written = collect(map(worker, tasks))
+    else:
+        with mp.Pool(processes=processes) as pool:
+            written = collect(metrics.imap(pool, worker, tasks, chunksize=chunksize, unordered=True))
+
+    print(f"Wrote {len(written)} combined files, {len(tasks) - len(written)} failed")
+    return written
+
+
+def write_conllu_files_from_dataset(ner_path, pos_path, combined_path, directory, full=False):
+    """
+    For each NER/POS file pair, aligns and reconstructs sentences, then writes a .conllu file in standard format.
+    Only the pairs that changed since the last call are aligned again, see the manifest of merge_corpus.
+    """
+    return merge_corpus(ner_path, pos_path, combined_path, [directory],
+                        manifest_path=Path(combined_path) / MANIFEST_NAME, full=full)
+
+
+def compare_with_shipped(ner_path, pos_path, combined_path, directories, out_dir):
+    """
+    Regenerate the combined files of directories into out_dir and compare them byte for byte with the shipped
+    ones under combined_path. Returns the shipped paths that differ (or are missing) and the alignment time.
+    """
+    import contextlib
+    import filecmp
+    import io
+    import time
+
+    different = []
+    align_time = 0
+    for directory, ner_file, pos_file in tqdm(corpus_file_pairs(Path(ner_path), Path(pos_path), directories),
+                                              desc="Aligning"):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            dataset = process_file_pair(ner_file, pos_file)
+        align_time += time.perf_counter() - start
+
+        out_path = combined_file_path(Path(out_dir) / directory, ner_file)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        write_combined_conllu(dataset, out_path)
+        shipped = combined_file_path(Path(combined_path) / directory, ner_file)
+        if not (shipped.exists() and filecmp.cmp(out_path, shipped, shallow=False)):
+            different.append(shipped)
+    return different, align_time
+
+
+def main():
+    import tempfile
+
+    corpus_dir = Path("../../Corpus/Files/")
+    ner_path = corpus_dir / "NER Files in Corpus"
+    pos_path = corpus_dir / "POS Files in Corpus"
+    combined_path = corpus_dir / "Combined Files in Corpus"
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        different, align_time = compare_with_shipped(ner_path, pos_path, combined_path, CORPUS_DIRECTORIES, out_dir)
+        total = sum(1 for _ in Path(out_dir).rglob("*.conllu"))
+
+    print(f"Aligned {total} file pairs in {align_time:.1f}s ({1000 * align_time / max(total, 1):.0f} ms per pair)")
+    print(f"{total - len(different)} identical to the shipped Combined Files, {len(different)} different")
+    for shipped in different:
+        print(f"  {shipped}")
+
+
+if __name__ == "__main__":
+    main()
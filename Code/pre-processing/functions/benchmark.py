@@ -0,0 +1,293 @@
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from functions.alignment import align_ner_to_pos_dp_split, get_ner_data, get_pos_data, write_combined_conllu
+from functions.corpus import CORPUS_DIRECTORIES, corpus_file_pairs
+from functions.matcher import (
+    CsvMatchWriter, MatchEngine, PosIndex, UsageCountSequential, is_punctuation
+)
+
+STAGES = ('conllu_parse', 'ner_parse', 'exact_match', 'fuzzy_match', 'dp_alignment', 'write')
+# Bump when a stage times different code, baselines of another version are not compared
+BASELINE_VERSION = 2
+DEFAULT_TOLERANCE = 0.20
+SYLLABLES = ["ba", "ka", "do", "re", "mi", "sh", "ta", "ri", "na", "ll", "ë", "ç", "gj", "q", "zo", "ve", "xh", "th"]
+PUNCTUATION = [",", ".", ":", "\"", "(", ")"]
+UPOS_TAGS = ["NOUN", "VERB", "ADJ", "ADP", "PROPN", "DET", "ADV", "PRON", "NUM"]
+NER_TYPES = ["PER", "LOC", "ORG", "DATE_0", "EVENT"]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is in KB on Linux and in bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def synthetic_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+
+
+def misspell(word, rng):
+    """Drop, double or swap one character of a word"""
+    if len(word) < 2:
+        return word + word
+    position = rng.randrange(len(word) - 1)
+    edit = rng.randrange(3)
+    if edit == 0:
+        return word[:position] + word[position + 1:]
+    if edit == 1:
+        return word[:position] + word[position] + word[position:]
+    return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+
+def write_synthetic_pair(ner_file, pos_file, tokens, noise, rng, vocabulary):
+    """
+    Write a NER article ('word<TAB><TAB>TAG', a blank line after every sentence) and its CoNLL-U file with about
+    tokens words. A share noise of the NER words is misspelled or left out, like the differences between the
+    shipped NER and POS files.
+    """
+    ner_lines = []
+    pos_lines = []
+    written = 0
+    sent_id = 1
+    while written < tokens:
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(5, 25))]
+        for position in sorted(rng.sample(range(len(words)), k=len(words) // 6), reverse=True):
+            words.insert(position, rng.choice(PUNCTUATION))
+        words.append(".")
+
+        pos_lines.append(f"# sent_id = {sent_id}")
+        pos_lines.append(f"# text = {' '.join(words)}")
+        char_offset = 0
+        entity = None
+        for index, word in enumerate(words, 1):
+            punct = is_punctuation(word)
+            upos = "PUNCT" if punct else rng.choice(UPOS_TAGS)
+            feats = "_" if punct else rng.choice(["Case=Nom|Number=Sing", "Definite=Def|Gender=Masc", "_"])
+            misc = f"start_char={char_offset}|end_char={char_offset + len(word)}"
+            char_offset += len(word) + 1
+            pos_lines.append(f"{index}\t{word}\t{word.lower()}\t{upos}\t_\t{feats}\t{max(index - 1, 0)}\t"
+                             f"{'punct' if punct else 'dep'}\t_\t{misc}")
+
+            if punct:
+                tag, entity = "O", None
+            elif entity and rng.random() < 0.5:
+                tag = f"I-{entity}"
+            elif rng.random() < 0.1:
+                entity = rng.choice(NER_TYPES)
+                tag = f"B-{entity}"
+            else:
+                tag, entity = "O", None
+
+            roll = rng.random()
+            if roll < noise / 5:
+                continue
+            if roll < noise and not punct:
+                word = misspell(word, rng)
+            ner_lines.append(f"{word}\t\t{tag}")
+
+        pos_lines.append("")
+        ner_lines.append("")
+        written += len(words)
+        sent_id += 1
+
+    Path(pos_file).write_text("\n".join(pos_lines) + "\n", encoding="utf-8")
+    Path(ner_file).write_text("\n".join(ner_lines), encoding="utf-8")
+
+
+def synthetic_corpus(directory, articles=20, tokens=2000, noise=0.05, seed=42, vocabulary_size=5000):
+    """Write articles synthetic NER/POS pairs to directory/NER and directory/POS, returns the (ner, pos) pairs"""
+    rng = random.Random(seed)
+    vocabulary = list(dict.fromkeys(synthetic_word(rng) for _ in range(vocabulary_size)))
+    vocabulary += [word.capitalize() for word in vocabulary[:len(vocabulary) // 10]]
+
+    directory = Path(directory)
+    (directory / "NER").mkdir(parents=True, exist_ok=True)
+    (directory / "POS").mkdir(parents=True, exist_ok=True)
+    pairs = []
+    for article in range(articles):
+        ner_file = directory / "NER" / f"{article}_synthetic.txt"
+        pos_file = directory / "POS" / f"{article}_synthetic.conllu"
+        write_synthetic_pair(ner_file, pos_file, tokens, noise, rng, vocabulary)
+        pairs.append((ner_file, pos_file))
+    return pairs
+
+
+def shipped_sample(ner_path, pos_path, directories=CORPUS_DIRECTORIES, size=30):
+    """A fixed sample of size article pairs of the shipped corpus, evenly spaced over the directories in order"""
+    pairs = [(ner_file, pos_file) for _, ner_file, pos_file in corpus_file_pairs(Path(ner_path), Path(pos_path),
+                                                                                  directories)]
+    if not pairs:
+        return []
+    step = max(len(pairs) // size, 1)
+    return pairs[::step][:size]
+
+
+def stage_inputs(stage, pairs):
+    """
+    Parse what a stage works on, outside of its timing. exact_match gets the NER words that have an exact POS
+    match, so only the exact path of the matcher runs, and write gets the finished matches and alignments.
+    """
+    from functions.functions import parse_ner_file, process_conllu_file
+
+    if stage in ('conllu_parse', 'ner_parse'):
+        return pairs
+    if stage == 'dp_alignment':
+        return [(get_ner_data(ner_file), get_pos_data(pos_file)) for ner_file, pos_file in pairs]
+
+    inputs = [(parse_ner_file(ner_file)[0], process_conllu_file(pos_file)) for ner_file, pos_file in pairs]
+    if stage == 'exact_match':
+        indexed = []
+        for ner_words, pos_words in inputs:
+            index = PosIndex(pos_words)
+            indexed.append(([entry for entry in ner_words if entry[0] in index.lookup], index))
+        return indexed
+    if stage == 'fuzzy_match':
+        indexed = []
+        for ner_words, pos_words in inputs:
+            index = PosIndex(pos_words)
+            queries = list(dict.fromkeys(word for word, _ in ner_words
+                                         if word.strip() and word not in index.lookup and not is_punctuation(word)))
+            indexed.append((queries, index.words))
+        return indexed
+    if stage == 'write':
+        written = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for (ner_words, pos_words), (ner_file, pos_file) in zip(inputs, pairs):
+                matches = list(UsageCountSequential(processes=1).matches(ner_words, PosIndex(pos_words), False))
+                dataset = align_ner_to_pos_dp_split(get_ner_data(ner_file), get_pos_data(pos_file))
+                written.append((matches, dataset))
+        return written
+    return inputs
+
+
+def run_stage_once(stage, inputs, work_dir):
+    """Run one stage over every pair of inputs, returns the number of items (tokens, queries or rows) handled"""
+    from functions.functions import parse_ner_file, process_conllu_file
+    from functions.fuzzy_index import FuzzyIndex
+
+    items = 0
+    if stage == 'conllu_parse':
+        for _, pos_file in inputs:
+            items += len(process_conllu_file(pos_file))
+    elif stage == 'ner_parse':
+        for ner_file, _ in inputs:
+            items += len(parse_ner_file(ner_file)[0])
+    elif stage == 'exact_match':
+        for ner_words, index in inputs:
+            MatchEngine(index).run(ner_words, UsageCountSequential(processes=1), show_progress=False)
+            items += len(ner_words)
+    elif stage == 'fuzzy_match':
+        for queries, words in inputs:
+            fuzzy_index = FuzzyIndex(words)
+            for query in queries:
+                fuzzy_index.extract_one(query, 80)
+            items += len(queries)
+    elif stage == 'dp_alignment':
+        with contextlib.redirect_stdout(io.StringIO()):
+            for ner_data, pos_data in inputs:
+                align_ner_to_pos_dp_split(ner_data, pos_data)
+                items += len(ner_data)
+    elif stage == 'write':
+        for number, (matches, dataset) in enumerate(inputs):
+            write_combined_conllu(dataset, Path(work_dir) / f"{number}.conllu")
+            writer = CsvMatchWriter(Path(work_dir) / f"{number}.csv", Path(work_dir) / f"{number}_unmatched.csv")
+            matched_count = 0
+            for match in matches:
+                if match.kind != 'unmatched':
+                    matched_count += 1
+                writer.write(match, matched_count)
+            writer.close()
+            items += len(dataset) + len(matches)
+    else:
+        raise ValueError(f"Unknown stage {stage!r}, expected one of {STAGES}")
+    return items
+
+
+def run_stage(stage, pairs, repeat=1):
+    """Time a stage (best of repeat runs) in this process, with its throughput and the peak RSS of the process"""
+    inputs = stage_inputs(stage, pairs)
+    timings = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            items = run_stage_once(stage, inputs, work_dir)
+            timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    return {
+        'seconds': round(seconds, 4),
+        'items': items,
+        'items_per_second': round(items / seconds, 1) if seconds else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_benchmarks(datasets, stages=STAGES, repeat=1, isolate=True):
+    """
+    Run every stage on every dataset ({name: [(ner_file, pos_file), ...]}). With isolate each stage runs in a fresh
+    spawned process, so its peak RSS is its own and not that of the stages before it.
+    """
+    results = {}
+    for name, pairs in datasets.items():
+        results[name] = {'pairs': len(pairs), 'stages': {}}
+        for stage in stages:
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as executor:
+                    result = executor.submit(run_stage, stage, pairs, repeat).result()
+            else:
+                result = run_stage(stage, pairs, repeat)
+            results[name]['stages'][stage] = result
+            print(f"{name:<10}{stage:<14}{result['seconds']:>9.3f}s {result['items_per_second'] or 0:>12.0f} items/s"
+                  f" {result['peak_rss_mb']:>9.1f} MB")
+    return results
+
+
+def benchmark_report(results, config):
+    return {
+        'version': BASELINE_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor_count': mp.cpu_count(),
+        'config': config,
+        'datasets': results,
+    }
+
+
+def save_report(report, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path):
+    with Path(path).open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_regressions(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare the throughput of every stage with the baseline report, a stage regresses when it handles fewer than
+    baseline / (1 + tolerance) items per second. Returns (dataset, stage, items/s, baseline items/s) tuples.
+    """
+    regressions = []
+    for name, dataset in report['datasets'].items():
+        baseline_stages = baseline.get('datasets', {}).get(name, {}).get('stages', {})
+        for stage, result in dataset['stages'].items():
+            expected = baseline_stages.get(stage, {}).get('items_per_second')
+            actual = result.get('items_per_second')
+            if expected and actual is not None and actual < expected / (1 + tolerance):
+                regressions.append((name, stage, actual, expected))
+    return regressions
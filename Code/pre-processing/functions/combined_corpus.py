@@ -0,0 +1,74 @@
+import re
+from pathlib import Path
+
+from functions.conllu_reader import read_conllu_sentences
+from functions.corpus import CORPUS_DIRECTORIES, natural_key
+
+# Source site of an article, read from its file name, and the corpus section it belongs to
+RTSH_SECTIONS = {
+    'culture': 'culture',
+    'tech': 'technology',
+    'sociale': 'social',
+}
+RTSH_PATTERN = re.compile(r'^data_lajme_rtsh_al_([a-z]+)_headline')
+UNKNOWN_SECTION = 'unknown'
+
+
+def document_name(file_path):
+    """Return the NER file stem a combined file was built from"""
+    name = Path(file_path).name
+    for suffix in ("_combined.conllu", ".conllu", ".txt"):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def section_of(file_path):
+    """
+    Return the corpus section of an article from its file name:
+    ata (politics), kohajone (international) or the rtsh culture, tech and sociale pages.
+    """
+    source = document_name(file_path).split('_', 1)[-1]
+    if source.startswith('ata_headline'):
+        return 'politics'
+    if source.startswith('kohajone'):
+        return 'international'
+    match = RTSH_PATTERN.match(source)
+    if match:
+        return RTSH_SECTIONS.get(match.group(1), UNKNOWN_SECTION)
+    return UNKNOWN_SECTION
+
+
+def combined_files(combined_path, directories=CORPUS_DIRECTORIES):
+    """Return (directory, file_path) for every combined file, in natural order per directory"""
+    files = []
+    for directory in directories:
+        subdir = Path(combined_path) / directory
+        for file_path in sorted(subdir.glob("*.conllu"), key=lambda f: natural_key(f.name)):
+            files.append((directory, file_path))
+    return files
+
+
+def split_combined_misc(misc):
+    """Split a combined MISC value into (start_char, end_char, ner, rest of the misc or None)"""
+    start_char = end_char = None
+    ner = None
+    rest = []
+    for item in misc.split('|'):
+        key, _, value = item.partition('=')
+        if key == 'NER':
+            ner = value
+        elif key == 'start_char':
+            start_char = int(value)
+        elif key == 'end_char':
+            end_char = int(value)
+        elif item and item != '_':
+            rest.append(item)
+    return start_char, end_char, ner, '|'.join(rest) or None
+
+
+def read_combined_sentences(file_path):
+    """Stream (sent_id, tokens) from a combined file, see conllu_reader.read_conllu_sentences"""
+    for index, (metadata, tokens) in enumerate(read_conllu_sentences(file_path)):
+        sent_id = metadata.get('sent_id')
+        yield int(sent_id) if sent_id and sent_id.isdigit() else index, tokens
@@ -0,0 +1,169 @@
+import multiprocessing as mp
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from functions.combined_corpus import combined_files, document_name, section_of
+from functions.conllu_reader import iter_conllu_sentences
+from functions.corpus import CORPUS_DIRECTORIES
+from functions.sentence_counts import SENTENCE_BLOCK, mapped
+
+INDEX_NAME = "sentence_index.parquet"
+MAX_OPEN_FILES = 256
+TAG = pa.dictionary(pa.int32(), pa.string())
+INDEX_SCHEMA = pa.schema([
+    ('file', TAG),
+    ('doc_id', TAG),
+    ('part', TAG),
+    ('section', TAG),
+    ('offset', pa.int64()),
+    ('length', pa.int32()),
+    ('sent_id', pa.int32()),
+    ('tokens', pa.int32()),
+    ('labels', pa.list_(pa.string())),
+])
+SENT_ID_LINE = re.compile(rb'^# sent_id = (\d+)', re.MULTILINE)
+NER_TAG = re.compile(rb'NER=([^|\s]+)\s*$', re.MULTILINE)
+
+
+def index_combined_file(task):
+    """Return the index rows (as columns) of every sentence of one combined file, from its bytes"""
+    directory, file_path, relative = task
+    columns = {name: [] for name in INDEX_SCHEMA.names}
+    doc_id = document_name(file_path)
+    section = section_of(file_path)
+
+    try:
+        with mapped(file_path) as data:
+            for index, block in enumerate(SENTENCE_BLOCK.finditer(data)):
+                text = block.group()
+                sent_id = SENT_ID_LINE.search(text)
+                tokens = sum(1 for line in text.split(b'\n') if line[:1].isdigit())
+                labels = {tag[2:].decode("utf-8") for tag in NER_TAG.findall(text) if tag[1:2] == b'-'}
+
+                columns['file'].append(relative)
+                columns['doc_id'].append(doc_id)
+                columns['part'].append(directory)
+                columns['section'].append(section)
+                columns['offset'].append(block.start())
+                columns['length'].append(block.end() - block.start())
+                columns['sent_id'].append(int(sent_id.group(1)) if sent_id else index)
+                columns['tokens'].append(tokens)
+                columns['labels'].append(sorted(labels))
+    except OSError as e:
+        print(f"Error indexing {file_path}: {e}")
+    return columns
+
+
+def build_sentence_index(combined_path, index_path=None, directories=CORPUS_DIRECTORIES, processes=None,
+                         chunksize=16):
+    """
+    Record the (file, byte offset, length, sent_id, token count, entity labels) of every sentence of the
+    Combined Files, with the doc_id, Part and section of its file, in one Parquet file (default: combined_path/
+    sentence_index.parquet). Files are relative to combined_path so the corpus can be moved with its index.
+    """
+    combined_path = Path(combined_path)
+    index_path = Path(index_path) if index_path else combined_path / INDEX_NAME
+    tasks = [(directory, file_path, file_path.relative_to(combined_path).as_posix())
+             for directory, file_path in combined_files(combined_path, directories)]
+    processes = processes or mp.cpu_count()
+
+    columns = {name: [] for name in INDEX_SCHEMA.names}
+    with mp.Pool(processes=processes) as pool:
+        for file_columns in tqdm(pool.imap(index_combined_file, tasks, chunksize=chunksize), total=len(tasks),
+                                 desc="Indexing combined files"):
+            for name, values in file_columns.items():
+                columns[name].extend(values)
+
+    table = pa.table(columns, schema=INDEX_SCHEMA)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, index_path)
+    print(f"Indexed {table.num_rows} sentences of {len(tasks)} files to {index_path}")
+    return index_path
+
+
+class SentenceIndex:
+    """
+    Lookups over the index written by build_sentence_index. Every lookup returns row numbers, read() turns them
+    into (metadata, tokens) sentences with one pread of the sentence bytes each, tokens being the raw column tuples
+    of conllu_reader. The last MAX_OPEN_FILES files read from are kept open until close().
+    """
+
+    def __init__(self, combined_path, index_path=None):
+        self.combined_path = Path(combined_path)
+        self.table = pq.read_table(index_path or self.combined_path / INDEX_NAME, memory_map=True)
+        self.offsets = self.table.column('offset').to_numpy()
+        self.lengths = self.table.column('length').to_numpy()
+        self.files = self.table.column('file').combine_chunks()
+        self._handles = {}
+        self._keys = None
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for fd in self._handles.values():
+            os.close(fd)
+        self._handles = {}
+
+    def find(self, doc_id, sent_id):
+        """Return the row of a sentence by the doc_id of its file and its sent_id, or None"""
+        if self._keys is None:
+            doc_ids = self.table.column('doc_id').to_pylist()
+            sent_ids = self.table.column('sent_id').to_pylist()
+            self._keys = {key: row for row, key in enumerate(zip(doc_ids, sent_ids))}
+        return self._keys.get((doc_id, sent_id))
+
+    def with_label(self, label):
+        """Rows of the sentences that contain an entity of the given label"""
+        labels = self.table.column('labels')
+        flat = pc.list_flatten(labels).to_numpy(zero_copy_only=False)
+        parents = pc.list_parent_indices(labels).to_numpy()
+        return np.unique(parents[flat == label])
+
+    def in_section(self, section):
+        """Rows of the sentences of one corpus section (culture, technology, social, international, politics)"""
+        return self._matching('section', section)
+
+    def in_part(self, part):
+        return self._matching('part', part)
+
+    def _matching(self, column, value):
+        mask = pc.equal(self.table.column(column).cast(pa.string()), value)
+        return np.flatnonzero(mask.to_numpy(zero_copy_only=False))
+
+    def _fd(self, file):
+        fd = self._handles.pop(file, None)
+        if fd is None:
+            if len(self._handles) >= MAX_OPEN_FILES:
+                os.close(self._handles.pop(next(iter(self._handles))))
+            fd = os.open(self.combined_path / file, os.O_RDONLY)
+        self._handles[file] = fd
+        return fd
+
+    def read_bytes(self, row):
+        row = int(row)
+        file = self.files[row].as_py()
+        return os.pread(self._fd(file), int(self.lengths[row]), int(self.offsets[row]))
+
+    def read(self, rows):
+        """Yield (metadata, tokens) for every row, reading only the bytes of each sentence"""
+        for row in rows:
+            text = self.read_bytes(row).decode("utf-8")
+            for sentence in iter_conllu_sentences(text.split("\n")):
+                yield sentence
+
+    def sentence(self, row):
+        return next(self.read([row]))
@@ -0,0 +1,116 @@
+import multiprocessing as mp
+import shutil
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from functions.combined_corpus import (combined_files, document_name, read_combined_sentences, section_of,
+                                       split_combined_misc)
+from functions.conllu_reader import DEPREL, DEPS, FEATS, FORM, HEAD, ID, LEMMA, MISC, UPOS, parse_nullable
+from functions.corpus import CORPUS_DIRECTORIES
+
+TAG = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ('doc_id', TAG),
+    ('sent_id', pa.int32()),
+    ('token_id', pa.int32()),
+    ('form', pa.string()),
+    ('lemma', pa.string()),
+    ('upos', TAG),
+    ('feats', TAG),
+    ('head', pa.int32()),
+    ('deprel', TAG),
+    ('deps', TAG),
+    ('ner', TAG),
+    ('start_char', pa.int32()),
+    ('end_char', pa.int32()),
+    ('misc', TAG),
+])
+PARTITIONING = ['part', 'section']
+PARTITION_FILE = "data.parquet"
+
+
+def empty_columns():
+    return {name: [] for name in SCHEMA.names}
+
+
+def add_combined_file(columns, file_path):
+    """Append every token of a combined file to the column lists"""
+    doc_id = document_name(file_path)
+    for sent_id, tokens in read_combined_sentences(file_path):
+        for token in tokens:
+            start_char, end_char, ner, misc = split_combined_misc(token[MISC])
+            columns['doc_id'].append(doc_id)
+            columns['sent_id'].append(sent_id)
+            columns['token_id'].append(int(token[ID]) if token[ID].isdigit() else None)
+            columns['form'].append(token[FORM])
+            columns['lemma'].append(token[LEMMA])
+            columns['upos'].append(parse_nullable(token[UPOS]))
+            columns['feats'].append(parse_nullable(token[FEATS]))
+            columns['head'].append(int(token[HEAD]) if token[HEAD].isdigit() else None)
+            columns['deprel'].append(parse_nullable(token[DEPREL]))
+            columns['deps'].append(parse_nullable(token[DEPS]))
+            columns['ner'].append(ner)
+            columns['start_char'].append(start_char)
+            columns['end_char'].append(end_char)
+            columns['misc'].append(misc)
+
+
+def partition_path(dataset_path, directory, section):
+    return Path(dataset_path) / f"part={directory}" / f"section={section}" / PARTITION_FILE
+
+
+def export_part(directory, combined_path, dataset_path):
+    """Write the tokens of one Part as one Parquet file per section, returns the number of tokens written"""
+    by_section = defaultdict(empty_columns)
+    for _, file_path in combined_files(combined_path, [directory]):
+        try:
+            add_combined_file(by_section[section_of(file_path)], file_path)
+        except Exception as e:
+            print(f"Error processing {file_path}: {e}")
+
+    # Sections that disappeared from the Part must not be left behind
+    shutil.rmtree(Path(dataset_path) / f"part={directory}", ignore_errors=True)
+
+    tokens = 0
+    for section, columns in by_section.items():
+        table = pa.table(columns, schema=SCHEMA)
+        out_path = partition_path(dataset_path, directory, section)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, out_path)
+        tokens += table.num_rows
+    return tokens
+
+
+def export_combined_parquet(combined_path, dataset_path, directories=CORPUS_DIRECTORIES, processes=None):
+    """
+    Export the Combined Files as a Parquet dataset partitioned by Part and section (hive style, part=1Part/section=culture).
+    Tag columns are dictionary encoded, every token carries its doc_id, sent_id and token_id.
+    """
+    processes = processes or mp.cpu_count()
+    export = partial(export_part, combined_path=combined_path, dataset_path=dataset_path)
+
+    with mp.Pool(processes=processes) as pool:
+        counts = list(tqdm(pool.imap(export, directories), total=len(directories), desc="Exporting Parts"))
+
+    print(f"Exported {sum(counts)} tokens from {len(directories)} Parts to {dataset_path}")
+    return sum(counts)
+
+
+def read_combined_parquet(dataset_path, columns=None, parts=None, sections=None):
+    """
+    Read the exported dataset as a pyarrow Table, memory mapping the files.
+    Only the given columns are read, parts and sections select partitions (e.g. parts=["1Part"], sections=["culture"]).
+    Use .to_pandas() on the result for a DataFrame, dictionary columns become categoricals.
+    """
+    filters = []
+    if parts:
+        filters.append(('part', 'in', list(parts)))
+    if sections:
+        filters.append(('section', 'in', list(sections)))
+    return pq.read_table(dataset_path, columns=columns, filters=filters or None, memory_map=True,
+                         partitioning='hive')
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+
+from functions.metrics import count
+
+MAGIC = b"CONLLUC1"
+HEADER_SIZE = struct.Struct("<I")
+
+
+def file_hash(file_path):
+    digest = hashlib.blake2b(digest_size=16)
+    with Path(file_path).open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir, file_path, kind):
+    key = hashlib.sha1(f"{kind}:{Path(file_path).resolve()}".encode("utf-8")).hexdigest()
+    return Path(cache_dir) / kind / f"{key}.bin"
+
+
+def write_cache(cache_dir, file_path, kind, sections, file_digest=None):
+    """
+    Write the cache entry of a source file.
+    sections is a dict of name -> array or list of strings, they are stored back to back after a JSON header
+    together with the size, mtime and hash of the source file.
+    """
+    stat = Path(file_path).stat()
+    layout = []
+    payloads = []
+    offset = 0
+    for name, value in sections.items():
+        if isinstance(value, array):
+            data = value.tobytes()
+            layout.append([name, value.typecode, offset, len(data), len(value)])
+        else:
+            data = "\n".join(value).encode("utf-8")
+            layout.append([name, None, offset, len(data), len(value)])
+        payloads.append(data)
+        offset += len(data)
+
+    header = json.dumps({
+        "source": str(file_path),
+        "kind": kind,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": file_digest or file_hash(file_path),
+        "sections": layout,
+    }).encode("utf-8")
+
+    path = cache_path(cache_dir, file_path, kind)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_SIZE.pack(len(header)))
+        f.write(header)
+        for data in payloads:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        return None
+    (size,) = HEADER_SIZE.unpack(f.read(HEADER_SIZE.size))
+    return json.loads(f.read(size)), len(MAGIC) + HEADER_SIZE.size + size
+
+
+def read_cache(cache_dir, file_path, kind):
+    """
+    Return the cached sections of a source file, or None when there is no entry or the file changed.
+    A file whose size and mtime match is trusted, when only the mtime moved its content hash is compared.
+    """
+    path = cache_path(cache_dir, file_path, kind)
+    if not path.exists():
+        return None
+
+    stat = Path(file_path).stat()
+    with path.open("rb") as f:
+        result = read_header(f)
+        if result is None:
+            return None
+        header, start = result
+
+        if header["size"] != stat.st_size:
+            return None
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            sections = {}
+            for name, typecode, offset, length, count in header["sections"]:
+                data = mm[start + offset:start + offset + length]
+                if typecode is not None:
+                    value = array(typecode)
+                    value.frombytes(data)
+                else:
+                    value = data.decode("utf-8").split("\n") if count else []
+                sections[name] = value
+
+    if header["mtime_ns"] != stat.st_mtime_ns:
+        digest = file_hash(file_path)
+        if digest != header["hash"]:
+            return None
+        # Same content with a new mtime, refresh the entry so the next run takes the fast path
+        write_cache(cache_dir, file_path, kind, sections, digest)
+
+    return sections
+
+
+def cached(file_path, kind, compute, dump, load, cache_dir=None):
+    """
+    Return load(sections) from the cache entry of file_path, or compute(file_path) and store dump(result).
+    Without a cache_dir this is just compute(file_path).
+    """
+    if cache_dir is None:
+        return compute(file_path)
+
+    try:
+        sections = read_cache(cache_dir, file_path, kind)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring broken cache entry for {file_path}: {e}")
+        sections = None
+
+    if sections is not None:
+        count("cache.hit")
+        return load(sections)
+
+    count("cache.miss")
+    result = compute(file_path)
+    try:
+        write_cache(cache_dir, file_path, kind, dump(result))
+    except OSError as e:
+        print(f"Could not cache {file_path}: {e}")
+    return result
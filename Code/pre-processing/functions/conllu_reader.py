@@ -0,0 +1,201 @@
+from functools import lru_cache
+from pathlib import Path
+
+ID, FORM, LEMMA, UPOS, XPOS, FEATS, HEAD, DEPREL, DEPS, MISC = range(10)
+FIELDS = ('id', 'form', 'lemma', 'upos', 'xpos', 'feats', 'head', 'deprel', 'deps', 'misc')
+METADATA_WITHOUT_VALUE = ('newdoc', 'newpar')
+
+
+def parse_comment(line):
+    """Return the (key, value) pair of a '# key = value' line, or None if it carries no value"""
+    key, _, value = line[1:].partition('=')
+    key = key.strip()
+    value = value.strip() if _ else None
+    if key in METADATA_WITHOUT_VALUE:
+        return key, value
+    if not key or not value:
+        return None
+    return key, value
+
+
+def iter_conllu_sentences(lines):
+    """
+    Yield (metadata, tokens) for every sentence in an iterable of CoNLL-U lines.
+    Tokens are tuples of the raw tab separated columns, nothing else is allocated per token.
+    """
+    metadata = {}
+    tokens = []
+    in_sentence = False
+
+    for line in lines:
+        line = line.strip()
+
+        if not line:
+            if in_sentence:
+                yield metadata, tokens
+                metadata = {}
+                tokens = []
+                in_sentence = False
+            continue
+
+        in_sentence = True
+        if line[0] == '#':
+            pair = parse_comment(line)
+            if pair:
+                metadata[pair[0]] = pair[1]
+        else:
+            columns = tuple(line.split('\t'))
+            if len(columns) == 1:
+                raise ValueError(f"Invalid line format, line must contain tabs: {line!r}")
+            tokens.append(columns)
+
+    if in_sentence:
+        yield metadata, tokens
+
+
+def read_conllu_sentences(file_path):
+    """Stream a CoNLL-U file one sentence at a time, see iter_conllu_sentences"""
+    with Path(file_path).open(encoding="utf-8") as f:
+        yield from iter_conllu_sentences(f)
+
+
+def read_conllu_tokens(file_path):
+    """Stream every token tuple of a CoNLL-U file, ignoring sentence boundaries"""
+    for _, tokens in read_conllu_sentences(file_path):
+        yield from tokens
+
+
+def is_word_id(value):
+    """True for plain integer ids, False for multiword ranges (1-2) and empty nodes (1.1)"""
+    return value.isdigit()
+
+
+def parse_nullable(value):
+    if not value or value == '_':
+        return None
+    return value
+
+
+def parse_id(value):
+    if not value or value == '_':
+        return None
+    if value.isdigit():
+        return int(value)
+    if '-' in value:
+        start, end = value.split('-')
+        return int(start), '-', int(end)
+    if '.' in value:
+        start, end = value.split('.')
+        return int(start), '.', int(end)
+    raise ValueError(f"'{value}' is not a valid ID.")
+
+
+def parse_head(value):
+    if value == '_':
+        return None
+    return int(value)
+
+
+@lru_cache(maxsize=None)
+def parse_feats(value):
+    """
+    Parse a 'Key=Val|Key=Val' column into a dict, the same way conllu does.
+    FEATS values repeat a lot so the parsed dicts are cached and shared, do not mutate them.
+    """
+    return parse_dict(value)
+
+
+def parse_dict(value):
+    if parse_nullable(value) is None:
+        return None
+
+    result = {}
+    for part in value.split('|'):
+        key, has_value, val = part.partition('=')
+        if parse_nullable(key) is None:
+            continue
+        result[key] = parse_nullable(val.split('=')[0]) if has_value else ''
+    return result
+
+
+@lru_cache(maxsize=None)
+def parse_deps(value):
+    if value and value != '_' and ':' in value:
+        try:
+            return [(part.split(':', 1)[1], parse_id(part.split(':')[0])) for part in value.split('|')]
+        except ValueError:
+            pass
+    return parse_nullable(value)
+
+
+def padded(token):
+    """A token tuple with '_' for the columns a short row leaves out"""
+    if len(token) >= len(FIELDS):
+        return token
+    return token + ('_',) * (len(FIELDS) - len(token))
+
+
+def token_value(token, column):
+    """Return a single column of a token tuple with the same type conllu.parse would give it"""
+    if column >= len(token):
+        return None
+    value = token[column]
+    if column == ID:
+        return parse_id(value)
+    if column == XPOS:
+        return parse_nullable(value)
+    if column == FEATS:
+        return parse_feats(value)
+    if column == HEAD:
+        return parse_head(value)
+    if column == DEPS:
+        return parse_deps(value)
+    if column == MISC:
+        return parse_dict(value)
+    return value
+
+
+def compare_with_conllu(file_path):
+    """Parse a file with both conllu.parse and this reader and return the list of differences"""
+    from conllu import parse
+
+    with Path(file_path).open(encoding="utf-8") as f:
+        expected = parse(f.read())
+    actual = list(read_conllu_sentences(file_path))
+
+    differences = []
+    if len(expected) != len(actual):
+        differences.append(f"{file_path}: {len(expected)} sentences vs {len(actual)}")
+        return differences
+
+    for sent_index, (sentence, (metadata, tokens)) in enumerate(zip(expected, actual)):
+        if dict(sentence.metadata) != metadata:
+            differences.append(f"{file_path}: sentence {sent_index} metadata differs")
+        if len(sentence) != len(tokens):
+            differences.append(f"{file_path}: sentence {sent_index} has {len(sentence)} tokens vs {len(tokens)}")
+            continue
+        for token_index, (token, columns) in enumerate(zip(sentence, tokens)):
+            for column, field in enumerate(FIELDS):
+                if field in token and token[field] != token_value(columns, column):
+                    differences.append(f"{file_path}: sentence {sent_index} token {token_index} field {field} differs")
+
+    return differences
+
+
+def main():
+    from tqdm import tqdm
+
+    conllu_dir = Path("../../Corpus/Files/POS Files in Corpus/")
+    file_paths = sorted(conllu_dir.glob("*Part/*.conllu"))
+
+    differences = []
+    for file_path in tqdm(file_paths, desc="Comparing with conllu.parse"):
+        differences.extend(compare_with_conllu(file_path))
+
+    for difference in differences[:20]:
+        print(difference)
+    print(f"Checked {len(file_paths)} files, {len(differences)} differences")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""The Part directories of the shipped corpus and the pairing of their NER and POS files by article number"""
+import re
+from collections import defaultdict
+from pathlib import Path
+
+CORPUS_DIRECTORIES = [f"{i}Part" for i in range(1, 11)]
+ARTICLE_NUMBER = re.compile(r'\d+')
+
+
+def natural_key(filename):
+    return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', filename)]
+
+
+def article_number(file_path):
+    """The article number a NER or POS file name starts with ('1040_..._headline.txt', '1040.conllu'), or None"""
+    match = ARTICLE_NUMBER.match(Path(file_path).name)
+    return int(match.group()) if match else None
+
+
+def corpus_file_pairs(ner_path, pos_path, directories):
+    """
+    Pair the NER and POS files of every directory by the article number their names start with, in natural order
+    of the NER files. Returns (directory, ner_file, pos_file). Files without a partner and numbers with more than
+    one NER or POS file ('244 - Copy.conllu') are skipped and reported, their pairing is ambiguous.
+    """
+    pairs = []
+    for directory in directories:
+        ner_files = defaultdict(list)
+        pos_files = defaultdict(list)
+        for ner_file in (ner_path / directory).glob("*.txt"):
+            ner_files[article_number(ner_file)].append(ner_file)
+        for pos_file in (pos_path / directory).glob("*.conllu"):
+            pos_files[article_number(pos_file)].append(pos_file)
+
+        skipped = []
+        for number in ner_files.keys() | pos_files.keys():
+            ner_group = ner_files.get(number, [])
+            pos_group = pos_files.get(number, [])
+            if number is not None and len(ner_group) == 1 and len(pos_group) == 1:
+                pairs.append((directory, ner_group[0], pos_group[0]))
+                continue
+            reason = "duplicate article number" if len(ner_group) > 1 or len(pos_group) > 1 else "no partner"
+            if number is None:
+                reason = "no article number"
+            skipped.extend((file_path.name, reason) for file_path in ner_group + pos_group)
+
+        for name, reason in sorted(skipped, key=lambda item: natural_key(item[0])):
+            print(f"Warning: skipping {directory}/{name} ({reason})")
+
+    pairs.sort(key=lambda pair: (directories.index(pair[0]), natural_key(pair[1].name)))
+    return pairs
@@ -0,0 +1,140 @@
+import json
+import multiprocessing as mp
+from collections import Counter
+from pathlib import Path
+
+from tqdm import tqdm
+
+from functions.corpus import CORPUS_DIRECTORIES
+from functions.combined_corpus import combined_files, section_of
+
+# Table rows, in the order of Statistics/Statistikat e korpusit.txt
+SECTION_TITLES = {
+    'culture': 'Artikuj per kulturen',
+    'technology': 'Artikuj per teknologji',
+    'social': 'Artikuj per tema sociale',
+    'international': 'Artikuj per tema nderkombetare',
+    'politics': 'Artikuj per politike',
+}
+COUNT_KEYS = ('documents', 'sentences', 'tokens', 'labelled_tokens', 'entities')
+DISTRIBUTION_KEYS = ('upos', 'ner', 'entity_types', 'entity_lengths')
+
+
+def empty_stats():
+    stats = dict.fromkeys(COUNT_KEYS, 0)
+    stats.update({key: Counter() for key in DISTRIBUTION_KEYS})
+    return stats
+
+
+def count_combined_file(file_path):
+    """
+    Count one combined file straight from its bytes, no token objects are built.
+    Entities are IOB spans: a B- tag, or an I- tag of another type than the previous token, starts a new one.
+    """
+    stats = empty_stats()
+    stats['documents'] = 1
+    upos = stats['upos']
+    ner = stats['ner']
+    entity_types = stats['entity_types']
+    entity_lengths = stats['entity_lengths']
+
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    current = None
+    length = 0
+    for line in data.split(b'\n'):
+        if line and line[0] == 35:  # '#'
+            if line.startswith(b'# sent_id'):
+                stats['sentences'] += 1
+            continue
+
+        tag = line[line.rfind(b'NER=') + 4:] if line else b'O'
+        entity_type = tag[2:] if tag[1:2] == b'-' else tag
+        if current is not None and (tag == b'O' or tag.startswith(b'B-') or entity_type != current):
+            entity_types[current] += 1
+            entity_lengths[length] += 1
+            current = None
+
+        if not line:
+            continue
+
+        stats['tokens'] += 1
+        upos[line.split(b'\t', 4)[3]] += 1
+        ner[tag] += 1
+        if tag != b'O':
+            stats['labelled_tokens'] += 1
+            if current is None:
+                current = entity_type
+                length = 0
+            length += 1
+
+    if current is not None:
+        entity_types[current] += 1
+        entity_lengths[length] += 1
+
+    stats['entities'] = sum(entity_lengths.values())
+    for key in ('upos', 'ner', 'entity_types'):
+        stats[key] = Counter({value.decode('utf-8'): count for value, count in stats[key].items()})
+    return stats
+
+
+def add_stats(total, stats):
+    for key in COUNT_KEYS:
+        total[key] += stats[key]
+    for key in DISTRIBUTION_KEYS:
+        total[key].update(stats[key])
+
+
+def compute_corpus_statistics(combined_path, directories=CORPUS_DIRECTORIES, processes=None, chunksize=16):
+    """Stream every combined file once over a process pool and sum the counts per section, per Part and overall"""
+    files = combined_files(combined_path, directories)
+    processes = processes or mp.cpu_count()
+
+    report = {'total': empty_stats(), 'sections': {}, 'parts': {}}
+    with mp.Pool(processes=processes) as pool:
+        results = pool.imap(count_combined_file, [file_path for _, file_path in files], chunksize=chunksize)
+        for (directory, file_path), stats in tqdm(zip(files, results), total=len(files), desc="Counting combined files"):
+            add_stats(report['total'], stats)
+            add_stats(report['sections'].setdefault(section_of(file_path), empty_stats()), stats)
+            add_stats(report['parts'].setdefault(directory, empty_stats()), stats)
+    return report
+
+
+def format_table(report):
+    """Format the per-section counts as the table of Statistics/Statistikat e korpusit.txt"""
+    header = f"{'SEKSIONI':<35}{'DOKUMENTA':>10}{'FJALI':>10}{'TOKENA':>10}{'ETIKETIME':>11}"
+    rule = "-" * len(header)
+
+    def row(title, stats):
+        return (f"{title:<35}{stats['documents']:>10}{stats['sentences']:>10}"
+                f"{stats['tokens']:>10}{stats['entities']:>11}")
+
+    sections = report['sections']
+    lines = [header, rule]
+    lines += [row(title, sections[section]) for section, title in SECTION_TITLES.items() if section in sections]
+    lines += [row(section, stats) for section, stats in sections.items() if section not in SECTION_TITLES]
+    lines += [rule, row("TOTAL", report['total'])]
+    return "\n".join(lines)
+
+
+def stats_to_json(stats):
+    result = {key: stats[key] for key in COUNT_KEYS}
+    for key in ('upos', 'ner', 'entity_types'):
+        result[key] = dict(stats[key].most_common())
+    result['entity_lengths'] = {str(length): count for length, count in sorted(stats['entity_lengths'].items())}
+    return result
+
+
+def write_report(report, table_file=None, json_file=None):
+    if table_file:
+        Path(table_file).parent.mkdir(parents=True, exist_ok=True)
+        Path(table_file).write_text(format_table(report) + "\n", encoding="utf-8")
+    if json_file:
+        Path(json_file).parent.mkdir(parents=True, exist_ok=True)
+        with Path(json_file).open("w", encoding="utf-8") as f:
+            json.dump({
+                'total': stats_to_json(report['total']),
+                'sections': {section: stats_to_json(stats) for section, stats in report['sections'].items()},
+                'parts': {part: stats_to_json(stats) for part, stats in report['parts'].items()},
+            }, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,108 @@
+import hashlib
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+SPLITS = ('train', 'dev', 'test')
+SENTENCE_SEPARATOR = '\n\n'
+READ_SIZE = 1 << 20
+HASH_SCALE = float(1 << 64)
+
+
+def iter_sentence_records(file_path, read_size=READ_SIZE):
+    """
+    Stream the sentences of a file whose sentences are separated by a blank line.
+    Gives the same non-empty blocks as content.split('\\n\\n') over the whole file, one read_size chunk at a time.
+    """
+    buffer = ''
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for chunk in iter(lambda: f.read(read_size), ''):
+            buffer += chunk
+            blocks = buffer.split(SENTENCE_SEPARATOR)
+            buffer = blocks.pop()
+            yield from filter(None, blocks)
+    if buffer:
+        yield buffer
+
+
+def sentence_hash(sentence, seed=42):
+    """Map a sentence to a number in [0, 1) from its text and the seed, the same on every run and machine"""
+    digest = hashlib.blake2b(sentence.encode('utf-8'), digest_size=8, key=str(seed).encode('utf-8')).digest()
+    return int.from_bytes(digest, 'big') / HASH_SCALE
+
+
+def hash_split(value, ratios):
+    """Pick the split whose share of [0, 1) holds value"""
+    bound = 0.0
+    for split, ratio in zip(SPLITS, ratios):
+        bound += ratio
+        if value < bound:
+            return split
+    return SPLITS[-1]
+
+
+def line_tag(line):
+    """
+    The NER tag of a dataset line, the field after the 'word<TAB><TAB>' separator. Lines of the combined dataset
+    go on with the lemma, upos, feats, head, deprel, deps and misc columns after the tag.
+    """
+    _, separator, rest = line.partition('\t\t')
+    if not separator:
+        fields = line.split()
+        return fields[1] if len(fields) > 1 else ''
+    return rest.split('\t', 1)[0].strip()
+
+
+def entity_label(sentence):
+    """The most frequent entity type of a sentence (the tag after B-/I- in its NER column), 'O' without entities"""
+    types = Counter()
+    for line in sentence.split('\n'):
+        if not line or line.startswith('#'):
+            continue
+        tag = line_tag(line)
+        if tag[1:2] == '-':
+            types[tag[2:]] += 1
+    return types.most_common(1)[0][0] if types else 'O'
+
+
+STRATA = {
+    'label': entity_label,
+}
+
+
+def split_dataset_file(input_file, output_files, ratios=(0.80, 0.10, 0.10), seed=42, stratify=()):
+    """
+    Stream the sentences of input_file once and write each to the train, dev or test file of output_files
+    (a dict keyed by SPLITS), separated by blank lines and without a trailing one.
+
+    A sentence goes to the split its hash(text, seed) falls in, so the result does not depend on the order or
+    number of the other sentences. stratify names STRATA ('label') whose value is hashed with the text, every
+    stratum then gets its own draw against the ratios. Returns the number of sentences written per split and per
+    stratum.
+    """
+    strata = [STRATA[name] for name in stratify]
+    counts = Counter()
+    by_stratum = defaultdict(Counter)
+
+    with ExitStack() as stack:
+        outputs = {}
+        for split in SPLITS:
+            Path(output_files[split]).parent.mkdir(parents=True, exist_ok=True)
+            outputs[split] = stack.enter_context(open(output_files[split], 'w', encoding='utf-8'))
+
+        for sentence in iter_sentence_records(input_file):
+            stratum = tuple(key(sentence) for key in strata) if strata else None
+            key = sentence if stratum is None else '\x1f'.join(stratum + (sentence,))
+            split = hash_split(sentence_hash(key, seed), ratios)
+
+            if counts[split]:
+                outputs[split].write(SENTENCE_SEPARATOR)
+            outputs[split].write(sentence)
+            counts[split] += 1
+            if stratum is not None:
+                by_stratum[stratum][split] += 1
+
+    return {
+        'splits': dict(counts),
+        'strata': {stratum: dict(split_counts) for stratum, split_counts in by_stratum.items()},
+    }
@@ -0,0 +1,102 @@
+import sqlite3
+from pathlib import Path
+
+# pos_token_id is the CoNLL-U ID of the POS token, pos_index its position in the POS word list of the matchers
+DIAGNOSTIC_COLUMNS = (
+    ('ner_file', 'TEXT'),
+    ('pos_file', 'TEXT'),
+    ('ner_index', 'INTEGER'),
+    ('ner_word', 'TEXT'),
+    ('ner_tag', 'TEXT'),
+    ('match_type', 'TEXT'),
+    ('score', 'REAL'),
+    ('pos_candidate', 'TEXT'),
+    ('pos_sent_id', 'TEXT'),
+    ('pos_token_id', 'TEXT'),
+    ('pos_index', 'INTEGER'),
+    ('sent_id', 'INTEGER'),
+    ('token_index', 'INTEGER'),
+    ('reason', 'TEXT'),
+)
+COLUMN_NAMES = [name for name, _ in DIAGNOSTIC_COLUMNS]
+# direct, fuzzy and punct are matched NER tokens, pos_unmatched are POS tokens no NER token was aligned to
+MATCH_TYPES = ('direct', 'fuzzy', 'punct', 'unmatched', 'pos_unmatched')
+INDEXES = ('ner_file', 'pos_file', 'match_type', 'pos_sent_id')
+
+
+class DiagnosticsWriter:
+    """
+    Incremental SQLite store of alignment diagnostics, one row per NER token (and per unaligned POS token).
+    Rows are dicts with any of DIAGNOSTIC_COLUMNS, they are inserted in batches and committed every batch_size rows.
+    """
+
+    def __init__(self, db_path, batch_size=5000):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.batch_size = batch_size
+        self.pending = []
+
+        columns = ", ".join(f"{name} {kind}" for name, kind in DIAGNOSTIC_COLUMNS)
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS diagnostics ({columns})")
+        # Files of earlier runs may miss columns added since
+        existing = {row[1] for row in self.connection.execute("PRAGMA table_info(diagnostics)")}
+        for name, kind in DIAGNOSTIC_COLUMNS:
+            if name not in existing:
+                self.connection.execute(f"ALTER TABLE diagnostics ADD COLUMN {name} {kind}")
+        for column in INDEXES:
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS diagnostics_{column} ON diagnostics ({column})")
+        self.insert = (f"INSERT INTO diagnostics ({', '.join(COLUMN_NAMES)}) "
+                       f"VALUES ({', '.join('?' for _ in COLUMN_NAMES)})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, rows):
+        self.pending.extend(tuple(row.get(name) for name in COLUMN_NAMES) for row in rows)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def replace_file(self, ner_file, rows):
+        """Drop the rows of a NER file from an earlier run and add its new rows"""
+        self.flush()
+        ner_file = str(ner_file) if ner_file is not None else None
+        self.connection.execute("DELETE FROM diagnostics WHERE ner_file IS ?", (ner_file,))
+        self.add(rows)
+
+    def clear(self):
+        self.pending = []
+        self.connection.execute("DELETE FROM diagnostics")
+        self.connection.commit()
+
+    def flush(self):
+        if self.pending:
+            self.connection.executemany(self.insert, self.pending)
+            self.pending = []
+        self.connection.commit()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+def read_diagnostics(db_path, match_types=None, ner_file=None, pos_file=None):
+    """Return the stored diagnostics as a list of dicts, optionally only some match types or one file"""
+    conditions = []
+    params = []
+    if match_types:
+        conditions.append(f"match_type IN ({', '.join('?' for _ in match_types)})")
+        params.extend(match_types)
+    if ner_file:
+        conditions.append("ner_file = ?")
+        params.append(str(ner_file))
+    if pos_file:
+        conditions.append("pos_file = ?")
+        params.append(str(pos_file))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with sqlite3.connect(db_path) as connection:
+        cursor = connection.execute(f"SELECT {', '.join(COLUMN_NAMES)} FROM diagnostics{where} ORDER BY rowid", params)
+        return [dict(zip(COLUMN_NAMES, row)) for row in cursor]
@@ -1,70 +1,64 @@
 import csv
 import multiprocessing as mp
+import shutil
+import tempfile
+from collections import Counter
+from functools import partial
 from pathlib import Path
 
-import rapidfuzz.process
-from conllu import parse
 from tqdm import tqdm
 
-
-def normalize_quotes(text):
-    replacements = {
-        '"': '"',
-        '“': '"',
-        '”': '"',
-        '‘': "'",
-        '’': "'",
-        "'": "'"
-    }
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-    return text
-
-
-def is_punctuation(text):
-    return all(not c.isalnum() for c in text)
-
+from functions.conllu_reader import (
+    DEPREL, DEPS, FEATS, FORM, HEAD, ID, LEMMA, MISC, UPOS, padded, read_conllu_sentences, read_conllu_tokens,
+    token_value
+)
+from functions.corpus import CORPUS_DIRECTORIES, corpus_file_pairs
+from functions import metrics
+from functions.conllu_cache import cached
+from functions.matcher import (
+    CSV_HEADERS as SEQUENTIAL_CSV_HEADERS, CSV_UNMATCHED_HEADERS as SEQUENTIAL_UNMATCHED_HEADERS, ConlluMatchWriter,
+    CsvMatchWriter, DiagnosticsMatchWriter, FirstOccurrence, MatchEngine, StrictWindow, UsageCountSequential,
+    is_punctuation
+)
+from functions.ner_reader import NerCorpus
+from functions.normalization import NORMALIZATION_VERSION, normalize_token
+from functions.row_writer import open_output
+from functions.token_store import STORE_VERSION, PosTokenStore
+
+
+@metrics.timer("ner_parse")
 def parse_ner_file(path):
     ner_words = []
     ner_dict = {}
 
-    with Path(path).open(encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-
-            parts = [normalize_quotes(part.strip()) for part in line.split("\t") if part.strip()]
+    with NerCorpus(path) as corpus:
+        tags = corpus.tags
+        for word, code, _ in corpus.records():
+            word_info = [word, tags[code]]
+            ner_words.append(word_info)
 
-            if len(parts) >= 2:
-                word_info = parts[:2]
-                ner_words.append(word_info)
-
-                ner_dict[word_info[0]] = word_info
+            ner_dict[word_info[0]] = word_info
 
     return ner_words, ner_dict
 
 
+@metrics.timer("conllu_parse")
 def process_conllu_file(file_path):
     try:
-        with Path(file_path).open(encoding="utf-8") as f:
-            data = f.read()
-
         pos_words = []
-        sentences = parse(data)
-        for sentence in sentences:
-            for token in sentence:
-                word = normalize_quotes(token['form'])
-                pos_tokens = [
-                    word,
-                    normalize_quotes(token['lemma']),
-                    token['upostag'],
-                    token['feats'],
-                    token['head'],
-                    token['deprel'],
-                    token['deps'],
-                    token['misc'],
-                ]
-                pos_words.append(pos_tokens)
+        for token in read_conllu_tokens(file_path):
+            token = padded(token)
+            pos_tokens = [
+                normalize_token(token[FORM]),
+                normalize_token(token[LEMMA]),
+                token[UPOS],
+                token_value(token, FEATS),
+                token_value(token, HEAD),
+                token_value(token, DEPREL),
+                token_value(token, DEPS),
+                token_value(token, MISC),
+            ]
+            pos_words.append(pos_tokens)
 
         return pos_words
     except Exception as e:
@@ -72,6 +66,49 @@ def process_conllu_file(file_path):
         return []
 
 
+@metrics.timer("conllu_parse")
+def process_conllu_file_store(file_path):
+    """
+    Read a CoNLL-U file into a PosTokenStore, normalizing forms and lemmas like process_conllu_file.
+    The store keeps the file, sent_id and ID of every token for the diagnostics.
+    """
+    try:
+        store = PosTokenStore()
+        store.start_file(file_path)
+        for metadata, tokens in read_conllu_sentences(file_path):
+            store.start_sentence(metadata.get('sent_id'))
+            for token in tokens:
+                token = padded(token)
+                store.append(
+                    normalize_token(token[FORM]),
+                    normalize_token(token[LEMMA]),
+                    token[UPOS],
+                    token[FEATS],
+                    token[HEAD],
+                    token[DEPREL],
+                    token[DEPS],
+                    token[MISC],
+                    token[ID],
+                )
+
+        return store
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return PosTokenStore()
+
+
+def load_conllu_file_store(file_path, cache_dir=None):
+    """process_conllu_file_store backed by the on-disk cache, only files that changed are parsed again"""
+    return cached(
+        file_path,
+        f"pos_store.v{NORMALIZATION_VERSION}.{STORE_VERSION}",
+        process_conllu_file_store,
+        PosTokenStore.to_sections,
+        PosTokenStore.from_sections,
+        cache_dir=cache_dir
+    )
+
+
 def get_all_conllu_files(conllu_dir):
     conllu_files = []
 
@@ -85,29 +122,27 @@ def get_all_conllu_files(conllu_dir):
     return conllu_files
 
 
-def process_conllu_files_parallel(conllu_dir):
+def process_conllu_files_parallel(conllu_dir, cache_dir=None):
     file_paths = get_all_conllu_files(conllu_dir)
 
     if not file_paths:
         print(f"Warning: No CONLLU files found in subdirectories of {conllu_dir}")
-        return [], {}, {}
+        return PosTokenStore(), {}, {}
 
+    pos_words = PosTokenStore()
     with mp.Pool(processes=mp.cpu_count()) as pool:
-        results = list(tqdm(
-            pool.imap(process_conllu_file, file_paths),
+        for file_store in tqdm(
+            metrics.imap(pool, partial(load_conllu_file_store, cache_dir=cache_dir), file_paths),
             total=len(file_paths),
             desc="Processing CONLLU files"
-        ))
+        ):
+            pos_words.extend(file_store)
 
-    pos_words = [item for sublist in results for item in sublist]
-
-    pos_dict = {}
-    for entry in pos_words:
-        pos_dict[entry[0]] = entry
+    pos_dict = pos_words.last_entries()
 
     quotes_dict = {
-        '"': next((e for e in pos_words if e[0] in ['"', '“', '”']), None),
-        "'": next((e for e in pos_words if e[0] in ["'", '‘', '’']), None)
+        '"': pos_words.first_of(['"', '“', '”']),
+        "'": pos_words.first_of(["'", '‘', '’'])
     }
 
     return pos_words, pos_dict, quotes_dict
@@ -209,108 +244,11 @@ def process_conllu_files_parallel(conllu_dir):
 #     }
 
 def match_ner_with_pos_array(ner_words, pos_words, threshold=80, output_file="combined_words.conllu",
-                             unmatched_file="unmatched_ner.txt"):
-    """Match NER words with POS words using array to preserve order and all values"""
-
-    # Create a lookup structure that preserves all occurrences
-    # This will be a dictionary where keys are words and values are lists of all their POS entries
-    pos_lookup = {}
-    pos_word_list = []  # For fuzzy matching
-
-    for pos_entry in pos_words:
-        word = pos_entry[0]
-        if word not in pos_lookup:
-            pos_lookup[word] = []
-            pos_word_list.append(word)  # Only add unique words for fuzzy matching
-        pos_lookup[word].append(pos_entry)
-
-    # Open files for writing
-    with open(output_file, "w", encoding="utf-8") as f_combined, \
-            open(unmatched_file, "w", encoding="utf-8") as f_unmatched:
-
-        # For stats tracking
-        matched_count = 0
-        current_sentence_id = 1
-
-        # Write CoNLL-U header
-        f_combined.write("# newdoc\n")
-        f_combined.write(f"# sent_id = {current_sentence_id}\n")
-        f_combined.write("# text = Generated combined NER and POS data\n")
-
-        for ner_entry in tqdm(ner_words, desc="Matching NER with POS"):
-            ner_word = ner_entry[0]
-            ner_tag = ner_entry[1] if len(ner_entry) > 1 else "_"
-            matched = False
-
-            # Skip empty words
-            if not ner_word.strip():
-                continue
-
-            if ner_word == "...":
-                line = f"{ner_word}\t\t{ner_tag}\t...\tPUNCT\t_"
-                f_combined.write(f"{line}\n")
-                matched = True
-
-            # Direct match - use the first occurrence (or you could use a different strategy)
-            elif ner_word in pos_lookup:
-                # Get the first POS entry for this word (you can modify this logic as needed)
-                pos_info = pos_lookup[ner_word][0]  # First occurrence
-
-                # If you want to use all occurrences, you could iterate through them:
-                # for pos_info in pos_lookup[ner_word]:
-                #     # Write each occurrence
-
-                lemma = pos_info[1] if len(pos_info) > 1 and pos_info[1] else "_"
-                upos = pos_info[2] if len(pos_info) > 2 and pos_info[2] else "_"
-                feats = pos_info[3] if len(pos_info) > 3 and pos_info[3] else "_"
-                head = pos_info[4] if len(pos_info) > 4 and pos_info[4] else "_"
-                deprel = pos_info[5] if len(pos_info) > 5 and pos_info[5] else "_"
-                deps = pos_info[6] if len(pos_info) > 6 and pos_info[6] else "_"
-                misc = pos_info[7] if len(pos_info) > 7 and pos_info[7] else "_"
-
-                line = f"{ner_word}\t\t{ner_tag}\t{lemma}\t{upos}\t{feats}\t{head}\t{deprel}\t{deps}\t{misc}"
-                f_combined.write(f"{line}\n")
-                matched = True
-
-            else:
-                # Fuzzy matching for non-punctuation words
-                if not is_punctuation(ner_word):
-                    try:
-                        matches = rapidfuzz.process.extractOne(
-                            ner_word,
-                            pos_word_list,
-                            score_cutoff=threshold
-                        )
-
-                        if matches:
-                            best_match, score, _ = matches
-                            # Use the first occurrence of the best match
-                            pos_info = pos_lookup[best_match][0]
-
-                            lemma = pos_info[1] if len(pos_info) > 1 else "_"
-                            upos = pos_info[2] if len(pos_info) > 2 else "_"
-                            feats = pos_info[3] if len(pos_info) > 3 else "_"
-                            head = pos_info[4] if len(pos_info) > 4 else "_"
-                            deprel = pos_info[5] if len(pos_info) > 5 else "_"
-                            deps = pos_info[6] if len(pos_info) > 6 else "_"
-                            misc = pos_info[7] if len(pos_info) > 7 else "_"
-
-                            conllu_line = f"{ner_word}\t\t{ner_tag}\t{lemma}\t{upos}\t{feats}\t{head}\t{deprel}\t{deps}\t{misc}"
-                            f_combined.write(f"{conllu_line}\n")
-                            matched = True
-                    except Exception as e:
-                        print(f"Error matching '{ner_word}': {e}")
-
-            if not matched:
-                f_unmatched.write(f"{ner_word}\t{ner_tag}\n")
-            else:
-                matched_count += 1
+                             unmatched_file="unmatched_ner.txt", compression=None):
+    """Match NER words with POS words using array to preserve order and all values (the FirstOccurrence strategy)"""
+    writer = ConlluMatchWriter(output_file, unmatched_file, compression)
+    return MatchEngine(pos_words).run(ner_words, FirstOccurrence(threshold), [writer])
 
-    return {
-        'matched_count': matched_count,
-        'unmatched_count': len(ner_words) - matched_count,
-        'total_ner_words': len(ner_words)
-    }
 
 # def match_ner_with_pos(ner_words, pos_dict, quotes_dict=None, threshold=80,
 #                        output_file="combined_words.csv", unmatched_file="unmatched_ner.txt"):
@@ -400,355 +338,131 @@ def match_ner_with_pos_array(ner_words, pos_words, threshold=80, output_file="co
 #         'total_ner_words': len(ner_words)
 #     }
 def match_ner_with_pos_strict_sequential(ner_words, pos_words, threshold=80, output_file="combined_words.conllu",
-                                         unmatched_file="unmatched_ner.txt"):
+                                         unmatched_file="unmatched_ner.txt", max_lookahead=None, compression=None):
     """
     Alternative approach: Match words in strict sequential order
     This assumes that the order of words in NER roughly matches the order in POS
-    """
 
-    # Create index tracker for pos_words
-    pos_index = 0
-    pos_word_list = [entry[0] for entry in pos_words]  # For fuzzy matching
-
-    # Open files for writing
-    with open(output_file, "w", encoding="utf-8") as f_combined, \
-            open(unmatched_file, "w", encoding="utf-8") as f_unmatched:
-
-        matched_count = 0
-
-        # Write CoNLL-U header
-        f_combined.write("# newdoc\n")
-        f_combined.write("# sent_id = 1\n")
-        f_combined.write("# text = Generated combined NER and POS data\n")
-
-        for ner_entry in tqdm(ner_words, desc="Matching NER with POS sequentially"):
-            ner_word = ner_entry[0]
-            ner_tag = ner_entry[1] if len(ner_entry) > 1 else "_"
-            matched = False
-
-            # Skip empty words
-            if not ner_word.strip():
-                continue
-
-            if ner_word == "...":
-                line = f"{ner_word}\t\t{ner_tag}\t...\tPUNCT\t_"
-                f_combined.write(f"{line}\n")
-                matched = True
-
-            else:
-                # Look for the word starting from current pos_index
-                found_index = -1
-
-                # Search forward in pos_words for this ner_word
-                for i in range(pos_index, len(pos_words)):
-                    if pos_words[i][0] == ner_word:
-                        found_index = i
-                        break
-
-                # If not found, try fuzzy matching from current position
-                if found_index == -1 and not is_punctuation(ner_word):
-                    try:
-                        # Search in a window around current position for efficiency
-                        window_start = max(0, pos_index - 50)
-                        window_end = min(len(pos_words), pos_index + 100)
-                        search_words = pos_word_list[window_start:window_end]
-
-                        matches = rapidfuzz.process.extractOne(
-                            ner_word,
-                            search_words,
-                            score_cutoff=threshold
-                        )
-
-                        if matches:
-                            best_match, score, _ = matches
-                            # Find the actual index in the full array
-                            for i in range(window_start, window_end):
-                                if pos_words[i][0] == best_match:
-                                    found_index = i
-                                    break
-                    except Exception as e:
-                        print(f"Error matching '{ner_word}': {e}")
-
-                # If we found a match, use it
-                if found_index != -1:
-                    pos_info = pos_words[found_index]
-                    pos_index = found_index + 1  # Move to next position
-
-                    lemma = pos_info[1] if len(pos_info) > 1 and pos_info[1] else "_"
-                    upos = pos_info[2] if len(pos_info) > 2 and pos_info[2] else "_"
-                    feats = pos_info[3] if len(pos_info) > 3 and pos_info[3] else "_"
-                    head = pos_info[4] if len(pos_info) > 4 and pos_info[4] else "_"
-                    deprel = pos_info[5] if len(pos_info) > 5 and pos_info[5] else "_"
-                    deps = pos_info[6] if len(pos_info) > 6 and pos_info[6] else "_"
-                    misc = pos_info[7] if len(pos_info) > 7 and pos_info[7] else "_"
-
-                    line = f"{ner_word}\t\t{ner_tag}\t{lemma}\t{upos}\t{feats}\t{head}\t{deprel}\t{deps}\t{misc}"
-                    f_combined.write(f"{line}\n")
-                    matched = True
-
-            if not matched:
-                f_unmatched.write(f"{ner_word}\t{ner_tag}\n")
-            else:
-                matched_count += 1
+    Exact hits are looked up in the sorted occurrence lists of an OccurrenceIndex, with max_lookahead
+    a hit further than that many tokens ahead counts as a miss (the default searches to the end).
+    """
+    writer = ConlluMatchWriter(output_file, unmatched_file, compression)
+    return MatchEngine(pos_words).run(ner_words, StrictWindow(threshold, max_lookahead), [writer])
 
-    return {
-        'matched_count': matched_count,
-        'unmatched_count': len(ner_words) - matched_count,
-        'total_ner_words': len(ner_words),
-        'final_pos_index': pos_index
-    }
 
 
 def match_ner_with_pos_sequential(ner_words, pos_words, threshold=80, output_file="combined_words.conllu",
-                                  unmatched_file="unmatched_ner.txt"):
+                                  unmatched_file="unmatched_ner.txt", compression=None):
     """Match NER words with POS words preserving sequential order from POS array"""
+    writer = ConlluMatchWriter(output_file, unmatched_file, compression)
+    return MatchEngine(pos_words).run(ner_words, UsageCountSequential(threshold, processes=1), [writer])
 
-    # Create a usage tracker for each word in pos_words
-    # This keeps track of how many times we've used each word
-    word_usage_count = {}
-
-    # Create a lookup that groups POS entries by word in order
-    pos_lookup_ordered = {}
-    pos_word_list = []  # For fuzzy matching
-
-    for pos_entry in pos_words:
-        word = pos_entry[0]
-        if word not in pos_lookup_ordered:
-            pos_lookup_ordered[word] = []
-            pos_word_list.append(word)  # Only add unique words for fuzzy matching
-            word_usage_count[word] = 0
-        pos_lookup_ordered[word].append(pos_entry)
-
-    # Open files for writing
-    with open(output_file, "w", encoding="utf-8") as f_combined, \
-            open(unmatched_file, "w", encoding="utf-8") as f_unmatched:
-
-        # For stats tracking
-        matched_count = 0
-        current_sentence_id = 1
-
-        # Write CoNLL-U header
-        f_combined.write("# newdoc\n")
-        f_combined.write(f"# sent_id = {current_sentence_id}\n")
-        f_combined.write("# text = Generated combined NER and POS data\n")
-
-        for ner_entry in tqdm(ner_words, desc="Matching NER with POS"):
-            ner_word = ner_entry[0]
-            ner_tag = ner_entry[1] if len(ner_entry) > 1 else "_"
-            matched = False
-
-            # Skip empty words
-            if not ner_word.strip():
-                continue
-
-            if ner_word == "...":
-                line = f"{ner_word}\t\t{ner_tag}\t...\tPUNCT\t_"
-                f_combined.write(f"{line}\n")
-                matched = True
-
-            # Direct match - use sequential occurrence
-            elif ner_word in pos_lookup_ordered:
-                # Get the current usage count for this word
-                current_usage = word_usage_count[ner_word]
-
-                # If we still have unused occurrences of this word
-                if current_usage < len(pos_lookup_ordered[ner_word]):
-                    pos_info = pos_lookup_ordered[ner_word][current_usage]
-                    word_usage_count[ner_word] += 1  # Increment usage count
-                else:
-                    # If we've used all occurrences, cycle back to the first one
-                    # Or you could use the last one, or handle this differently
-                    pos_info = pos_lookup_ordered[ner_word][0]
-
-                lemma = pos_info[1] if len(pos_info) > 1 and pos_info[1] else "_"
-                upos = pos_info[2] if len(pos_info) > 2 and pos_info[2] else "_"
-                feats = pos_info[3] if len(pos_info) > 3 and pos_info[3] else "_"
-                head = pos_info[4] if len(pos_info) > 4 and pos_info[4] else "_"
-                deprel = pos_info[5] if len(pos_info) > 5 and pos_info[5] else "_"
-                deps = pos_info[6] if len(pos_info) > 6 and pos_info[6] else "_"
-                misc = pos_info[7] if len(pos_info) > 7 and pos_info[7] else "_"
-
-                line = f"{ner_word}\t\t{ner_tag}\t{lemma}\t{upos}\t{feats}\t{head}\t{deprel}\t{deps}\t{misc}"
-                f_combined.write(f"{line}\n")
-                matched = True
-
-            else:
-                # Fuzzy matching for non-punctuation words
-                if not is_punctuation(ner_word):
-                    try:
-                        matches = rapidfuzz.process.extractOne(
-                            ner_word,
-                            pos_word_list,
-                            score_cutoff=threshold
-                        )
-
-                        if matches:
-                            best_match, score, _ = matches
-
-                            # Use sequential occurrence for fuzzy matches too
-                            current_usage = word_usage_count[best_match]
-                            if current_usage < len(pos_lookup_ordered[best_match]):
-                                pos_info = pos_lookup_ordered[best_match][current_usage]
-                                word_usage_count[best_match] += 1
-                            else:
-                                pos_info = pos_lookup_ordered[best_match][0]
-
-                            lemma = pos_info[1] if len(pos_info) > 1 else "_"
-                            upos = pos_info[2] if len(pos_info) > 2 else "_"
-                            feats = pos_info[3] if len(pos_info) > 3 else "_"
-                            head = pos_info[4] if len(pos_info) > 4 else "_"
-                            deprel = pos_info[5] if len(pos_info) > 5 else "_"
-                            deps = pos_info[6] if len(pos_info) > 6 else "_"
-                            misc = pos_info[7] if len(pos_info) > 7 else "_"
-
-                            conllu_line = f"{ner_word}\t\t{ner_tag}\t{lemma}\t{upos}\t{feats}\t{head}\t{deprel}\t{deps}\t{misc}"
-                            f_combined.write(f"{conllu_line}\n")
-                            matched = True
-                    except Exception as e:
-                        print(f"Error matching '{ner_word}': {e}")
-
-            if not matched:
-                f_unmatched.write(f"{ner_word}\t{ner_tag}\n")
-            else:
-                matched_count += 1
-
-    return {
-        'matched_count': matched_count,
-        'unmatched_count': len(ner_words) - matched_count,
-        'total_ner_words': len(ner_words),
-        'word_usage_stats': word_usage_count  # Additional info about word usage
-    }
 
 
 def match_ner_with_pos_sequential_csv(ner_words, pos_words, threshold=80,
                                       output_file="combined_words.csv",
-                                      unmatched_file="unmatched_ner.csv"):
-    """Match NER words with POS words preserving sequential order from POS array and output to CSV"""
-
-    # Create a usage tracker for each word in pos_words
-    # This keeps track of how many times we've used each word
-    word_usage_count = {}
-
-    # Create a lookup that groups POS entries by word in order
-    pos_lookup_ordered = {}
-    pos_word_list = []  # For fuzzy matching
-
-    for pos_entry in pos_words:
-        word = pos_entry[0]
-        if word not in pos_lookup_ordered:
-            pos_lookup_ordered[word] = []
-            pos_word_list.append(word)
-            word_usage_count[word] = 0
-        pos_lookup_ordered[word].append(pos_entry)
-
-    csv_headers = ['word', 'ner_tag', 'lemma', 'upos', 'feats', 'head', 'deprel', 'deps', 'misc']
-    unmatched_headers = ['word', 'ner_tag', 'reason']
-
-    with open(output_file, "w", encoding="utf-8", newline='') as f_combined, \
-            open(unmatched_file, "w", encoding="utf-8", newline='') as f_unmatched:
-
-        csv_writer = csv.writer(f_combined)
-        unmatched_writer = csv.writer(f_unmatched)
-
-        csv_writer.writerow(csv_headers)
-        unmatched_writer.writerow(unmatched_headers)
-
-        matched_count = 0
-        match_stats = {
-            'direct_matches': 0,
-            'fuzzy_matches': 0,
-            'punctuation_matches': 0,
-            'unmatched': 0
-        }
-
-        for ner_entry in tqdm(ner_words, desc="Matching NER with POS"):
-            ner_word = ner_entry[0]
-            ner_tag = ner_entry[1] if len(ner_entry) > 1 else "_"
-            matched = False
-
-            if not ner_word.strip():
-                continue
-
-            if ner_word == "...":
-                row = [ner_word, ner_tag, "...", "PUNCT", "_", "_", "_", "_", "_"]
-                csv_writer.writerow(row)
-                matched = True
-                match_stats['punctuation_matches'] += 1
-
-            elif ner_word in pos_lookup_ordered:
-                current_usage = word_usage_count[ner_word]
-
-                if current_usage < len(pos_lookup_ordered[ner_word]):
-                    pos_info = pos_lookup_ordered[ner_word][current_usage]
-                    word_usage_count[ner_word] += 1
-                else:
-                    # If we've used all occurrences, cycle back to the first one
-                    pos_info = pos_lookup_ordered[ner_word][0]
-
-                lemma = pos_info[1] if len(pos_info) > 1 and pos_info[1] else "_"
-                upos = pos_info[2] if len(pos_info) > 2 and pos_info[2] else "_"
-                feats = pos_info[3] if len(pos_info) > 3 and pos_info[3] else "_"
-                head = pos_info[4] if len(pos_info) > 4 and pos_info[4] else "_"
-                deprel = pos_info[5] if len(pos_info) > 5 and pos_info[5] else "_"
-                deps = pos_info[6] if len(pos_info) > 6 and pos_info[6] else "_"
-                misc = pos_info[7] if len(pos_info) > 7 and pos_info[7] else "_"
-
-                row = [ner_word, ner_tag, lemma, upos, feats, head, deprel, deps, misc]
-                csv_writer.writerow(row)
-                matched = True
-                match_stats['direct_matches'] += 1
-
-            else:
-                if not is_punctuation(ner_word):
-                    try:
-                        matches = rapidfuzz.process.extractOne(
-                            ner_word,
-                            pos_word_list,
-                            score_cutoff=threshold
-                        )
-
-                        if matches:
-                            best_match, score, _ = matches
-
-                            current_usage = word_usage_count[best_match]
-                            if current_usage < len(pos_lookup_ordered[best_match]):
-                                pos_info = pos_lookup_ordered[best_match][current_usage]
-                                word_usage_count[best_match] += 1
-                            else:
-                                pos_info = pos_lookup_ordered[best_match][0]
-
-                            lemma = pos_info[1] if len(pos_info) > 1 else "_"
-                            upos = pos_info[2] if len(pos_info) > 2 else "_"
-                            feats = pos_info[3] if len(pos_info) > 3 else "_"
-                            head = pos_info[4] if len(pos_info) > 4 else "_"
-                            deprel = pos_info[5] if len(pos_info) > 5 else "_"
-                            deps = pos_info[6] if len(pos_info) > 6 else "_"
-                            misc = pos_info[7] if len(pos_info) > 7 else "_"
-
-                            row = [ner_word, ner_tag, lemma, upos, feats, head, deprel, deps, misc]
-                            csv_writer.writerow(row)
-                            matched = True
-                            match_stats['fuzzy_matches'] += 1
-                    except Exception as e:
-                        print(f"Error matching '{ner_word}': {e}")
-
-            if not matched:
-                reason = "no_match_found"
-                if is_punctuation(ner_word):
-                    reason = "punctuation_no_pos"
-                elif ner_word in pos_lookup_ordered:
-                    reason = "pos_exhausted"
-
-                unmatched_writer.writerow([ner_word, ner_tag, reason])
-                match_stats['unmatched'] += 1
-            else:
-                matched_count += 1
+                                      unmatched_file="unmatched_ner.csv",
+                                      processes=None, diagnostics_path=None, ner_file=None, show_progress=True,
+                                      compression=None):
+    """
+    Match NER words with POS words preserving sequential order from POS array and output to CSV.
+    Words that need a fuzzy lookup are collected first and resolved in bulk over a process pool,
+    the matching loop then replays them in order so word_usage_count is updated the same way.
+
+    With a diagnostics_path every NER word gets a row in that SQLite file (see functions.diagnostics), labelled
+    with ner_file. token_index is the CSV row of the match and pos_index the index of the POS entry used, from a
+    PosTokenStore the rows also get the pos_file, pos_sent_id and CoNLL-U pos_token_id of that entry.
+    """
+    writers = [CsvMatchWriter(output_file, unmatched_file, compression)]
+    if diagnostics_path is not None:
+        writers.append(DiagnosticsMatchWriter(diagnostics_path, ner_file, pos_words))
+    strategy = UsageCountSequential(threshold, processes=processes)
+    return MatchEngine(pos_words).run(ner_words, strategy, writers, show_progress=show_progress)
+
+
+def match_file_pair_sequential_csv(task, threshold=80):
+    """
+    Match one NER article against its own POS file with match_ner_with_pos_sequential_csv,
+    writing to the temporary CSV files of the task. Returns the stats of the pair, or None on error.
+    """
+    ner_file, pos_file, output_file, unmatched_file = task
+    try:
+        ner_words, _ = parse_ner_file(ner_file)
+        pos_words = process_conllu_file(pos_file)
+        stats = match_ner_with_pos_sequential_csv(ner_words, pos_words, threshold=threshold,
+                                                  output_file=output_file, unmatched_file=unmatched_file,
+                                                  processes=1, show_progress=False)
+    except Exception as e:
+        print(f"Error matching {ner_file} and {pos_file}: {e}")
+        return None
+    stats['ner_file'] = str(ner_file)
+    stats['pos_file'] = str(pos_file)
+    return stats
+
+
+def append_csv_body(source, target):
+    """Copy a CSV file without its header line to the end of an open file"""
+    with open(source, encoding="utf-8", newline='') as f:
+        f.readline()
+        shutil.copyfileobj(f, target)
+
+
+def merge_match_stats(file_stats):
+    """Sum the stats of match_ner_with_pos_sequential_csv over several files, the per file stats are kept in 'files'"""
+    match_stats = Counter()
+    word_usage_count = Counter()
+    matched_count = 0
+    total_ner_words = 0
+    for stats in file_stats:
+        matched_count += stats['matched_count']
+        total_ner_words += stats['total_ner_words']
+        match_stats.update(stats['match_statistics'])
+        word_usage_count.update(stats['word_usage_stats'])
 
     return {
         'matched_count': matched_count,
-        'unmatched_count': len(ner_words) - matched_count,
-        'total_ner_words': len(ner_words),
-        'word_usage_stats': word_usage_count,
-        'match_statistics': match_stats,
-        'match_rate': (matched_count / len(ner_words)) * 100 if ner_words else 0
-    }
\ No newline at end of file
+        'unmatched_count': total_ner_words - matched_count,
+        'total_ner_words': total_ner_words,
+        'word_usage_stats': dict(word_usage_count),
+        'match_statistics': dict(match_stats),
+        'match_rate': (matched_count / total_ner_words) * 100 if total_ner_words else 0,
+        'files': [{key: value for key, value in stats.items() if key != 'word_usage_stats'} for stats in file_stats],
+    }
+
+
+def match_corpus_files_sequential_csv(ner_path, pos_path, directories=CORPUS_DIRECTORIES, threshold=80,
+                                      output_file="combined_words.csv", unmatched_file="unmatched_ner.csv",
+                                      processes=None, chunksize=4, compression=None):
+    """
+    Match every NER article with its paired POS file independently, in a process pool.
+    Unlike matching the concatenated corpus, word usage counts start over for every article so a drift in one
+    article does not carry into the next. The per file CSVs are concatenated in corpus order into output_file
+    and unmatched_file (compressed as in open_output) and the stats are merged with merge_match_stats.
+    """
+    pairs = corpus_file_pairs(Path(ner_path), Path(pos_path), directories)
+    processes = processes or mp.cpu_count()
+
+    with tempfile.TemporaryDirectory(dir=Path(output_file).parent) as tmp_dir:
+        tasks = [(ner_file, pos_file, Path(tmp_dir) / f"{index}.csv", Path(tmp_dir) / f"{index}_unmatched.csv")
+                 for index, (_, ner_file, pos_file) in enumerate(pairs)]
+        match = partial(match_file_pair_sequential_csv, threshold=threshold)
+
+        with open_output(output_file, compression) as f_combined, \
+                open_output(unmatched_file, compression) as f_unmatched, \
+                mp.Pool(processes=processes) as pool:
+            csv.writer(f_combined).writerow(SEQUENTIAL_CSV_HEADERS)
+            csv.writer(f_unmatched).writerow(SEQUENTIAL_UNMATCHED_HEADERS)
+
+            file_stats = []
+            for task, stats in tqdm(zip(tasks, metrics.imap(pool, match, tasks, chunksize=chunksize)),
+                                    total=len(tasks), desc="Matching NER with POS per file"):
+                if stats is None:
+                    continue
+                _, _, file_output, file_unmatched = task
+                append_csv_body(file_output, f_combined)
+                append_csv_body(file_unmatched, f_unmatched)
+                file_output.unlink()
+                file_unmatched.unlink()
+                file_stats.append(stats)
+
+    return merge_match_stats(file_stats)
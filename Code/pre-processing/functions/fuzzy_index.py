@@ -0,0 +1,183 @@
+import multiprocessing as mp
+from collections import Counter, defaultdict
+from functools import partial
+
+import numpy as np
+import rapidfuzz.process
+from tqdm import tqdm
+
+from functions import metrics
+
+# Constants of rapidfuzz.fuzz.WRatio, the default scorer of rapidfuzz.process.extractOne
+PARTIAL_MIN_LEN_RATIO = 1.5
+PARTIAL_SCALE = 0.9
+LONG_PARTIAL_MAX_LEN_RATIO = 8.0
+LONG_PARTIAL_SCALE = 0.6
+EPSILON = 1e-6
+
+
+def is_single_token(text):
+    return len(text.split()) == 1 and text == text.strip()
+
+
+class FuzzyIndex:
+    """
+    Candidate pruning index over a word list, returning the same result as
+    rapidfuzz.process.extractOne(word, words, score_cutoff=threshold) with the default WRatio scorer.
+
+    For two whitespace free strings WRatio is bounded by the number of characters they share (I):
+    ratio <= 200 * I / (len1 + len2) and partial_ratio <= 200 * I / (shorter + I).
+    Words whose bound is below the threshold are skipped, the rest are scored by rapidfuzz in their
+    original order so ties are broken the same way. Results are memoized per query word.
+    """
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.lengths = np.array([len(word) for word in self.words], dtype=np.int32)
+        self.always_check = np.array([not is_single_token(word) for word in self.words], dtype=bool)
+        self.cache = {}
+
+        postings = defaultdict(lambda: ([], []))
+        for index, word in enumerate(self.words):
+            for char, count in Counter(word).items():
+                indices, counts = postings[char]
+                indices.append(index)
+                counts.append(count)
+        self.postings = {
+            char: (np.array(indices, dtype=np.int32), np.array(counts, dtype=np.int32))
+            for char, (indices, counts) in postings.items()
+        }
+
+    def candidates(self, word, threshold):
+        """Return the indices, in order, of the words that can reach the threshold against word"""
+        shared = np.zeros(len(self.words), dtype=np.int32)
+        for char, count in Counter(word).items():
+            if char in self.postings:
+                indices, counts = self.postings[char]
+                shared[indices] += np.minimum(counts, count)
+
+        length = len(word)
+        shorter = np.minimum(self.lengths, length)
+        longer = np.maximum(self.lengths, length)
+        len_ratio = longer / np.maximum(shorter, 1)
+
+        bound = 200.0 * shared / (self.lengths + length)
+        partial_scale = np.where(len_ratio <= LONG_PARTIAL_MAX_LEN_RATIO, PARTIAL_SCALE, LONG_PARTIAL_SCALE)
+        partial_bound = partial_scale * 200.0 * shared / np.maximum(shorter + shared, 1)
+        bound = np.where(len_ratio < PARTIAL_MIN_LEN_RATIO, bound, np.maximum(bound, partial_bound))
+
+        keep = (bound + EPSILON >= threshold) | self.always_check
+        return np.flatnonzero(keep)
+
+    def extract_one(self, word, threshold=80):
+        """Same result as rapidfuzz.process.extractOne(word, self.words, score_cutoff=threshold)"""
+        key = (word, threshold)
+        if key in self.cache:
+            metrics.count("fuzzy.cache_hit")
+            return self.cache[key]
+        metrics.count("fuzzy.lookup")
+
+        if not word or not is_single_token(word):
+            result = rapidfuzz.process.extractOne(word, self.words, score_cutoff=threshold)
+        else:
+            indices = self.candidates(word, threshold)
+            match = rapidfuzz.process.extractOne(word, [self.words[i] for i in indices], score_cutoff=threshold)
+            result = (match[0], match[1], int(indices[match[2]])) if match else None
+
+        self.cache[key] = result
+        return result
+
+
+_worker_index = None
+
+
+def _init_worker(words):
+    global _worker_index
+    _worker_index = FuzzyIndex(words)
+
+
+def _resolve_chunk(chunk, threshold):
+    return [_worker_index.extract_one(word, threshold) for word in chunk]
+
+
+@metrics.stage("fuzzy_match")
+def resolve_fuzzy_matches(words, vocabulary, threshold=80, processes=None, chunk_size=32, show_progress=True):
+    """
+    Resolve the fuzzy match of many distinct words at once, split in chunks over a process pool.
+    Returns a dict of word -> extractOne result (or None), the same as calling
+    rapidfuzz.process.extractOne(word, vocabulary, score_cutoff=threshold) for every word.
+    """
+    words = list(dict.fromkeys(words))
+    chunks = [words[i:i + chunk_size] for i in range(0, len(words), chunk_size)]
+    processes = processes or mp.cpu_count()
+
+    if processes == 1 or len(chunks) <= 1:
+        index = FuzzyIndex(vocabulary)
+        results = [[index.extract_one(word, threshold) for word in chunk]
+                   for chunk in tqdm(chunks, desc="Fuzzy matching", disable=not show_progress)]
+    else:
+        with mp.Pool(processes=processes, initializer=_init_worker, initargs=(vocabulary,)) as pool:
+            results = list(tqdm(
+                metrics.imap(pool, partial(_resolve_chunk, threshold=threshold), chunks),
+                total=len(chunks),
+                desc="Fuzzy matching",
+                disable=not show_progress
+            ))
+
+    return {word: result for chunk, chunk_results in zip(chunks, results)
+            for word, result in zip(chunk, chunk_results)}
+
+
+def main():
+    import random
+    import time
+    from pathlib import Path
+
+    from functions.functions import is_punctuation, parse_ner_file, process_conllu_file_store
+    from functions.token_store import PosTokenStore
+
+    corpus_dir = Path("../../Corpus/Files/")
+    pos_files = sorted((corpus_dir / "POS Files in Corpus").glob("1Part/*.conllu"))[:500]
+    ner_files = sorted((corpus_dir / "NER Files in Corpus").glob("1Part/*.txt"))[:500]
+
+    store = PosTokenStore()
+    for file_path in pos_files:
+        store.extend(process_conllu_file_store(file_path))
+    words = store.vocabulary()
+    known = set(words)
+
+    # NER words that miss the exact lookup, plus misspelled copies of known words
+    random.seed(42)
+    queries = [word for file_path in ner_files for word, _ in parse_ner_file(file_path)[0]
+               if word not in known and not is_punctuation(word)]
+    for word in random.sample(words, 300):
+        if len(word) > 3:
+            position = random.randrange(len(word))
+            queries.append(word[:position] + word[position + 1:])
+    print(f"Vocabulary: {len(words)} words, queries: {len(queries)} ({len(set(queries))} distinct)")
+
+    start = time.perf_counter()
+    expected = [rapidfuzz.process.extractOne(query, words, score_cutoff=80) for query in queries]
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = FuzzyIndex(words)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [index.extract_one(query, 80) for query in queries]
+    index_time = time.perf_counter() - start
+
+    print(f"Linear scan:  {scan_time:.2f}s")
+    print(f"Fuzzy index:  {index_time:.2f}s (+{build_time:.2f}s build), {scan_time / index_time:.1f}x faster")
+    print(f"Same results: {expected == actual}")
+
+    start = time.perf_counter()
+    resolved = resolve_fuzzy_matches(queries, words, 80)
+    batch_time = time.perf_counter() - start
+    print(f"Batched:      {batch_time:.2f}s on {mp.cpu_count()} processes, {scan_time / batch_time:.1f}x faster")
+    print(f"Same results: {expected == [resolved[query] for query in queries]}")
+
+
+if __name__ == "__main__":
+    main()
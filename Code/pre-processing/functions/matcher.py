@@ -0,0 +1,544 @@
+from collections import namedtuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rapidfuzz.fuzz import WRatio
+from tqdm import tqdm
+
+from functions import metrics
+from functions.alignment import align_ner_to_pos_dp_split
+from functions.corpus import corpus_file_pairs
+from functions.diagnostics import DiagnosticsWriter
+from functions.fuzzy_index import FuzzyIndex, resolve_fuzzy_matches
+from functions.row_writer import BUFFER_ROWS, RowWriter, pos_columns
+from functions.sequence_index import OccurrenceIndex, strict_sequential_positions
+from functions.token_store import PosTokenStore
+
+CONLLU_HEADER = [
+    "# newdoc",
+    "# sent_id = 1",
+    "# text = Generated combined NER and POS data",
+]
+CSV_HEADERS = ['word', 'ner_tag', 'lemma', 'upos', 'feats', 'head', 'deprel', 'deps', 'misc']
+CSV_UNMATCHED_HEADERS = ['word', 'ner_tag', 'reason']
+# "..." has no POS entry of its own and is always written with these columns
+ELLIPSIS = "..."
+ELLIPSIS_COLUMNS = ("...", "PUNCT", "_", "_", "_", "_", "_")
+STAT_KEYS = {
+    'direct': 'direct_matches',
+    'fuzzy': 'fuzzy_matches',
+    'ellipsis': 'punctuation_matches',
+    'punct': 'punctuation_matches',
+    'unmatched': 'unmatched',
+}
+PARQUET_SCHEMA = pa.schema([
+    ('ner_index', pa.int64()),
+    ('word', pa.string()),
+    ('ner_tag', pa.string()),
+    ('match_type', pa.string()),
+    ('score', pa.float64()),
+    ('pos_candidate', pa.string()),
+    ('pos_index', pa.int64()),
+    ('lemma', pa.string()),
+    ('upos', pa.string()),
+    ('feats', pa.string()),
+    ('head', pa.string()),
+    ('deprel', pa.string()),
+    ('deps', pa.string()),
+    ('misc', pa.string()),
+    ('reason', pa.string()),
+])
+
+# One NER word and what a strategy matched it to. kind is ellipsis, direct, fuzzy, punct (DP alignment only)
+# or unmatched, columns the lemma ... misc to write, score in [0, 1] and pos_index the POS entry used (or None)
+Match = namedtuple('Match', 'ner_index word tag kind columns score candidate pos_index reason')
+
+
+def is_punctuation(text):
+    return all(not c.isalnum() for c in text)
+
+
+def build_pos_lookup(pos_words):
+    """
+    Group the indices of every POS word in order of occurrence.
+    Works on a PosTokenStore or a plain list of POS entries, returns (lookup, unique words).
+    """
+    if isinstance(pos_words, PosTokenStore):
+        lookup = pos_words.positions()
+    else:
+        lookup = {}
+        for index, pos_entry in enumerate(pos_words):
+            lookup.setdefault(pos_entry[0], []).append(index)
+
+    return lookup, list(lookup)
+
+
+def pos_forms(pos_words):
+    """Return the word of every POS entry in order"""
+    if isinstance(pos_words, PosTokenStore):
+        return pos_words.forms()
+    return [entry[0] for entry in pos_words]
+
+
+def unmatched_reason(ner_word, lookup):
+    if is_punctuation(ner_word):
+        return "punctuation_no_pos"
+    if ner_word in lookup:
+        return "pos_exhausted"
+    return "no_match_found"
+
+
+def ner_word_tag(ner_entry):
+    return ner_entry[0], ner_entry[1] if len(ner_entry) > 1 else "_"
+
+
+class PosIndex:
+    """
+    The lookup tables of a POS word list, built once and shared by every strategy that runs on it: the indices
+    of every word in order, the distinct words, and on first use a FuzzyIndex, an OccurrenceIndex and the token
+    dicts of the DP alignment.
+    """
+
+    @metrics.timer("pos_index")
+    def __init__(self, pos_words):
+        self.pos_words = pos_words
+        self.lookup, self.words = build_pos_lookup(pos_words)
+        self._fuzzy = None
+        self._occurrences = None
+        self._alignment_tokens = None
+
+    def __len__(self):
+        return len(self.pos_words)
+
+    def __getitem__(self, index):
+        return self.pos_words[index]
+
+    @property
+    def fuzzy(self):
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex(self.words)
+        return self._fuzzy
+
+    @property
+    def occurrences(self):
+        if self._occurrences is None:
+            self._occurrences = OccurrenceIndex(pos_forms(self.pos_words), self.lookup)
+        return self._occurrences
+
+    def fuzzy_matches(self, words, threshold, processes=None, show_progress=True):
+        """extractOne of every word against the distinct POS words, in bulk over a pool unless processes is 1"""
+        if processes == 1:
+            with metrics.stage("fuzzy_match"):
+                return {word: self.fuzzy.extract_one(word, threshold) for word in words}
+        return resolve_fuzzy_matches(words, self.words, threshold, processes=processes, show_progress=show_progress)
+
+    def alignment_tokens(self):
+        """The POS entries as the token dicts of functions.alignment"""
+        if self._alignment_tokens is None:
+            self._alignment_tokens = [
+                {"WORD": entry[0], "LEMMA": entry[1], "POS_TAG": entry[2], "FEATS": entry[3], "HEAD": entry[4],
+                 "DEPREL": entry[5], "DEPS": entry[6], "MISC": entry[7]}
+                for entry in self.pos_words
+            ]
+        return self._alignment_tokens
+
+
+class FirstOccurrence:
+    """Exact matches take the first occurrence of the word, other words the first occurrence of their fuzzy match"""
+
+    name = "first_occurrence"
+
+    def __init__(self, threshold=80):
+        self.threshold = threshold
+
+    def matches(self, ner_words, index, show_progress=True):
+        for ner_index, ner_entry in enumerate(tqdm(ner_words, desc="Matching NER with POS",
+                                                   disable=not show_progress)):
+            ner_word, ner_tag = ner_word_tag(ner_entry)
+            if not ner_word.strip():
+                continue
+
+            if ner_word == ELLIPSIS:
+                yield Match(ner_index, ner_word, ner_tag, 'ellipsis', ELLIPSIS_COLUMNS, 1.0, ner_word, None, None)
+                continue
+
+            if ner_word in index.lookup:
+                pos_index = index.lookup[ner_word][0]
+                yield Match(ner_index, ner_word, ner_tag, 'direct', pos_columns(index[pos_index]), 1.0, ner_word,
+                            pos_index, None)
+                continue
+
+            if not is_punctuation(ner_word):
+                try:
+                    fuzzy_match = index.fuzzy.extract_one(ner_word, self.threshold)
+                    if fuzzy_match:
+                        best_match, score, _ = fuzzy_match
+                        pos_index = index.lookup[best_match][0]
+                        yield Match(ner_index, ner_word, ner_tag, 'fuzzy', pos_columns(index[pos_index], False),
+                                    score / 100, best_match, pos_index, None)
+                        continue
+                except Exception as e:
+                    print(f"Error matching '{ner_word}': {e}")
+
+            yield Match(ner_index, ner_word, ner_tag, 'unmatched', None, None, None, None,
+                        unmatched_reason(ner_word, index.lookup))
+
+    def stats(self):
+        return {}
+
+
+class UsageCountSequential:
+    """
+    Every word takes its occurrences in POS order, counting how many it used so far (the first one again when they
+    run out), for exact and fuzzy matches alike. Fuzzy matches are resolved in bulk before the loop.
+    """
+
+    name = "usage_count_sequential"
+
+    def __init__(self, threshold=80, processes=None):
+        self.threshold = threshold
+        self.processes = processes
+        self.word_usage_count = {}
+
+    def matches(self, ner_words, index, show_progress=True):
+        lookup = index.lookup
+        fuzzy_words = [
+            ner_entry[0] for ner_entry in ner_words
+            if ner_entry[0].strip() and ner_entry[0] != ELLIPSIS and ner_entry[0] not in lookup
+            and not is_punctuation(ner_entry[0])
+        ]
+        fuzzy_matches = index.fuzzy_matches(list(dict.fromkeys(fuzzy_words)), self.threshold,
+                                            processes=self.processes, show_progress=show_progress)
+        word_usage_count = self.word_usage_count = dict.fromkeys(index.words, 0)
+
+        def next_occurrence(word):
+            occurrences = lookup[word]
+            current_usage = word_usage_count[word]
+            if current_usage < len(occurrences):
+                word_usage_count[word] += 1
+                return occurrences[current_usage]
+            # If we've used all occurrences, cycle back to the first one
+            return occurrences[0]
+
+        for ner_index, ner_entry in enumerate(tqdm(ner_words, desc="Matching NER with POS",
+                                                   disable=not show_progress)):
+            ner_word, ner_tag = ner_word_tag(ner_entry)
+            if not ner_word.strip():
+                continue
+
+            if ner_word == ELLIPSIS:
+                yield Match(ner_index, ner_word, ner_tag, 'ellipsis', ELLIPSIS_COLUMNS, 1.0, ner_word, None, None)
+                continue
+
+            if ner_word in lookup:
+                pos_index = next_occurrence(ner_word)
+                yield Match(ner_index, ner_word, ner_tag, 'direct', pos_columns(index[pos_index]), 1.0, ner_word,
+                            pos_index, None)
+                continue
+
+            if not is_punctuation(ner_word):
+                try:
+                    fuzzy_match = fuzzy_matches[ner_word]
+                    if fuzzy_match:
+                        best_match, score, _ = fuzzy_match
+                        pos_index = next_occurrence(best_match)
+                        yield Match(ner_index, ner_word, ner_tag, 'fuzzy', pos_columns(index[pos_index], False),
+                                    score / 100, best_match, pos_index, None)
+                        continue
+                except Exception as e:
+                    print(f"Error matching '{ner_word}': {e}")
+
+            yield Match(ner_index, ner_word, ner_tag, 'unmatched', None, None, None, None,
+                        unmatched_reason(ner_word, lookup))
+
+    def stats(self):
+        return {'word_usage_stats': self.word_usage_count}
+
+
+class StrictWindow:
+    """
+    Words are matched in strict order, each one at or after the previous match (see strict_sequential_positions):
+    an exact hit at most max_lookahead tokens ahead, else a fuzzy match in a window around the current position.
+    """
+
+    name = "strict_window"
+
+    def __init__(self, threshold=80, max_lookahead=None):
+        self.threshold = threshold
+        self.max_lookahead = max_lookahead
+        self.pos_index = 0
+
+    def matches(self, ner_words, index, show_progress=True):
+        positions = strict_sequential_positions(ner_words, index.occurrences, self.threshold, self.max_lookahead,
+                                                is_punctuation)
+        self.pos_index = 0
+        progress = tqdm(ner_words, desc="Matching NER with POS sequentially", disable=not show_progress)
+        for ner_index, (ner_entry, found_index) in enumerate(zip(progress, positions)):
+            ner_word, ner_tag = ner_word_tag(ner_entry)
+            if not ner_word.strip():
+                continue
+
+            if ner_word == ELLIPSIS:
+                yield Match(ner_index, ner_word, ner_tag, 'ellipsis', ELLIPSIS_COLUMNS, 1.0, ner_word, None, None)
+            elif found_index != -1:
+                self.pos_index = found_index + 1
+                pos_info = index[found_index]
+                kind = 'direct' if pos_info[0] == ner_word else 'fuzzy'
+                # The window search only returns the position, score the word it found like extractOne did
+                score = 1.0 if kind == 'direct' else WRatio(ner_word, pos_info[0]) / 100
+                yield Match(ner_index, ner_word, ner_tag, kind, pos_columns(pos_info), score, pos_info[0], found_index,
+                            None)
+            else:
+                yield Match(ner_index, ner_word, ner_tag, 'unmatched', None, None, None, None,
+                            unmatched_reason(ner_word, index.lookup))
+
+    def stats(self):
+        return {'final_pos_index': self.pos_index}
+
+
+class DpAlignment:
+    """
+    The DP alignment of functions.alignment (align_ner_to_pos_dp_split). Words are split at punctuation first, so
+    ner_index counts the split tokens, and a word may take a span of short POS tokens. The table is quadratic in
+    memory, run it per article (as merge_corpus does) rather than on the whole corpus.
+    """
+
+    name = "dp_alignment"
+
+    def __init__(self, threshold=80, max_span=1):
+        self.threshold = threshold
+        self.max_span = max_span
+        self.split_count = 0
+
+    def matches(self, ner_words, index, show_progress=True):
+        ner_data = [{"WORD": word, "NER_TAG": tag} for word, tag in map(ner_word_tag, ner_words)]
+        rows = []
+        data = align_ner_to_pos_dp_split(ner_data, index.alignment_tokens(), self.threshold / 100, self.max_span,
+                                         diagnostics=rows)
+
+        self.split_count = sum(1 for row in rows if row['match_type'] != 'pos_unmatched')
+        combined = iter(data)
+        for row in rows:
+            if row['match_type'] == 'pos_unmatched':
+                continue
+            if row['match_type'] == 'unmatched':
+                yield Match(row['ner_index'], row['ner_word'], row['ner_tag'], 'unmatched', None, None, None, None,
+                            row['reason'])
+                continue
+            token = next(combined)
+            columns = (token['LEMMA'], token['POS_TAG'], token['FEATS'], token['HEAD'], token['DEPREL'],
+                       token['DEPS'], token['MISC'])
+            yield Match(row['ner_index'], row['ner_word'], row['ner_tag'], row['match_type'], columns, row['score'],
+                        row['pos_candidate'], None, None)
+
+    def stats(self):
+        return {'total_ner_words': self.split_count}
+
+
+STRATEGIES = {
+    strategy.name: strategy for strategy in (FirstOccurrence, UsageCountSequential, StrictWindow, DpAlignment)
+}
+
+
+class ConlluMatchWriter:
+    """The 'word<TAB><TAB>TAG<TAB>lemma...' lines of the .conllu matchers, unmatched words as 'word<TAB>TAG'"""
+
+    def __init__(self, output_file, unmatched_file, compression=None):
+        self.combined = RowWriter(output_file, csv_format=False, compression=compression)
+        self.unmatched = RowWriter(unmatched_file, csv_format=False, compression=compression)
+        for line in CONLLU_HEADER:
+            self.combined.writerow((line,))
+
+    def write(self, match, token_index):
+        if match.kind == 'unmatched':
+            self.unmatched.writerow((match.word, match.tag))
+        elif match.kind == 'ellipsis':
+            self.combined.writerow((match.word, "", match.tag) + ELLIPSIS_COLUMNS[:3])
+        else:
+            self.combined.writerow((match.word, "", match.tag) + match.columns)
+
+    def close(self):
+        self.combined.close()
+        self.unmatched.close()
+
+
+class CsvMatchWriter:
+    """The CSV of match_ner_with_pos_sequential_csv and its unmatched CSV with the reason of every miss"""
+
+    def __init__(self, output_file, unmatched_file, compression=None):
+        self.combined = RowWriter(output_file, CSV_HEADERS, compression=compression)
+        self.unmatched = RowWriter(unmatched_file, CSV_UNMATCHED_HEADERS, compression=compression)
+
+    def write(self, match, token_index):
+        if match.kind == 'unmatched':
+            self.unmatched.writerow((match.word, match.tag, match.reason))
+        else:
+            self.combined.writerow((match.word, match.tag) + match.columns)
+
+    def close(self):
+        self.combined.close()
+        self.unmatched.close()
+
+
+class ParquetMatchWriter:
+    """One row per NER word, matched or not, in a Parquet file (PARQUET_SCHEMA), POS columns as their CSV text"""
+
+    def __init__(self, output_file, batch_rows=BUFFER_ROWS):
+        self.writer = pq.ParquetWriter(output_file, PARQUET_SCHEMA)
+        self.batch_rows = batch_rows
+        self.rows = []
+
+    def write(self, match, token_index):
+        columns = match.columns or (None,) * 7
+        self.rows.append((match.ner_index, match.word, match.tag, match.kind, match.score, match.candidate,
+                          match.pos_index) + tuple(None if value is None else str(value) for value in columns)
+                         + (match.reason,))
+        if len(self.rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(zip(*self.rows), PARQUET_SCHEMA)],
+                schema=PARQUET_SCHEMA
+            ))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+class DiagnosticsMatchWriter:
+    """
+    Rows of functions.diagnostics for every NER word, replacing the earlier rows of ner_file. With the pos_words
+    the matches index into (a PosTokenStore) the rows name the POS file, sent_id and CoNLL-U ID of the match,
+    with a plain list of entries only pos_file, when given, and the pos_index.
+    """
+
+    def __init__(self, db_path, ner_file=None, pos_words=None, pos_file=None):
+        self.diagnostics = DiagnosticsWriter(db_path)
+        self.ner_file = ner_file
+        self.pos_file = str(pos_file) if pos_file is not None else None
+        self.locations = pos_words if isinstance(pos_words, PosTokenStore) else None
+        self.diagnostics.replace_file(ner_file, [])
+
+    def write(self, match, token_index):
+        row = {'ner_file': self.ner_file, 'ner_index': match.ner_index, 'ner_word': match.word,
+               'ner_tag': match.tag}
+        if match.kind == 'unmatched':
+            row.update({'match_type': 'unmatched', 'reason': match.reason})
+        else:
+            row.update({
+                'match_type': 'punct' if is_punctuation(match.word) else match.kind,
+                'score': match.score,
+                'pos_candidate': match.candidate,
+                'pos_file': self.pos_file,
+                'pos_index': match.pos_index,
+                'token_index': token_index,
+            })
+            if self.locations is not None and match.pos_index is not None:
+                row['pos_file'], row['pos_sent_id'], row['pos_token_id'] = self.locations.location(match.pos_index)
+        self.diagnostics.add([row])
+
+    def close(self):
+        self.diagnostics.close()
+
+
+class MatchEngine:
+    """
+    Matches NER words against one POS word list with any of the STRATEGIES, the PosIndex is built once and
+    shared. run() feeds the matches of a strategy to writers (ConlluMatchWriter, CsvMatchWriter,
+    ParquetMatchWriter, DiagnosticsMatchWriter) and compare() runs several strategies side by side.
+    """
+
+    def __init__(self, pos_words):
+        self.index = pos_words if isinstance(pos_words, PosIndex) else PosIndex(pos_words)
+
+    def run(self, ner_words, strategy, writers=(), show_progress=True):
+        """Match ner_words with strategy, write every match to the writers (closed at the end), returns the stats"""
+        matched_count = 0
+        match_stats = dict.fromkeys(['direct_matches', 'fuzzy_matches', 'punctuation_matches', 'unmatched'], 0)
+        try:
+            with metrics.stage(f"match.{strategy.name}"):
+                for match in strategy.matches(ner_words, self.index, show_progress):
+                    if match.kind != 'unmatched':
+                        matched_count += 1
+                    match_stats[STAT_KEYS[match.kind]] += 1
+                    for writer in writers:
+                        writer.write(match, matched_count)
+        finally:
+            for writer in writers:
+                writer.close()
+        for key, value in match_stats.items():
+            metrics.count(f"match.{key}", value)
+
+        # Strategies that split words (DP alignment) report their own number of NER words
+        strategy_stats = strategy.stats()
+        total = strategy_stats.pop('total_ner_words', len(ner_words))
+        stats = {
+            'strategy': strategy.name,
+            'matched_count': matched_count,
+            'unmatched_count': total - matched_count,
+            'total_ner_words': total,
+            'match_statistics': match_stats,
+            'match_rate': (matched_count / total) * 100 if total else 0,
+        }
+        stats.update(strategy_stats)
+        return stats
+
+    def compare(self, ner_words, strategies, writer_factories=(), show_progress=True):
+        """
+        Run every strategy on the same NER words and POS index. writer_factories are called with the strategy
+        name to create its writers. Returns {strategy name: stats}.
+        """
+        return {
+            strategy.name: self.run(ner_words, strategy, [factory(strategy.name) for factory in writer_factories],
+                                    show_progress=show_progress)
+            for strategy in strategies
+        }
+
+
+def main():
+    import tempfile
+    import time
+    from pathlib import Path
+
+    from functions.functions import parse_ner_file, process_conllu_file_store
+
+    corpus_dir = Path("../../Corpus/Files/")
+    pairs = corpus_file_pairs(corpus_dir / "NER Files in Corpus", corpus_dir / "POS Files in Corpus", ["1Part"])[:300]
+    ner_files = [ner_file for _, ner_file, _ in pairs]
+    pos_files = [pos_file for _, _, pos_file in pairs]
+
+    ner_words = []
+    for file_path in ner_files:
+        ner_words.extend(parse_ner_file(file_path)[0])
+    pos_words = PosTokenStore()
+    for file_path in pos_files:
+        pos_words.extend(process_conllu_file_store(file_path))
+
+    start = time.perf_counter()
+    engine = MatchEngine(pos_words)
+    print(f"POS index of {len(pos_words)} tokens: {time.perf_counter() - start:.2f}s")
+
+    strategies = [FirstOccurrence(), UsageCountSequential(processes=1), StrictWindow()]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        writers = [
+            lambda name: CsvMatchWriter(Path(tmp_dir) / f"{name}.csv", Path(tmp_dir) / f"{name}_unmatched.csv"),
+            lambda name: ParquetMatchWriter(Path(tmp_dir) / f"{name}.parquet"),
+        ]
+        for name, stats in engine.compare(ner_words, strategies, writers, show_progress=False).items():
+            print(f"{name:<24}{stats['match_rate']:6.2f}% matched  {stats['match_statistics']}")
+
+    # The DP alignment is quadratic, compare it on a single article
+    ner_words = parse_ner_file(ner_files[0])[0]
+    article = MatchEngine(process_conllu_file_store(pos_files[0]))
+    strategies.append(DpAlignment())
+    print(f"\n{ner_files[0].name}:")
+    for name, stats in article.compare(ner_words, strategies, show_progress=False).items():
+        print(f"{name:<24}{stats['match_rate']:6.2f}% matched  {stats['match_statistics']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+
+# Set by enable() so that worker processes started with spawn collect metrics too
+ENV_VAR = "PREPROCESSING_METRICS"
+PROFILERS = ('cprofile', 'sampling')
+SAMPLE_INTERVAL = 0.005
+REPORT_VERSION = 1
+
+
+class Metrics:
+    """Timers (name -> [calls, seconds]) and counters of one process, see snapshot() and merge()"""
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = Counter()
+        self.worker_tasks = 0
+        # Cache hits and misses of the workers ('<name>.hits', '<name>.misses'), see register_cache
+        self.caches = Counter()
+        # Profiles of the workers per stage, cProfile stats dicts or sampled stack counts
+        self.profiles = {}
+
+    def add_time(self, name, seconds):
+        entry = self.timers.get(name)
+        if entry is None:
+            self.timers[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def snapshot(self):
+        return {
+            'timers': {name: list(entry) for name, entry in self.timers.items()},
+            'counters': dict(self.counters),
+            'worker_tasks': self.worker_tasks,
+            'caches': dict(self.caches),
+            'profiles': {name: list(profiles) for name, profiles in self.profiles.items()},
+        }
+
+    def merge(self, snapshot):
+        for name, (calls, seconds) in snapshot['timers'].items():
+            entry = self.timers.setdefault(name, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        self.counters.update(snapshot['counters'])
+        self.worker_tasks += snapshot['worker_tasks']
+        self.caches.update(snapshot['caches'])
+        for name, profiles in snapshot['profiles'].items():
+            self.profiles.setdefault(name, []).extend(profiles)
+
+    def reset(self):
+        self.__init__()
+
+
+class State:
+    enabled = os.environ.get(ENV_VAR) == "1"
+    profiler = os.environ.get(f"{ENV_VAR}_PROFILER") or None
+    profile_dir = None
+    started = None
+    # One profiler runs at a time, a stage inside a profiled stage is part of the outer profile
+    profiling = False
+
+
+METRICS = Metrics()
+PROFILES = {}
+CACHES = {}
+
+
+def enable(profiler=None, profile_dir=None):
+    """
+    Turn on the timers and counters (and with a profiler, 'cprofile' or 'sampling', the profiles of every stage
+    written to profile_dir by write_report). Pool workers started after this collect metrics as well.
+    """
+    if profiler is not None and profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler {profiler!r}, expected one of {PROFILERS}")
+    State.enabled = True
+    State.profiler = profiler
+    State.profile_dir = Path(profile_dir) if profile_dir is not None else None
+    State.started = datetime.now(timezone.utc)
+    os.environ[ENV_VAR] = "1"
+    if profiler is not None:
+        os.environ[f"{ENV_VAR}_PROFILER"] = profiler
+
+
+def disable():
+    State.enabled = False
+    State.profiler = None
+    os.environ.pop(ENV_VAR, None)
+    os.environ.pop(f"{ENV_VAR}_PROFILER", None)
+
+
+def is_enabled():
+    return State.enabled
+
+
+def count(name, value=1):
+    if State.enabled:
+        METRICS.counters[name] += value
+
+
+def register_cache(name, function):
+    """Report the cache_info() of an lru_cache'd function in the run report"""
+    CACHES[name] = function
+
+
+def cache_counts():
+    counts = Counter()
+    for name, function in CACHES.items():
+        info = function.cache_info()
+        counts[f"{name}.hits"] = info.hits
+        counts[f"{name}.misses"] = info.misses
+    return counts
+
+
+class ProfileStats:
+    """cProfile stats of a worker in the form pstats.Stats loads (an object with create_stats() and stats)"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread every SAMPLE_INTERVAL seconds, written as collapsed 'a;b;c count' stacks"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.running = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        while self.running.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def enable(self):
+        self.running.set()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+    def disable(self):
+        self.running.clear()
+        self.thread.join()
+
+
+class timer:
+    """
+    Time a block (with timer(name): ...) or every call of a function (@timer(name)) under name, times include
+    those of nested timers. With profile the block is also profiled when a profiler is enabled, one profile per
+    name. Disabled, a block costs one attribute check and a decorated function one extra call.
+    """
+
+    __slots__ = ('name', 'profile', 'start', 'profiler')
+
+    def __init__(self, name, profile=False):
+        self.name = name
+        self.profile = profile
+        self.start = None
+        self.profiler = None
+
+    def __enter__(self):
+        if State.enabled:
+            if self.profile and State.profiler is not None and not State.profiling:
+                self.profiler = PROFILES.get(self.name)
+                if self.profiler is None:
+                    if State.profiler == 'cprofile':
+                        self.profiler = cProfile.Profile()
+                    else:
+                        self.profiler = SamplingProfiler(threading.get_ident())
+                    PROFILES[self.name] = self.profiler
+                State.profiling = True
+                self.profiler.enable()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            METRICS.add_time(self.name, time.perf_counter() - self.start)
+            self.start = None
+            if self.profiler is not None:
+                self.profiler.disable()
+                self.profiler = None
+                State.profiling = False
+
+    def __call__(self, function):
+        name = self.name
+        profile = self.profile
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            if not State.enabled:
+                return function(*args, **kwargs)
+            with timer(name, profile):
+                return function(*args, **kwargs)
+        return timed
+
+
+def stage(name):
+    """timer(name) that is also profiled when a profiler is enabled"""
+    return timer(name, profile=True)
+
+
+class WorkerTask:
+    """Run a pool task with fresh metrics in the worker and return them with its result, see imap"""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, item):
+        METRICS.reset()
+        PROFILES.clear()
+        before = cache_counts()
+        result = self.function(item)
+        METRICS.worker_tasks += 1
+        METRICS.caches.update(cache_counts() - before)
+        for name, profiler in PROFILES.items():
+            if isinstance(profiler, cProfile.Profile):
+                profiler.create_stats()
+                METRICS.profiles[name] = [profiler.stats]
+            else:
+                METRICS.profiles[name] = [dict(profiler.stacks)]
+        return result, METRICS.snapshot()
+
+
+def imap(pool, function, iterable, chunksize=1, unordered=False):
+    """
+    pool.imap (or imap_unordered) of function, with the metrics of every task merged into this process when
+    metrics are enabled. Disabled it is pool.imap itself.
+    """
+    pool_map = pool.imap_unordered if unordered else pool.imap
+    if not State.enabled:
+        yield from pool_map(function, iterable, chunksize=chunksize)
+        return
+    for result, snapshot in pool_map(WorkerTask(function), iterable, chunksize=chunksize):
+        METRICS.merge(snapshot)
+        yield result
+
+
+def run_report(extra=None):
+    """The timers (slowest first), counters, cache statistics and profiles of this run as a JSON-able dict"""
+    timers = {
+        name: {'calls': calls, 'seconds': round(seconds, 6), 'mean_seconds': round(seconds / calls, 6)}
+        for name, (calls, seconds) in sorted(METRICS.timers.items(), key=lambda item: -item[1][1])
+    }
+    counts = cache_counts() + METRICS.caches
+    caches = {name: {'hits': counts[f"{name}.hits"], 'misses': counts[f"{name}.misses"]} for name in CACHES}
+
+    report = {
+        'version': REPORT_VERSION,
+        'started': State.started.isoformat(timespec='seconds') if State.started else None,
+        'finished': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'argv': sys.argv,
+        'python': platform.python_version(),
+        'timers': timers,
+        'counters': dict(sorted(METRICS.counters.items())),
+        'worker_tasks': METRICS.worker_tasks,
+        'caches': caches,
+        'profiles': {},
+    }
+    if extra:
+        report.update(extra)
+    return report
+
+
+def write_report(path, extra=None):
+    """Write run_report() to path, and the profiles next to it (or to the profile_dir given to enable())"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report = run_report(extra)
+
+    profile_dir = Path(State.profile_dir or path.parent)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    for name in PROFILES.keys() | METRICS.profiles.keys():
+        profiles = [PROFILES[name]] if name in PROFILES else []
+        if State.profiler == 'cprofile':
+            profiles += [ProfileStats(stats) for stats in METRICS.profiles.get(name, [])]
+            profile_path = profile_dir / f"{path.stem}.{name}.prof"
+            pstats.Stats(*profiles).dump_stats(profile_path)
+        else:
+            stacks = Counter()
+            for profile in profiles:
+                stacks.update(profile.stacks)
+            for profile in METRICS.profiles.get(name, []):
+                stacks.update(profile)
+            profile_path = profile_dir / f"{path.stem}.{name}.folded"
+            with profile_path.open("w", encoding="utf-8") as f:
+                for stack, samples in stacks.most_common():
+                    f.write(f"{stack} {samples}\n")
+        report['profiles'][name] = str(profile_path)
+
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
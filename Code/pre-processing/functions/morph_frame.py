@@ -0,0 +1,107 @@
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+
+from functions.conllu_reader import parse_dict
+
+DICT_ITEM = re.compile(r"""(['"])(.*?)\1\s*:\s*(?:(['"])(.*?)\3|(None))""")
+BASE_COLUMNS = ['Word', 'Lemma', 'NER_Tag', 'POS_Tag']
+
+
+def parse_feats_value(value):
+    """
+    Parse one feats value into a dict, either a dict repr ({'Case': 'Nom'}) or a CoNLL-U 'Key=Val|Key=Val' string.
+    Anything else (empty, '_', a value that is not a dict) gives an empty dict.
+    """
+    if not isinstance(value, str):
+        return {}
+    value = value.strip()
+
+    if value.startswith('{'):
+        parsed = {match[2]: match[4] if match[5] is None else None for match in DICT_ITEM.finditer(value)}
+        if repr(parsed) == value:
+            return parsed
+        # Escaped quotes or other unusual values, let Python read it
+        try:
+            parsed = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
+
+    if '=' in value:
+        return parse_dict(value) or {}
+    return {}
+
+
+def morph_columns(feats):
+    """
+    Flatten a Series of feats values into one categorical column per feature, like pd.json_normalize would.
+    Every distinct feats string is parsed only once, the rows are then filled in from integer codes.
+    """
+    codes, uniques = pd.factorize(feats)
+    parsed = [parse_feats_value(value) for value in uniques]
+    keys = dict.fromkeys(key for features in parsed for key in features)
+
+    columns = {}
+    for key in keys:
+        value_codes, categories = pd.factorize(pd.Series([features.get(key) for features in parsed], dtype=object))
+        # Rows without feats have code -1, which picks the trailing -1 (missing)
+        value_codes = np.append(value_codes, -1)
+        columns[key] = pd.Categorical.from_codes(value_codes[codes], categories=categories)
+    return columns
+
+
+def flatten_chunk(df):
+    """
+    Turn a chunk of combined_words.csv into Word, Lemma, NER_Tag, POS_Tag and one column per morphological feature.
+    Reads both the word,ner_tag,lemma,upos,feats,... layout and the older word,ner,pos layout where pos is
+    'word|lemma|upos|feats|...'.
+    """
+    if 'pos' in df.columns:
+        pos_split = df['pos'].str.split('|', n=4, expand=True).reindex(columns=range(4))
+        base = [df['word'], pos_split[1], df['ner'], pos_split[2]]
+        feats = pos_split[3]
+    else:
+        base = [df['word'], df['lemma'], df['ner_tag'], df['upos']]
+        feats = df['feats']
+
+    flattened = {name: pd.Categorical(column.to_numpy()) for name, column in zip(BASE_COLUMNS, base)}
+    flattened.update(morph_columns(feats))
+    return pd.DataFrame(flattened, index=df.index)
+
+
+def iter_flattened_frames(csv_path, chunksize=200_000):
+    """Read combined_words.csv in chunks and yield every chunk flattened"""
+    for chunk in pd.read_csv(csv_path, dtype=str, chunksize=chunksize):
+        yield flatten_chunk(chunk)
+
+
+def concat_categorical_frames(frames):
+    """Concatenate flattened chunks, merging the categories of every column so it stays categorical"""
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame(columns=BASE_COLUMNS)
+
+    columns = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+    no_categories = pd.Index([], dtype=object)
+    merged = {}
+    for column in columns:
+        parts = []
+        for frame in frames:
+            part = frame[column].array if column in frame.columns else None
+            if part is None or not len(part.categories):
+                # A feature missing from the whole chunk, its categories must still be strings to be merged
+                part = pd.Categorical([None] * len(frame), categories=no_categories)
+            parts.append(part)
+        merged[column] = pd.api.types.union_categoricals(parts)
+    return pd.DataFrame(merged)
+
+
+def load_flattened_frame(csv_path, chunksize=200_000):
+    """
+    Load combined_words.csv as a flattened DataFrame with categorical columns.
+    Same rows and columns as splitting the pos column and running pd.json_normalize over the parsed feats.
+    """
+    return concat_categorical_frames(iter_flattened_frames(csv_path, chunksize=chunksize))
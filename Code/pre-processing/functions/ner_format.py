@@ -0,0 +1,109 @@
+import multiprocessing as mp
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+from tqdm import tqdm
+
+from functions.corpus import CORPUS_DIRECTORIES, natural_key
+
+# A file format_ner_file leaves as it is: 'word<TAB><TAB>TAG', single word and empty lines, each ending in \n
+CANONICAL = re.compile(rb'(?:[^\s\x1c-\x1f]+(?:\t\t[^\s\x1c-\x1f]+)?\n|\n)*')
+# Characters outside ASCII that str.split() also splits on (NEL, no-break and the other Unicode spaces)
+UNICODE_SPACE = re.compile(rb'\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80')
+
+
+def format_ner_line(line):
+    """Format one line so that the tag is exactly 2 tabs away from the word"""
+    line = line.strip()
+
+    # Keep empty lines empty
+    if not line:
+        return '\n'
+
+    # Split by any whitespace/tabs
+    parts = line.split()
+    if len(parts) >= 2:
+        return f"{parts[0]}\t\t{parts[1]}\n"
+    # If line doesn't have both word and tag, keep as is
+    return f"{line}\n"
+
+
+def is_canonical(file_path):
+    """Check from the bytes of a file, without decoding it, whether format_ner_file would leave it unchanged"""
+    data = Path(file_path).read_bytes()
+    return CANONICAL.fullmatch(data) is not None and UNICODE_SPACE.search(data) is None
+
+
+def current_umask():
+    """The umask of the process, which can only be read by setting it"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def format_ner_file(input_file, output_file=None):
+    """
+    Format NER file so that each tag is exactly 2 tabs away from the word.
+
+    The lines are streamed to a temporary file next to output_file (default: input_file), which then replaces it
+    in one rename, so input_file may be the output too and an interrupted run leaves the old file in place.
+    Returns the number of lines read and the number of them that changed.
+    """
+    output_path = Path(output_file or input_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    lines = changed = 0
+    fd, tmp_name = tempfile.mkstemp(dir=output_path.parent, prefix=f".{output_path.name}.", suffix=".tmp")
+    try:
+        with open(input_file, 'r', encoding='utf-8') as f_input, \
+                os.fdopen(fd, 'w', encoding='utf-8') as f_output:
+            for line in f_input:
+                formatted_line = format_ner_line(line)
+                f_output.write(formatted_line)
+                lines += 1
+                changed += formatted_line != line
+        if output_path.exists():
+            shutil.copymode(output_path, tmp_name)
+        else:
+            # mkstemp creates the file readable by its owner only, give it the mode open() would have
+            os.chmod(tmp_name, 0o666 & ~current_umask())
+        os.replace(tmp_name, output_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    return lines, changed
+
+
+def format_in_place(file_path):
+    """Format one file in place unless it is already canonical, returns a report of what happened to it"""
+    report = {'file': file_path, 'status': 'unchanged', 'lines': 0, 'changed': 0}
+    try:
+        if not is_canonical(file_path):
+            report['lines'], report['changed'] = format_ner_file(file_path)
+            report['status'] = 'formatted'
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error formatting {file_path}: {e}")
+        report['status'] = 'error'
+    return report
+
+
+def ner_corpus_files(ner_path, directories=CORPUS_DIRECTORIES):
+    """The NER .txt files of every corpus directory, in natural order"""
+    file_paths = []
+    for directory in directories:
+        file_paths.extend(sorted((Path(ner_path) / directory).glob("*.txt"), key=lambda f: natural_key(f.name)))
+    return file_paths
+
+
+def format_ner_corpus(ner_path, directories=CORPUS_DIRECTORIES, processes=None, chunksize=16):
+    """Format every NER file of the corpus directories in place over a process pool, returns the per file reports"""
+    file_paths = ner_corpus_files(ner_path, directories)
+    processes = processes or mp.cpu_count()
+
+    with mp.Pool(processes=processes) as pool:
+        reports = list(tqdm(pool.imap(format_in_place, file_paths, chunksize=chunksize), total=len(file_paths),
+                            desc="Formatting NER files"))
+    return reports
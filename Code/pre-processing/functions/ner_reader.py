@@ -0,0 +1,224 @@
+import mmap
+import re
+from array import array
+from pathlib import Path
+
+from functions.conllu_cache import cached
+from functions.corpus import natural_key
+from functions.normalization import normalize_quotes
+from functions.sentence_counts import SENTENCE_BLOCK
+
+# A blank line followed by more text, files without one (single articles) are split on end punctuation
+SENTENCE_SEPARATOR = re.compile(rb'\n[ \t\r]*\n[ \t\r]*\S')
+SENTENCE_END = {".", "!", "?"}
+
+
+def parse_ner_line(line):
+    """Return (word, tag) of a 'word<TAB><TAB>TAG' line the same way parse_ner_file reads it, or None"""
+    parts = [part.strip() for part in normalize_quotes(line).split("\t") if part.strip()]
+    if len(parts) >= 2:
+        return parts[0], parts[1]
+    return None
+
+
+class NerCorpus:
+    """
+    Memory mapped reader of a NER file such as Corpus/korpusi.txt.
+
+    records() yields (word, tag code, sentence id) lazily, tags are interned to small integers (tags[code] is the
+    tag). Sentences are runs of non-blank lines, or end on a . ! or ? token in files without blank lines.
+    build_index() records the byte range of every sentence, after which sentence(id) slices just that range.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tags = []
+        self.tag_codes = {}
+        self.starts = None
+        self.ends = None
+        self._file = self.path.open("rb")
+        try:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.path.stat().st_size else b''
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        self.split_on_blank_lines = SENTENCE_SEPARATOR.search(self.data) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def tag_code(self, tag):
+        code = self.tag_codes.get(tag)
+        if code is None:
+            code = self.tag_codes[tag] = len(self.tags)
+            self.tags.append(tag)
+        return code
+
+    def lines(self, start=0, end=None):
+        """Yield (start, end, decoded line) of the lines between two byte offsets"""
+        end = len(self.data) if end is None else end
+        offset = start
+        for raw in self.data[start:end].split(b'\n'):
+            stop = min(offset + len(raw) + 1, end)
+            yield offset, stop, raw.decode("utf-8")
+            offset = stop
+
+    def blocks(self):
+        """Yield the (start, end) byte range of every run of non-blank lines, or of the whole file"""
+        if not self.split_on_blank_lines:
+            if self.data:
+                yield 0, len(self.data)
+            return
+        for match in SENTENCE_BLOCK.finditer(self.data):
+            yield match.start(), match.end()
+
+    def spans(self):
+        """Yield (sentence id, start offset, end offset, records) of every sentence, records being (word, tag code)"""
+        sentence_id = 0
+        tag_codes = self.tag_codes
+        for block_start, block_end in self.blocks():
+            raw = self.data[block_start:block_end]
+            # The quote table maps single characters and keeps newlines and tabs, so lines stay aligned with raw
+            lines = normalize_quotes(raw.decode("utf-8")).split("\n")
+            lengths = [len(line) + 1 for line in raw.split(b'\n')] if not self.split_on_blank_lines else None
+
+            start = offset = block_start
+            records = []
+            for index, line in enumerate(lines):
+                if lengths is not None:
+                    offset = min(offset + lengths[index], block_end)
+                parts = line.split("\t")
+                if len(parts) != 3 or parts[1] or not parts[0].strip() or not parts[2].strip():
+                    # Not the usual 'word<TAB><TAB>TAG', keep the non-blank parts like parse_ner_file
+                    parts = [part for part in parts if part.strip()]
+                    if len(parts) < 2:
+                        continue
+                    parts.insert(1, "")
+                word = parts[0].strip()
+                tag = parts[2].strip()
+                code = tag_codes.get(tag)
+                if code is None:
+                    code = self.tag_code(tag)
+                records.append((word, code))
+                if lengths is not None and word in SENTENCE_END:
+                    yield sentence_id, start, offset, records
+                    sentence_id += 1
+                    start = offset
+                    records = []
+            if self.split_on_blank_lines or records:
+                yield sentence_id, start, block_end, records
+                sentence_id += 1
+
+    def records(self):
+        """Yield (word, tag code, sentence id) for every token of the file, in order"""
+        for sentence_id, _, _, records in self.spans():
+            for word, code in records:
+                yield word, code, sentence_id
+
+    def build_index(self, cache_dir=None):
+        """
+        Record the byte range of every sentence. With a cache_dir the offsets are kept on disk (see conllu_cache)
+        together with the tag vocabulary, and reused until the file changes.
+        """
+        def compute(_):
+            starts = array('Q')
+            ends = array('Q')
+            for _, start, end, _ in self.spans():
+                starts.append(start)
+                ends.append(end)
+            return {"starts": starts, "ends": ends, "tags": list(self.tags)}
+
+        sections = cached(self.path, "ner_sentence_offsets", compute, dict, dict, cache_dir=cache_dir)
+        self.starts = sections["starts"]
+        self.ends = sections["ends"]
+        for tag in sections["tags"]:
+            self.tag_code(tag)
+        return self
+
+    def __len__(self):
+        if self.starts is None:
+            self.build_index()
+        return len(self.starts)
+
+    def sentence(self, sentence_id):
+        """Return the (word, tag) pairs of one sentence, reading only its byte range"""
+        if self.starts is None:
+            self.build_index()
+        tokens = []
+        for _, _, line in self.lines(self.starts[sentence_id], self.ends[sentence_id]):
+            record = parse_ner_line(line)
+            if record is not None:
+                tokens.append(record)
+        return tokens
+
+
+def read_ner_records(path):
+    """Yield (word, tag, sentence id) for every token of a NER file"""
+    with NerCorpus(path) as corpus:
+        for word, code, sentence_id in corpus.records():
+            yield word, corpus.tags[code], sentence_id
+
+
+def main():
+    import tempfile
+    import time
+
+    # The shipped NER articles joined like Corpus/korpusi.txt, one token per line and a blank line after sentences
+    ner_dir = Path("../../Corpus/Files/NER Files in Corpus/")
+    file_paths = sorted(ner_dir.glob("*Part/*.txt"), key=lambda f: natural_key(f.as_posix()))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_path = Path(tmp_dir) / "korpusi.txt"
+        with corpus_path.open("w", encoding="utf-8") as f:
+            for file_path in file_paths:
+                with NerCorpus(file_path) as article:
+                    for _, start, end, _ in article.spans():
+                        f.write(article.data[start:end].decode("utf-8").rstrip("\n") + "\n\n")
+
+        start = time.perf_counter()
+        expected = []
+        with corpus_path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = parse_ner_line(line)
+                    if record:
+                        expected.append(record)
+        line_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with NerCorpus(corpus_path) as corpus:
+            actual = [(word, corpus.tags[code]) for word, code, _ in corpus.records()]
+        mmap_time = time.perf_counter() - start
+
+        print(f"{corpus_path.stat().st_size / 2 ** 20:.1f} MB, {len(actual)} tokens")
+        print(f"Line reader:           {line_time:.2f}s")
+        print(f"Memory mapped reader:  {mmap_time:.2f}s, same tokens: {expected == actual}")
+
+        with NerCorpus(corpus_path) as corpus:
+            start = time.perf_counter()
+            corpus.build_index()
+            index_time = time.perf_counter() - start
+
+            sample = range(0, len(corpus), 50)
+            start = time.perf_counter()
+            sliced = [corpus.sentence(i) for i in sample]
+            slice_time = time.perf_counter() - start
+
+            by_sentence = {}
+            for word, code, sentence_id in corpus.records():
+                by_sentence.setdefault(sentence_id, []).append((word, corpus.tags[code]))
+            same = sliced == [by_sentence.get(i, []) for i in sample]
+
+        print(f"Offsets index:         {index_time:.2f}s for {len(corpus)} sentences, {len(corpus.tags)} tags")
+        print(f"Sliced {len(sample)} sentences: {slice_time:.3f}s, same tokens: {same}")
+
+
+if __name__ == "__main__":
+    main()
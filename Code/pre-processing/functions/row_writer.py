@@ -0,0 +1,103 @@
+import bz2
+import csv
+import gzip
+import lzma
+from pathlib import Path
+
+from functions.metrics import timer
+
+# Rows kept in memory before they are written in one writerows / write call
+BUFFER_ROWS = 8192
+COMPRESSION = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+COMPRESSION_SUFFIXES = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+}
+POS_COLUMNS = 7
+MISSING_COLUMNS = ("_",) * POS_COLUMNS
+
+
+def pos_columns(pos_info, fill_empty=True):
+    """
+    The lemma, upos, feats, head, deprel, deps and misc of a POS entry as a fixed-width tuple, "_" for missing
+    columns. With fill_empty empty values (None, "", {}) become "_" too, as the exact match branches write them.
+    """
+    if len(pos_info) > POS_COLUMNS:
+        lemma, upos, feats, head, deprel, deps, misc = pos_info[1:POS_COLUMNS + 1]
+    else:
+        lemma, upos, feats, head, deprel, deps, misc = (tuple(pos_info[1:]) + MISSING_COLUMNS)[:POS_COLUMNS]
+    if fill_empty:
+        return (lemma or "_", upos or "_", feats or "_", head or "_", deprel or "_", deps or "_", misc or "_")
+    return lemma, upos, feats, head, deprel, deps, misc
+
+
+def open_output(path, compression=None, newline=''):
+    """Open a text file for writing, compressed with gzip, bz2 or xz when asked for or when its suffix says so"""
+    compression = compression or COMPRESSION_SUFFIXES.get(Path(path).suffix)
+    if compression is None:
+        return open(path, "w", encoding="utf-8", newline=newline)
+    return COMPRESSION[compression](path, "wt", encoding="utf-8", newline=newline)
+
+
+class RowWriter:
+    """
+    Buffered writer of the rows of the matchers. Rows are collected and written BUFFER_ROWS at a time, as CSV with
+    csv.writer.writerows or, with csv_format=False, as tab separated lines (str() of every value, like the f-strings
+    they replace). file may be a path, opened with open_output, or an already open text file that is left open.
+    """
+
+    def __init__(self, file, header=None, csv_format=True, buffer_rows=BUFFER_ROWS, compression=None):
+        self.owns_file = isinstance(file, (str, Path))
+        # csv.writer ends rows itself, tab separated lines get the platform newline like the files they replace
+        self.file = open_output(file, compression, '' if csv_format else None) if self.owns_file else file
+        self.csv_writer = csv.writer(self.file) if csv_format else None
+        self.buffer_rows = buffer_rows
+        self.rows = []
+        # '%s\t%s...\n' per row width, %-formatting is faster than joining str() of every value
+        self.line_formats = {}
+        if header is not None:
+            self.writerow(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def writerow(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    def writerows(self, rows):
+        self.rows.extend(rows)
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    @timer("write.rows")
+    def flush(self):
+        if not self.rows:
+            return
+        if self.csv_writer is not None:
+            self.csv_writer.writerows(self.rows)
+        else:
+            formats = self.line_formats
+            lines = []
+            for row in self.rows:
+                row = tuple(row)
+                line_format = formats.get(len(row))
+                if line_format is None:
+                    line_format = formats[len(row)] = "\t".join(["%s"] * len(row)) + "\n"
+                lines.append(line_format % row)
+            self.file.write("".join(lines))
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.owns_file:
+            self.file.close()
@@ -0,0 +1,106 @@
+import mmap
+import multiprocessing as mp
+import re
+from contextlib import contextmanager
+from pathlib import Path
+
+from tqdm import tqdm
+
+from functions.corpus import CORPUS_DIRECTORIES, corpus_file_pairs
+
+# A run of consecutive non-blank lines, the way conllu.parse splits sentences
+SENTENCE_BLOCK = re.compile(rb'[^\n]*\S[^\n]*(?:\n[^\n]*\S[^\n]*)*')
+SENT_ID = re.compile(rb'^[ \t]*#[ \t]*sent_id\b', re.MULTILINE)
+BLANK_LINE = re.compile(rb'^[ \t\r\f\v]*$', re.MULTILINE)
+# NER lines are 'word<TAB><TAB>TAG', a sentence ends on a . ! or ? token
+NER_SENTENCE_END = re.compile(rb'^[.!?][ \t]', re.MULTILINE)
+
+
+@contextmanager
+def mapped(file_path):
+    """Memory map a file read-only, empty files (which cannot be mapped) give b''"""
+    with Path(file_path).open("rb") as f:
+        if Path(file_path).stat().st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def count_blocks(data):
+    return sum(1 for _ in SENTENCE_BLOCK.finditer(data))
+
+
+def count_conllu_sentences(file_path):
+    """Return (sentences, sent_id markers) of a CoNLL-U file, sentences are counted like len(conllu.parse(...))"""
+    with mapped(file_path) as data:
+        return count_blocks(data), len(SENT_ID.findall(data))
+
+
+def count_blank_lines(file_path):
+    """Count the lines that are empty or only whitespace, like counting line.strip() == '' over readlines()"""
+    with mapped(file_path) as data:
+        count = len(BLANK_LINE.findall(data))
+        # The pattern also matches the empty remainder after a trailing newline, which is not a line
+        if not data or data[-1:] == b'\n':
+            count -= 1
+        return count
+
+
+def count_ner_sentences(file_path):
+    """
+    Count the sentences of a NER file. Files with blank lines are split on them,
+    files without (one article per file) are split after every . ! or ? token like the combined files.
+    """
+    with mapped(file_path) as data:
+        if re.search(rb'\n[ \t\r]*\n[ \t\r]*\S', data):
+            return count_blocks(data)
+
+        count = len(NER_SENTENCE_END.findall(data))
+        last_line = data[-4096:].rstrip().rsplit(b'\n', 1)[-1].lstrip()
+        if last_line and not NER_SENTENCE_END.match(last_line):
+            count += 1  # Tokens after the last sentence end
+        return count
+
+
+def count_pair(pair):
+    directory, ner_file, pos_file = pair
+    try:
+        pos_sentences, pos_sent_ids = count_conllu_sentences(pos_file)
+        ner_sentences = count_ner_sentences(ner_file)
+    except OSError as e:
+        print(f"Error counting {ner_file} and {pos_file}: {e}")
+        return None
+    return {
+        'directory': directory,
+        'ner_file': ner_file.name,
+        'pos_file': pos_file.name,
+        'ner_sentences': ner_sentences,
+        'pos_sentences': pos_sentences,
+        'pos_sent_ids': pos_sent_ids,
+    }
+
+
+def count_corpus_sentences(ner_path, pos_path, directories=CORPUS_DIRECTORIES, processes=None, chunksize=32):
+    """Count the NER and POS sentences of every file pair over a process pool, returns one row per pair"""
+    pairs = corpus_file_pairs(Path(ner_path), Path(pos_path), directories)
+    processes = processes or mp.cpu_count()
+
+    with mp.Pool(processes=processes) as pool:
+        rows = list(tqdm(pool.imap(count_pair, pairs, chunksize=chunksize), total=len(pairs), desc="Counting sentences"))
+    return [row for row in rows if row is not None]
+
+
+def disagreements(rows):
+    """Rows whose NER and POS sentence counts differ, or whose POS sentences and sent_id markers differ"""
+    return [row for row in rows
+            if row['ner_sentences'] != row['pos_sentences'] or row['pos_sentences'] != row['pos_sent_ids']]
+
+
+def write_count_report(rows, report_file):
+    columns = ['directory', 'ner_file', 'pos_file', 'ner_sentences', 'pos_sentences', 'pos_sent_ids']
+    Path(report_file).parent.mkdir(parents=True, exist_ok=True)
+    with Path(report_file).open("w", encoding="utf-8") as f:
+        f.write("\t".join(columns) + "\n")
+        for row in rows:
+            f.write("\t".join(str(row[column]) for column in columns) + "\n")
@@ -0,0 +1,158 @@
+from bisect import bisect_left
+
+import rapidfuzz.process
+
+# Fuzzy window of match_ner_with_pos_strict_sequential around the current POS position
+WINDOW_BEFORE = 50
+WINDOW_AFTER = 100
+
+
+class OccurrenceIndex:
+    """
+    Sorted occurrence lists of every POS form, for the strict sequential matcher.
+
+    next_occurrence finds the first position >= start of a word with a bisect instead of scanning forward,
+    fuzzy_in_window runs extractOne over the distinct words of the window around a position, which is
+    built once per window and reused, with the results, while the position does not move.
+    """
+
+    def __init__(self, words, positions=None):
+        self.words = words
+        if positions is None:
+            positions = {}
+            for index, word in enumerate(words):
+                positions.setdefault(word, []).append(index)
+        self.positions = positions
+        self._window = None
+        self._window_vocabulary = None
+        self._fuzzy_cache = {}
+
+    def __len__(self):
+        return len(self.words)
+
+    def next_occurrence(self, word, start, max_lookahead=None):
+        """Return the first position >= start of word or -1, with max_lookahead only before start + max_lookahead"""
+        occurrences = self.positions.get(word)
+        if not occurrences:
+            return -1
+        i = bisect_left(occurrences, start)
+        if i == len(occurrences):
+            return -1
+        found = occurrences[i]
+        if max_lookahead is not None and found >= start + max_lookahead:
+            return -1
+        return found
+
+    def window_vocabulary(self, position):
+        """Return (start, distinct words in order of first occurrence) of the window around position"""
+        window = (max(0, position - WINDOW_BEFORE), min(len(self.words), position + WINDOW_AFTER))
+        if window != self._window:
+            self._window = window
+            self._window_vocabulary = list(dict.fromkeys(self.words[window[0]:window[1]]))
+            self._fuzzy_cache = {}
+        return window[0], self._window_vocabulary
+
+    def fuzzy_in_window(self, word, position, threshold=80):
+        """
+        Return the position of the best fuzzy match of word in the window around position, or -1.
+        Same as extractOne over the window slice followed by a scan for the first occurrence of the match.
+        """
+        window_start, vocabulary = self.window_vocabulary(position)
+        key = (word, threshold)
+        if key not in self._fuzzy_cache:
+            match = rapidfuzz.process.extractOne(word, vocabulary, score_cutoff=threshold)
+            self._fuzzy_cache[key] = self.next_occurrence(match[0], window_start) if match else -1
+        return self._fuzzy_cache[key]
+
+
+def strict_sequential_positions(ner_words, index, threshold=80, max_lookahead=None, is_punctuation=None):
+    """
+    Yield the POS position matched by every NER entry in strict sequential order, -1 when it is unmatched
+    and None for the entries the matcher skips (empty words and '...').
+    An exact hit at or after the current position wins, otherwise the best fuzzy match in the window.
+    """
+    pos_index = 0
+    for ner_entry in ner_words:
+        ner_word = ner_entry[0]
+        if not ner_word.strip() or ner_word == "...":
+            yield None
+            continue
+
+        found_index = index.next_occurrence(ner_word, pos_index, max_lookahead)
+        if found_index == -1 and not (is_punctuation and is_punctuation(ner_word)):
+            try:
+                found_index = index.fuzzy_in_window(ner_word, pos_index, threshold)
+            except Exception as e:
+                print(f"Error matching '{ner_word}': {e}")
+
+        if found_index != -1:
+            pos_index = found_index + 1
+        yield found_index
+
+
+def linear_strict_sequential_positions(ner_words, words, threshold=80, is_punctuation=None):
+    """The original forward scan of match_ner_with_pos_strict_sequential, kept as the benchmark reference"""
+    pos_index = 0
+    for ner_entry in ner_words:
+        ner_word = ner_entry[0]
+        if not ner_word.strip() or ner_word == "...":
+            yield None
+            continue
+
+        found_index = -1
+        for i in range(pos_index, len(words)):
+            if words[i] == ner_word:
+                found_index = i
+                break
+
+        if found_index == -1 and not (is_punctuation and is_punctuation(ner_word)):
+            window_start = max(0, pos_index - WINDOW_BEFORE)
+            window_end = min(len(words), pos_index + WINDOW_AFTER)
+            matches = rapidfuzz.process.extractOne(ner_word, words[window_start:window_end], score_cutoff=threshold)
+            if matches:
+                for i in range(window_start, window_end):
+                    if words[i] == matches[0]:
+                        found_index = i
+                        break
+
+        if found_index != -1:
+            pos_index = found_index + 1
+        yield found_index
+
+
+def main():
+    import time
+    from pathlib import Path
+
+    from functions.functions import is_punctuation, parse_ner_file, process_conllu_file_store
+    from functions.token_store import PosTokenStore
+
+    corpus_dir = Path("../../Corpus/Files/")
+    pos_files = sorted((corpus_dir / "POS Files in Corpus").glob("2Part/*.conllu"))[:600]
+    ner_files = sorted((corpus_dir / "NER Files in Corpus").glob("2Part/*.txt"))[:600]
+
+    store = PosTokenStore()
+    for file_path in pos_files:
+        store.extend(process_conllu_file_store(file_path))
+    ner_words = [entry for file_path in ner_files for entry in parse_ner_file(file_path)[0]]
+    words = store.forms()
+    print(f"POS: {len(words)} tokens")
+
+    start = time.perf_counter()
+    expected = list(linear_strict_sequential_positions(ner_words, words, is_punctuation=is_punctuation))
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = OccurrenceIndex(words, store.positions())
+    actual = list(strict_sequential_positions(ner_words, index, is_punctuation=is_punctuation))
+    index_time = time.perf_counter() - start
+
+    misses = sum(1 for position in expected if position == -1)
+    print(f"NER: {len(ner_words)} words, {misses} unmatched")
+    print(f"Linear scan:      {scan_time:.2f}s")
+    print(f"Occurrence index: {index_time:.2f}s, {scan_time / index_time:.1f}x faster")
+    print(f"Same results: {expected == actual}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,12 @@
 from pathlib import Path
-from conllu import parse
+
+from functions.sentence_counts import count_blank_lines, count_conllu_sentences
 
 def count_sentences_pos(conllu_dir):
 
     def count_sentences_in_file(file_path):
         try:
-            with Path(file_path).open(encoding="utf-8") as f:
-                data = f.read()
-
-            sentences = parse(data)
-            return len(sentences)
+            return count_conllu_sentences(file_path)[0]
         except Exception as e:
             print(f"Error processing {file_path}: {e}")
             return 0
@@ -27,11 +24,7 @@ def count_sentences_pos(conllu_dir):
 
 def count_sentences_ner(file_path):
     try:
-        with Path(file_path).open(encoding="utf-8") as f:
-            lines = f.readlines()
-
-        sentence_count = sum(1 for line in lines if line.strip() == "")
-        return sentence_count
+        return count_blank_lines(file_path)
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
         return 0
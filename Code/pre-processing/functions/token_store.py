@@ -0,0 +1,181 @@
+from array import array
+from bisect import bisect_right
+
+from functions.conllu_reader import parse_deps, parse_dict, parse_feats
+
+CODED_COLUMNS = ('form', 'lemma', 'upos', 'feats', 'deprel', 'deps', 'token_id')
+NO_HEAD = -1
+# Part of the on-disk cache kind of the store, bump when its sections change
+STORE_VERSION = 2
+
+
+class PosTokenStore:
+    """
+    Columnar storage for the tokens of the POS corpus.
+
+    Form, lemma, upos, feats, deprel and deps are interned into per-column vocabularies and kept as
+    integer codes in arrays, heads are kept in an int array and misc as its raw CoNLL-U string.
+    Indexing the store returns the same 8-element entry that process_conllu_file returns, built on demand.
+    The CoNLL-U ID of every token is coded too, and the source file and sent_id are kept once per file and
+    sentence with the index of their first token, see location().
+    """
+
+    def __init__(self):
+        self.vocab = {column: [] for column in CODED_COLUMNS}
+        self.codes = {column: array('I') for column in CODED_COLUMNS}
+        self.heads = array('i')
+        self.misc = []
+        self.source_files = []
+        self.source_starts = array('I')
+        # "" for sentences without a sent_id
+        self.sentence_ids = []
+        self.sentence_starts = array('I')
+        self._lookup = {column: {} for column in CODED_COLUMNS}
+        self._positions = None
+
+    @classmethod
+    def from_sections(cls, sections):
+        """Rebuild a store from the sections written by to_sections"""
+        store = cls()
+        for column in CODED_COLUMNS:
+            store.vocab[column] = sections[f"{column}_vocab"]
+            store.codes[column] = sections[f"{column}_codes"]
+            store._lookup[column] = {value: code for code, value in enumerate(store.vocab[column])}
+        store.heads = sections["heads"]
+        store.misc = sections["misc"]
+        store.source_files = sections["source_files"]
+        store.source_starts = sections["source_starts"]
+        store.sentence_ids = sections["sentence_ids"]
+        store.sentence_starts = sections["sentence_starts"]
+        return store
+
+    def to_sections(self):
+        """Return the columns of the store as a dict of arrays and string lists, used by the on-disk cache"""
+        sections = {}
+        for column in CODED_COLUMNS:
+            sections[f"{column}_vocab"] = self.vocab[column]
+            sections[f"{column}_codes"] = self.codes[column]
+        sections["heads"] = self.heads
+        sections["misc"] = self.misc
+        sections["source_files"] = self.source_files
+        sections["source_starts"] = self.source_starts
+        sections["sentence_ids"] = self.sentence_ids
+        sections["sentence_starts"] = self.sentence_starts
+        return sections
+
+    def _code(self, column, value):
+        lookup = self._lookup[column]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(self.vocab[column])
+            self.vocab[column].append(value)
+        return code
+
+    def start_file(self, file_path):
+        """The tokens appended from now on come from file_path"""
+        self.source_files.append(str(file_path))
+        self.source_starts.append(len(self))
+
+    def start_sentence(self, sent_id):
+        """The tokens appended from now on belong to the sentence sent_id (None without one)"""
+        self.sentence_ids.append(sent_id or "")
+        self.sentence_starts.append(len(self))
+
+    def append(self, form, lemma, upos, feats, head, deprel, deps, misc, token_id="_"):
+        """Add a token given as raw CoNLL-U column strings"""
+        for column, value in zip(CODED_COLUMNS, (form, lemma, upos, feats, deprel, deps, token_id)):
+            self.codes[column].append(self._code(column, value))
+        self.heads.append(NO_HEAD if head == '_' else int(head))
+        self.misc.append(misc)
+        self._positions = None
+
+    def extend(self, other):
+        """Append every token of another store, remapping its vocabulary codes onto this one"""
+        for column in CODED_COLUMNS:
+            remap = [self._code(column, value) for value in other.vocab[column]]
+            self.codes[column].extend(remap[code] for code in other.codes[column])
+        offset = len(self)
+        self.source_files.extend(other.source_files)
+        self.source_starts.extend(start + offset for start in other.source_starts)
+        self.sentence_ids.extend(other.sentence_ids)
+        self.sentence_starts.extend(start + offset for start in other.sentence_starts)
+        self.heads.extend(other.heads)
+        self.misc.extend(other.misc)
+        self._positions = None
+
+    def __len__(self):
+        return len(self.heads)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        head = self.heads[index]
+        return [
+            self.value('form', index),
+            self.value('lemma', index),
+            self.value('upos', index),
+            parse_feats(self.value('feats', index)),
+            None if head == NO_HEAD else head,
+            self.value('deprel', index),
+            parse_deps(self.value('deps', index)),
+            parse_dict(self.misc[index]),
+        ]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def value(self, column, index):
+        """Return the raw string of a coded column for one token"""
+        return self.vocab[column][self.codes[column][index]]
+
+    def location(self, index):
+        """Return the (source file, sent_id, CoNLL-U ID) of a token, None for what the store does not know"""
+        file_number = bisect_right(self.source_starts, index) - 1
+        sentence_number = bisect_right(self.sentence_starts, index) - 1
+        token_id = self.value('token_id', index)
+        return (
+            self.source_files[file_number] if file_number >= 0 else None,
+            (self.sentence_ids[sentence_number] or None) if sentence_number >= 0 else None,
+            None if token_id == "_" else token_id,
+        )
+
+    def form(self, index):
+        return self.vocab['form'][self.codes['form'][index]]
+
+    def forms(self):
+        """Return the form of every token, in corpus order"""
+        vocab = self.vocab['form']
+        return [vocab[code] for code in self.codes['form']]
+
+    def vocabulary(self):
+        """Return the unique forms in order of first occurrence"""
+        return list(self.vocab['form'])
+
+    def positions(self):
+        """Return a dict mapping every form to the ordered list of token indices where it occurs"""
+        if self._positions is None:
+            by_code = [[] for _ in self.vocab['form']]
+            for index, code in enumerate(self.codes['form']):
+                by_code[code].append(index)
+            self._positions = dict(zip(self.vocab['form'], by_code))
+        return self._positions
+
+    def occurrences(self, word):
+        return self.positions().get(word, [])
+
+    def count(self, column, value):
+        """Count the tokens whose column has the given raw value"""
+        code = self._lookup[column].get(value)
+        if code is None:
+            return 0
+        return self.codes[column].count(code)
+
+    def first_of(self, words):
+        """Return the entry of the first token whose form is one of the given words, or None"""
+        indices = [self.occurrences(word)[0] for word in words if self.occurrences(word)]
+        return self[min(indices)] if indices else None
+
+    def last_entries(self):
+        """Return a dict mapping every form to the entry of its last occurrence"""
+        return {word: self[indices[-1]] for word, indices in self.positions().items()}
@@ -0,0 +1,42 @@
+import argparse
+import time
+from pathlib import Path
+
+from functions.corpus import CORPUS_DIRECTORIES
+from functions.combined_index import INDEX_NAME, SentenceIndex, build_sentence_index
+from functions.conllu_reader import FORM
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index every sentence of the Combined Files, or look sentences up in the index")
+    parser.add_argument("--combined-dir", type=Path, default=Path("../../Corpus/Files/Combined Files in Corpus"))
+    parser.add_argument("--index", type=Path, default=None, help=f"Index file (default: <combined-dir>/{INDEX_NAME})")
+    parser.add_argument("--parts", nargs="+", default=CORPUS_DIRECTORIES,
+                        help="Corpus directories to index (default: 1Part to 10Part)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--label", help="Print the sentences with an entity of this label instead of indexing")
+    parser.add_argument("--section", help="Print the sentences of this section instead of indexing")
+    parser.add_argument("--limit", type=int, default=10, help="Sentences to print")
+    args = parser.parse_args()
+
+    if not args.label and not args.section:
+        start = time.perf_counter()
+        build_sentence_index(args.combined_dir, args.index, args.parts, processes=args.processes)
+        print(f"Done in {time.perf_counter() - start:.1f}s")
+        return
+
+    with SentenceIndex(args.combined_dir, args.index) as index:
+        rows = None
+        if args.label:
+            rows = set(index.with_label(args.label))
+        if args.section:
+            section_rows = set(index.in_section(args.section))
+            rows = section_rows if rows is None else rows & section_rows
+        rows = sorted(rows)
+        print(f"{len(rows)} sentences")
+        for row, (metadata, tokens) in zip(rows[:args.limit], index.read(rows[:args.limit])):
+            print(f"{index.files[row]} sent_id={metadata.get('sent_id')}: {' '.join(token[FORM] for token in tokens)}")
+
+
+if __name__ == "__main__":
+    main()
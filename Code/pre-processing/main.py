@@ -1,15 +1,69 @@
 from functions.functions import *
+from functions import metrics
+from functions.row_writer import COMPRESSION, COMPRESSION_SUFFIXES
+import argparse
 import logging
 logging.getLogger().setLevel(logging.ERROR)
 
 
+def match_per_file(output_file, unmatched_file):
+    """Match every NER article with its own POS file (Corpus/Files/*/1Part..10Part) instead of the whole corpus"""
+    corpus_dir = Path("../../Corpus/Files/")
+    stats = match_corpus_files_sequential_csv(
+        corpus_dir / "NER Files in Corpus",
+        corpus_dir / "POS Files in Corpus",
+        output_file=output_file,
+        unmatched_file=unmatched_file
+    )
+
+    print(f"\nCombined words of {len(stats['files'])} file pairs written to {output_file} in CSV format")
+    print(f"Unmatched NER words written to {unmatched_file}")
+    print(f"Successfully matched: {stats['matched_count']} out of {stats['total_ner_words']} NER words")
+    print(f"Match rate: {stats['match_rate']:.2f}%")
+    print(f"Match statistics: {stats['match_statistics']}")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Match the NER corpus with the POS corpus and write a CSV")
+    parser.add_argument("--per-file", action="store_true",
+                        help="Match every NER/POS article pair on its own in a process pool")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION), default=None,
+                        help="Compress the CSV outputs (the compression suffix is added to their names)")
+    parser.add_argument("--diagnostics", type=Path, default=None,
+                        help="SQLite file to record per token match diagnostics in "
+                             "(e.g. ../../Dataset/Errors/diagnostics.sqlite)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Time the stages and count the match kinds and cache hits, written next to the CSV")
+    parser.add_argument("--profile", choices=metrics.PROFILERS, default=None,
+                        help="Also profile the stages, pool workers included, with cProfile or a sampling profiler")
+    args = parser.parse_args()
+
+    if args.metrics or args.profile:
+        metrics.enable(profiler=args.profile)
+    try:
+        run_matching(args)
+    finally:
+        if metrics.is_enabled():
+            report_path = Path("../../Dataset/Testing/run_report.json")
+            metrics.write_report(report_path)
+            print(f"Run report written to {report_path}")
+
+
+def run_matching(args):
+    suffix = {name: suffix for suffix, name in COMPRESSION_SUFFIXES.items()}.get(args.compression, "")
+    output_file = "../../Dataset/Testing/combined_words.csv" + suffix
+    unmatched_file = "../../Dataset/Errors/unmatched_ner.txt" + suffix
+    if args.per_file:
+        match_per_file(output_file, unmatched_file)
+        return
+
     print("Loading NER data...")
     ner_words, ner_dict = parse_ner_file("../../Corpus/korpusi.txt")
 
     print("Loading POS data...")
     conllu_dir = Path("../../Conllu Files in Corpus/")
-    pos_words, pos_dict, quotes_dict = process_conllu_files_parallel(conllu_dir)
+    cache_dir = Path("../../Corpus/.cache/")
+    pos_words, pos_dict, quotes_dict = process_conllu_files_parallel(conllu_dir, cache_dir=cache_dir)
 
     print(f"NER: {len(ner_words)}")
     print(f"POS: {len(pos_words)}")
@@ -19,8 +73,6 @@ def main():
         return
 
     print("Matching NER with POS and writing to file...")
-    output_file = "../../Dataset/Testing/combined_words.csv"
-    unmatched_file = "../../Dataset/Errors/unmatched_ner.txt"
 
     # stats = match_ner_with_pos(
     #     ner_words,
@@ -33,16 +85,18 @@ def main():
         ner_words,
         pos_words,
         output_file=output_file,
-        unmatched_file=unmatched_file
+        unmatched_file=unmatched_file,
+        diagnostics_path=args.diagnostics,
+        ner_file="../../Corpus/korpusi.txt"
     )
 
     print(f"\nCombined words written to {output_file} in CSV format")
     print(f"Unmatched NER words written to {unmatched_file}")
+    if args.diagnostics is not None:
+        print(f"Match diagnostics written to {args.diagnostics}")
     print(f"Successfully matched: {stats['matched_count']} out of {stats['total_ner_words']} NER words")
     print(f"Match rate: {stats['matched_count'] / stats['total_ner_words'] * 100:.2f}%")
-    print(f"Unmatched NER words written to {stats['word_usage_stats']}")
-    print(f"Quotation marks matched: {stats['quotes_matched']}, unmatched: {stats['quotes_unmatched']}")
-
+    print(f"Match statistics: {stats['match_statistics']}")
 
 
 if __name__ == "__main__":
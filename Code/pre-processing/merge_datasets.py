@@ -0,0 +1,51 @@
+import argparse
+from pathlib import Path
+
+from functions import metrics
+from functions.alignment import MANIFEST_NAME, merge_corpus
+from functions.corpus import CORPUS_DIRECTORIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align the NER and POS corpus files and write the combined CoNLL-U files")
+    parser.add_argument("--ner-dir", type=Path, default=Path("../../Corpus/Files/NER Files in Corpus"))
+    parser.add_argument("--pos-dir", type=Path, default=Path("../../Corpus/Files/POS Files in Corpus"))
+    parser.add_argument("--combined-dir", type=Path, default=Path("../../Corpus/Files/Combined Files in Corpus"))
+    parser.add_argument("--parts", nargs="+", default=CORPUS_DIRECTORIES,
+                        help="Corpus directories to merge (default: 1Part to 10Part)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=4, help="File pairs handed to a worker at a time")
+    parser.add_argument("--full", action="store_true", help="Rebuild every pair instead of only the changed ones")
+    parser.add_argument("--diagnostics", type=Path, default=None,
+                        help="SQLite file to record per token match diagnostics of the rebuilt pairs in "
+                             "(e.g. ../../Dataset/Errors/diagnostics.sqlite, use --full to cover every pair)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Time the stages and count cache hits, written to run_report.json in --combined-dir")
+    parser.add_argument("--profile", choices=metrics.PROFILERS, default=None,
+                        help="Also profile the stages, pool workers included, with cProfile or a sampling profiler")
+    args = parser.parse_args()
+
+    if args.metrics or args.profile:
+        metrics.enable(profiler=args.profile)
+
+    written = merge_corpus(
+        args.ner_dir,
+        args.pos_dir,
+        args.combined_dir,
+        args.parts,
+        processes=args.processes,
+        chunksize=args.chunksize,
+        manifest_path=args.combined_dir / MANIFEST_NAME,
+        full=args.full,
+        diagnostics_path=args.diagnostics
+    )
+    print(f"Combined files written to {args.combined_dir} ({len(written)} files)")
+
+    if metrics.is_enabled():
+        report_path = args.combined_dir / "run_report.json"
+        metrics.write_report(report_path, {'written_files': len(written)})
+        print(f"Run report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
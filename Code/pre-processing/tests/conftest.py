@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules import each other as functions.<module>, from the pre-processing directory
+PRE_PROCESSING = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PRE_PROCESSING))
+
+CORPUS = PRE_PROCESSING.parent.parent / "Corpus" / "Files"
+SHIPPED_PAIRS = 5
+
+
+@pytest.fixture(scope="session")
+def shipped_pairs():
+    """The first (ner_file, pos_file) pairs of the shipped corpus, skipped when the corpus is not checked out"""
+    from functions.corpus import corpus_file_pairs
+
+    pairs = [(ner_file, pos_file) for _, ner_file, pos_file in corpus_file_pairs(
+        CORPUS / "NER Files in Corpus", CORPUS / "POS Files in Corpus", ["1Part", "5Part"])]
+    if not pairs:
+        pytest.skip("the shipped corpus is not available")
+    return pairs[:SHIPPED_PAIRS] + pairs[-SHIPPED_PAIRS:]
@@ -0,0 +1,140 @@
+import shutil
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from conftest import CORPUS
+from functions import alignment, ner_reader
+from functions.alignment import (
+    MANIFEST_NAME, compare_with_shipped, get_ner_data, load_manifest, merge_corpus, write_conllu_files_from_dataset
+)
+from functions.conllu_reader import FORM, read_conllu_tokens
+from functions.corpus import article_number, corpus_file_pairs
+from functions.functions import parse_ner_file
+from functions.ner_reader import NerCorpus, read_ner_records
+
+
+def test_ner_data_uses_the_ner_reader(shipped_pairs):
+    for ner_file, _ in shipped_pairs:
+        assert get_ner_data(ner_file) == [{"WORD": word, "NER_TAG": tag} for word, tag, _ in read_ner_records(ner_file)]
+
+
+def test_ner_data_lines(tmp_path):
+    ner_file = tmp_path / "article.txt"
+    ner_file.write_text("Tirana\t\t'B-LOC\nbosh\t\t'\n“Po”\t\tO\n\n  \t\tO\nfjalë\tO\tI-PER\n", encoding="utf-8")
+
+    assert get_ner_data(ner_file) == [
+        {"WORD": "Tirana", "NER_TAG": "B-LOC"},
+        {"WORD": '"Po"', "NER_TAG": "O"},
+        {"WORD": "fjalë", "NER_TAG": "O"},
+    ]
+
+
+def test_ner_corpus_closes_the_file_when_mapping_fails(tmp_path, monkeypatch):
+    ner_file = tmp_path / "article.txt"
+    ner_file.write_text("Tirana\t\tB-LOC\n", encoding="utf-8")
+    opened = []
+    path_open = Path.open
+
+    def tracked_open(self, *args, **kwargs):
+        opened.append(path_open(self, *args, **kwargs))
+        return opened[-1]
+
+    def failing_mmap(*args, **kwargs):
+        raise OSError("cannot map")
+
+    monkeypatch.setattr(Path, "open", tracked_open)
+    monkeypatch.setattr(ner_reader.mmap, "mmap", failing_mmap)
+    with pytest.raises(OSError):
+        NerCorpus(ner_file)
+    assert opened and opened[0].closed
+
+
+def test_pairs_by_article_number(tmp_path):
+    for name in ["1_a.txt", "2_b.txt", "10_c.txt", "7_d.txt", "7_d2.txt", "x.txt"]:
+        (tmp_path / "NER" / "1Part").mkdir(parents=True, exist_ok=True)
+        (tmp_path / "NER" / "1Part" / name).write_text("", encoding="utf-8")
+    for name in ["1.conllu", "2.conllu", "3.conllu", "10.conllu", "7.conllu", "7 - Copy.conllu"]:
+        (tmp_path / "POS" / "1Part").mkdir(parents=True, exist_ok=True)
+        (tmp_path / "POS" / "1Part" / name).write_text("", encoding="utf-8")
+
+    pairs = corpus_file_pairs(tmp_path / "NER", tmp_path / "POS", ["1Part"])
+
+    assert [(ner_file.name, pos_file.name) for _, ner_file, pos_file in pairs] == [
+        ("1_a.txt", "1.conllu"), ("2_b.txt", "2.conllu"), ("10_c.txt", "10.conllu")
+    ]
+
+
+def test_shipped_1part_pairs_share_their_words():
+    ner_path = CORPUS / "NER Files in Corpus"
+    if not (ner_path / "1Part").exists():
+        pytest.skip("the shipped corpus is not available")
+    pairs = corpus_file_pairs(ner_path, CORPUS / "POS Files in Corpus", ["1Part"])
+    names = {ner_file.name: pos_file.name for _, ner_file, pos_file in pairs}
+
+    # 1039.conllu has no NER file and the two 244 articles have two POS files, with the old pairing by position
+    # every NER file after 1039 got the POS file of the article before it
+    assert len(pairs) == 1237
+    assert names["1040_data_lajme_rtsh_al_culture_headline.txt"] == "1040.conllu"
+    assert "244_data_lajme_rtsh_al_culture_headline.txt" not in names
+    for _, ner_file, pos_file in pairs:
+        assert article_number(ner_file) == article_number(pos_file)
+        ner_words = Counter(word for word, _ in parse_ner_file(ner_file)[0])
+        pos_words = Counter(token[FORM] for token in read_conllu_tokens(pos_file))
+        assert sum((ner_words & pos_words).values()) >= 0.5 * sum(ner_words.values()), ner_file.name
+
+
+def test_regenerated_parts_match_the_shipped_combined_files(tmp_path):
+    # 5Part and 6Part were paired correctly before pairing by article number, so they are a parity check
+    if not (CORPUS / "Combined Files in Corpus" / "5Part").exists():
+        pytest.skip("the shipped corpus is not available")
+    different, _ = compare_with_shipped(CORPUS / "NER Files in Corpus", CORPUS / "POS Files in Corpus",
+                                        CORPUS / "Combined Files in Corpus", ["5Part", "6Part"], tmp_path)
+    assert different == []
+    assert len(list(tmp_path.rglob("*.conllu"))) == 54
+
+
+def small_corpus(tmp_path, articles=6):
+    ner_path = CORPUS / "NER Files in Corpus"
+    if not (ner_path / "5Part").exists():
+        pytest.skip("the shipped corpus is not available")
+    pairs = corpus_file_pairs(ner_path, CORPUS / "POS Files in Corpus", ["5Part"])[:articles]
+    for _, ner_file, pos_file in pairs:
+        for source, kind in ((ner_file, "NER"), (pos_file, "POS")):
+            target = tmp_path / kind / "5Part" / source.name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(source, target)
+    return tmp_path / "NER", tmp_path / "POS", tmp_path / "Combined"
+
+
+def test_write_conllu_files_is_incremental(tmp_path, capsys):
+    ner_path, pos_path, combined_path = small_corpus(tmp_path)
+
+    assert len(write_conllu_files_from_dataset(ner_path, pos_path, combined_path, "5Part")) == 6
+    assert (combined_path / MANIFEST_NAME).exists()
+    assert write_conllu_files_from_dataset(ner_path, pos_path, combined_path, "5Part") == []
+    assert "6 combined files up to date, 0 to rebuild" in capsys.readouterr().out
+
+
+def test_interrupted_merge_keeps_its_progress(tmp_path, monkeypatch):
+    ner_path, pos_path, combined_path = small_corpus(tmp_path)
+    align_and_write = alignment.align_and_write
+    calls = []
+
+    def interrupted(task, diagnostics=False):
+        if len(calls) == 4:
+            raise KeyboardInterrupt
+        calls.append(task)
+        return align_and_write(task, diagnostics)
+
+    monkeypatch.setattr(alignment, "align_and_write", interrupted)
+    monkeypatch.setattr(alignment, "MANIFEST_SAVE_INTERVAL", 3)
+    with pytest.raises(KeyboardInterrupt):
+        merge_corpus(ner_path, pos_path, combined_path, ["5Part"], processes=1,
+                     manifest_path=combined_path / MANIFEST_NAME)
+
+    assert len(load_manifest(combined_path / MANIFEST_NAME)) == 4
+    monkeypatch.undo()
+    assert len(merge_corpus(ner_path, pos_path, combined_path, ["5Part"], processes=1,
+                            manifest_path=combined_path / MANIFEST_NAME)) == 2
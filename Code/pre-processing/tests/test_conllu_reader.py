@@ -0,0 +1,55 @@
+import pytest
+
+from functions.conllu_reader import (
+    FEATS, ID, MISC, compare_with_conllu, read_conllu_sentences, read_conllu_tokens, token_value
+)
+
+conllu = pytest.importorskip("conllu")
+
+EDGE_CASES = (
+    "# newdoc id = doc1\n"
+    "# newpar\n"
+    "# sent_id = 1\n"
+    "# text = Në shtëpi.\n"
+    "# comment without a value\n"
+    "1-2\tNë\t_\t_\t_\t_\t_\t_\t_\t_\n"
+    "1\tN\tn\tADP\t_\t_\t2\tcase\t_\t_\n"
+    "2\të\të\tDET\t_\tCase=Nom|Key=b=c\t0\troot\t_\tstart_char=0|end_char=2|Note=a=b=c\n"
+    "2.1\tshtëpi\tshtëpi\tNOUN\t_\t_\t_\t_\t0:root|2:obj\t_\n"
+    "3\t.\t.\tPUNCT\t_\t_\t2\tpunct\t2:punct\tSpaceAfter=No|Empty=\n"
+    "\n"
+    "# sent_id = 2\n"
+    "1\tPo\tpo\tPART\t_\tFlag\t0\troot\t_\t_\n"
+)
+
+
+@pytest.mark.parametrize("ending", ["", "\n", "\n\n"], ids=["no blank line", "blank line", "two blank lines"])
+def test_edge_cases_match_conllu(tmp_path, ending):
+    file_path = tmp_path / "edge.conllu"
+    file_path.write_text(EDGE_CASES + ending, encoding="utf-8")
+
+    assert compare_with_conllu(file_path) == []
+    assert len(list(read_conllu_sentences(file_path))) == 2
+
+
+def test_ids_and_key_value_columns(tmp_path):
+    file_path = tmp_path / "edge.conllu"
+    file_path.write_text(EDGE_CASES, encoding="utf-8")
+    expected = [token for sentence in conllu.parse(EDGE_CASES) for token in sentence]
+    tokens = list(read_conllu_tokens(file_path))
+
+    assert [token_value(token, ID) for token in tokens] == [(1, '-', 2), 1, 2, (2, '.', 1), 3, 1]
+    # 'a=b=c' keeps the value conllu gives it
+    assert token_value(tokens[2], FEATS) == expected[2]['feats']
+    assert token_value(tokens[2], MISC) == expected[2]['misc']
+    assert token_value(tokens[4], MISC) == {'SpaceAfter': 'No', 'Empty': None}
+    assert token_value(tokens[5], FEATS) == {'Flag': ''}
+
+
+def test_short_rows_read_as_missing_columns():
+    assert token_value(("1", "fjalë"), MISC) is None
+
+
+def test_shipped_files_match_conllu(shipped_pairs):
+    for _, pos_file in shipped_pairs:
+        assert compare_with_conllu(pos_file) == []
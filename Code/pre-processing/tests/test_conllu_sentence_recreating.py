@@ -0,0 +1,19 @@
+from conllu_sentence_recreating import iter_file_rows, process_conllu_file
+
+
+def test_file_rows_stream_in_order(shipped_pairs):
+    # 10 files through a window of 4 on one CPU
+    pos_files = [pos_file for _, pos_file in shipped_pairs]
+    results = list(iter_file_rows(pos_files, chunksize=1))
+
+    assert [file_path for file_path, _ in results] == pos_files
+    for file_path, rows in results:
+        assert rows["sentences"] == process_conllu_file(file_path)["sentences"]
+
+
+def test_file_rows_stop_early(shipped_pairs):
+    pos_files = [pos_file for _, pos_file in shipped_pairs]
+    results = iter_file_rows(pos_files, chunksize=1)
+
+    assert next(results)[0] == pos_files[0]
+    results.close()
@@ -0,0 +1,70 @@
+from collections import Counter
+
+from functions.dataset_split import SPLITS, entity_label, split_dataset_file
+
+# word, ner_tag, lemma, upos, feats, head, deprel, deps, misc as in Dataset/Testing/final_dataset2.txt
+ROW = "{word}\t\t{tag}\t{lemma}\tPROPN\tGender=Masc\t0\troot\t_\tstart_char=0|end_char=5"
+
+
+def sentence(*tagged):
+    return "\n".join(ROW.format(word=word, tag=tag, lemma=word.lower()) for word, tag in tagged)
+
+
+def sample_sentences():
+    sentences = []
+    for number in range(1200):
+        sentences.append(sentence((f"Tirana{number}", "B-LOC"), ("është", "O")))
+    for number in range(600):
+        sentences.append(sentence((f"Edi{number}", "B-PER"), ("Rama", "I-PER"), ("flet", "O")))
+    for number in range(200):
+        sentences.append(sentence((f"fjalë{number}", "O"), (".", "O")))
+    return sentences
+
+
+def split_of(tmp_path, sentences, **kwargs):
+    """Split sentences and map every one of them to the split it was written to"""
+    input_file = tmp_path / "dataset.txt"
+    input_file.write_text("\n\n".join(sentences), encoding="utf-8")
+    output_files = {split: tmp_path / f"{split}.txt" for split in SPLITS}
+    result = split_dataset_file(input_file, output_files, **kwargs)
+    assigned = {block: split for split in SPLITS
+                for block in output_files[split].read_text(encoding="utf-8").split("\n\n") if block}
+    return result, assigned
+
+
+def test_entity_label_reads_the_ner_column():
+    assert entity_label(sentence(("Tirana", "B-LOC"), ("është", "O"))) == "LOC"
+    assert entity_label(sentence(("Edi", "B-PER"), ("Rama", "I-PER"), ("në", "O"), ("Tiranë", "B-LOC"))) == "PER"
+    assert entity_label(sentence(("fjalë", "O"))) == "O"
+    # The NER files themselves have no columns after the tag
+    assert entity_label("Tirana\t\tB-LOC\nështë\t\tO") == "LOC"
+
+
+def test_stratified_split_per_label(tmp_path):
+    result, assigned = split_of(tmp_path, sample_sentences(), seed=7, stratify=["label"])
+
+    assert set(result['strata']) == {('LOC',), ('PER',), ('O',)}
+    for stratum, counts in result['strata'].items():
+        total = sum(counts.values())
+        for split, ratio in zip(SPLITS, (0.80, 0.10, 0.10)):
+            assert abs(counts.get(split, 0) / total - ratio) < 0.05, (stratum, counts)
+    assert sum(result['splits'].values()) == len(assigned) == 2000
+
+    labels = Counter((entity_label(block), split) for block, split in assigned.items())
+    assert sum(labels[label, 'dev'] for label in ('LOC', 'PER', 'O')) == result['splits']['dev']
+
+
+def test_split_depends_on_text_and_seed_only(tmp_path):
+    sentences = sample_sentences()
+    _, first = split_of(tmp_path, sentences, seed=7, stratify=["label"])
+    _, again = split_of(tmp_path, sentences, seed=7, stratify=["label"])
+    _, other_seed = split_of(tmp_path, sentences, seed=8, stratify=["label"])
+    _, unstratified = split_of(tmp_path, sentences, seed=7)
+    assert first == again
+    assert first != other_seed
+    assert first != unstratified
+
+    # A new sentence does not move any of the others
+    extra = sentence(("Durrës", "B-LOC"), ("është", "O"))
+    _, grown = split_of(tmp_path, sentences[:500] + [extra] + sentences[500:], seed=7, stratify=["label"])
+    assert {block: split for block, split in grown.items() if block != extra} == first
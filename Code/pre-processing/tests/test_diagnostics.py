@@ -0,0 +1,47 @@
+from functions.conllu_reader import FORM, ID, read_conllu_sentences
+from functions.diagnostics import read_diagnostics
+from functions.functions import load_conllu_file_store, match_ner_with_pos_sequential_csv, parse_ner_file
+from functions.normalization import normalize_token
+from functions.token_store import PosTokenStore
+
+
+def conllu_tokens(pos_file):
+    """(sent_id, CoNLL-U ID) -> normalized form of every token of a POS file"""
+    return {(metadata.get('sent_id'), token[ID]): normalize_token(token[FORM])
+            for metadata, tokens in read_conllu_sentences(pos_file) for token in tokens}
+
+
+def test_matcher_rows_point_at_the_pos_token(shipped_pairs, tmp_path):
+    pairs = shipped_pairs[:3]
+    pos_words = PosTokenStore()
+    for _, pos_file in pairs:
+        # The second load comes from the on-disk cache and has to keep the locations
+        load_conllu_file_store(pos_file, cache_dir=tmp_path / "cache")
+        pos_words.extend(load_conllu_file_store(pos_file, cache_dir=tmp_path / "cache"))
+    ner_words = [entry for ner_file, _ in pairs for entry in parse_ner_file(ner_file)[0]]
+
+    db_path = tmp_path / "diagnostics.sqlite"
+    match_ner_with_pos_sequential_csv(ner_words, pos_words, output_file=tmp_path / "out.csv",
+                                      unmatched_file=tmp_path / "unmatched.csv", processes=1,
+                                      diagnostics_path=db_path, ner_file="ner.txt", show_progress=False)
+
+    tokens = {str(pos_file): conllu_tokens(pos_file) for _, pos_file in pairs}
+    rows = [row for row in read_diagnostics(db_path) if row['match_type'] != 'unmatched']
+    assert rows
+    for row in rows:
+        assert pos_words.form(row['pos_index']) == row['pos_candidate']
+        assert tokens[row['pos_file']][(row['pos_sent_id'], row['pos_token_id'])] == row['pos_candidate']
+
+
+def test_strict_window_scores_fuzzy_matches():
+    from rapidfuzz.fuzz import WRatio
+
+    from functions.matcher import MatchEngine, StrictWindow
+
+    pos_words = [[word, word.lower(), "NOUN", None, None, None, None, None] for word in ["Tirana", "është", "qytet"]]
+    matches = list(StrictWindow().matches([("Tirana", "B-LOC"), ("qyteti", "O")], MatchEngine(pos_words).index,
+                                          show_progress=False))
+
+    assert [(match.kind, match.candidate) for match in matches] == [("direct", "Tirana"), ("fuzzy", "qytet")]
+    assert matches[0].score == 1.0
+    assert matches[1].score == WRatio("qyteti", "qytet") / 100
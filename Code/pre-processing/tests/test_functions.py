@@ -0,0 +1,21 @@
+from functions.functions import process_conllu_file, process_conllu_file_store
+
+CONLLU = (
+    "# sent_id = 1\n"
+    "1\tTirana\ttirana\tPROPN\t_\tGender=Fem\t2\tnsubj\t_\tstart_char=0|end_char=6\n"
+    "2\tështë\tjam\n"
+    "3\t.\t.\tPUNCT\t_\t_\t2\tpunct\t_\t_\n"
+)
+
+
+def test_short_rows_are_padded(tmp_path):
+    file_path = tmp_path / "short.conllu"
+    file_path.write_text(CONLLU, encoding="utf-8")
+
+    store = process_conllu_file_store(file_path)
+    entries = process_conllu_file(file_path)
+
+    assert list(store) == entries
+    assert [entry[0] for entry in entries] == ["Tirana", "është", "."]
+    assert entries[1] == ["është", "jam", "_", None, None, "_", None, None]
+    assert store.location(1) == (str(file_path), "1", "2")
@@ -0,0 +1,37 @@
+import random
+
+import rapidfuzz.process
+
+from functions.functions import is_punctuation, parse_ner_file, process_conllu_file
+from functions.fuzzy_index import FuzzyIndex, resolve_fuzzy_matches
+
+WORDS = ["shtëpi", "Shtëpia", "shtëpinë", "Tiranë", "Tirana", "qytet", "qyteti", "dhe", "në", "nga",
+         "New York", " hapësirë", "a", "ab", "ministri", "ministria", "ministrat", "Kosovë", "Kosova"]
+QUERIES = ["shtepi", "Tirane", "qyteeti", "dh", "nw", "New Yrok", "hapësirë", "ministria", "Kosov", "x", "",
+           "abcdefghijklmnop", "Shtëpia", "ministrët"]
+
+
+def test_matches_extract_one():
+    index = FuzzyIndex(WORDS)
+    for threshold in (60, 80, 90):
+        for query in QUERIES:
+            assert index.extract_one(query, threshold) == rapidfuzz.process.extractOne(
+                query, WORDS, score_cutoff=threshold), (query, threshold)
+
+
+def test_matches_extract_one_on_shipped_words(shipped_pairs):
+    words = list(dict.fromkeys(word for _, pos_file in shipped_pairs for word, *_ in process_conllu_file(pos_file)))
+    known = set(words)
+    queries = [word for ner_file, _ in shipped_pairs for word, _ in parse_ner_file(ner_file)[0]
+               if word not in known and not is_punctuation(word)]
+    rng = random.Random(42)
+    for word in rng.sample(words, 100):
+        position = rng.randrange(len(word))
+        queries.append(word[:position] + word[position + 1:])
+
+    index = FuzzyIndex(words)
+    for query in queries:
+        assert index.extract_one(query, 80) == rapidfuzz.process.extractOne(query, words, score_cutoff=80), query
+
+    resolved = resolve_fuzzy_matches(queries, words, 80, processes=1, show_progress=False)
+    assert resolved == {query: rapidfuzz.process.extractOne(query, words, score_cutoff=80) for query in queries}
@@ -0,0 +1,31 @@
+import os
+import stat
+
+from functions.ner_format import format_ner_file
+
+
+def test_format_ner_file(tmp_path):
+    input_file = tmp_path / "article.txt"
+    input_file.write_text("Tirana  B-LOC\n\nështë\tO\nfjalë\n", encoding="utf-8")
+
+    assert format_ner_file(input_file) == (4, 2)
+    assert input_file.read_text(encoding="utf-8") == "Tirana\t\tB-LOC\n\nështë\t\tO\nfjalë\n"
+
+
+def test_new_output_gets_the_umask_mode(tmp_path):
+    input_file = tmp_path / "article.txt"
+    input_file.write_text("Tirana B-LOC\n", encoding="utf-8")
+    umask = os.umask(0o022)
+    try:
+        format_ner_file(input_file, tmp_path / "out" / "article.txt")
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE((tmp_path / "out" / "article.txt").stat().st_mode) == 0o644
+
+
+def test_existing_output_keeps_its_mode(tmp_path):
+    input_file = tmp_path / "article.txt"
+    input_file.write_text("Tirana B-LOC\n", encoding="utf-8")
+    input_file.chmod(0o640)
+    format_ner_file(input_file)
+    assert stat.S_IMODE(input_file.stat().st_mode) == 0o640
@@ -0,0 +1,21 @@
+from functions.conllu_reader import FORM, LEMMA, read_conllu_tokens
+from functions.normalization import normalize_quotes, normalize_token, replace_quotes
+
+TEXTS = ['“Tirana”', "‘po’", "`kodi`", 'pa "thonjëza"', "‘’dy’‘", "``", "", "’", "L’Aquila", "rock `n’ roll"]
+
+
+def test_same_as_the_replace_chain():
+    for text in TEXTS:
+        assert normalize_quotes(text) == replace_quotes(text), text
+        assert normalize_token(text) == replace_quotes(text), text
+
+
+def test_pairs_become_double_quotes():
+    assert normalize_quotes("‘’dy’‘ ``", pairs=True) == '"dy" "'
+
+
+def test_same_as_the_replace_chain_on_shipped_tokens(shipped_pairs):
+    for _, pos_file in shipped_pairs:
+        for token in read_conllu_tokens(pos_file):
+            for text in (token[FORM], token[LEMMA]):
+                assert normalize_token(text) == replace_quotes(text), text
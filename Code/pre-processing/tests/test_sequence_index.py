@@ -0,0 +1,27 @@
+from functions.functions import is_punctuation, parse_ner_file, process_conllu_file_store
+from functions.sequence_index import OccurrenceIndex, linear_strict_sequential_positions, strict_sequential_positions
+from functions.token_store import PosTokenStore
+
+
+def test_matches_the_forward_scan():
+    words = ["Në", "Tiranë", "sot", ",", "ministri", "tha", "se", "Tiranë", "dhe", "Durrës", "."] * 30
+    ner_words = [(word, "O") for word in ["Në", "Tirane", "sot", "...", "", "ministr", "tha", "Durres", ",",
+                                          "Tiranë", "xyz", "Tiranë", "."] * 20]
+
+    expected = list(linear_strict_sequential_positions(ner_words, words, is_punctuation=is_punctuation))
+    actual = list(strict_sequential_positions(ner_words, OccurrenceIndex(words), is_punctuation=is_punctuation))
+    assert actual == expected
+    assert None in actual and -1 in actual
+
+
+def test_matches_the_forward_scan_on_shipped_files(shipped_pairs):
+    store = PosTokenStore()
+    for _, pos_file in shipped_pairs:
+        store.extend(process_conllu_file_store(pos_file))
+    ner_words = [entry for ner_file, _ in shipped_pairs for entry in parse_ner_file(ner_file)[0]]
+    words = store.forms()
+
+    expected = list(linear_strict_sequential_positions(ner_words, words, is_punctuation=is_punctuation))
+    actual = list(strict_sequential_positions(ner_words, OccurrenceIndex(words, store.positions()),
+                                              is_punctuation=is_punctuation))
+    assert actual == expected